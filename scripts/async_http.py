@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 client for the Qdrant tools
+
+Load generation needs many requests in flight from one process, which the
+blocking requests session used by the snapshot tools cannot do without a
+thread per request. This client keeps a pool of keep-alive connections and
+is built on asyncio streams only, so it needs no extra packages. It supports
+what the Qdrant REST API needs: JSON bodies, Content-Length and chunked
+responses, gzip-encoded responses, TLS (including self-signed certificates)
+and basic auth.
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import ssl
+from typing import Dict, Optional, Any, Tuple
+from urllib.parse import urlsplit
+
+
+class AsyncHTTPError(Exception):
+    """Raised when a request fails at the connection or protocol level"""
+
+
+class AsyncHTTPResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # Size of the body as it was sent, before decompression
+        self.encoded_size = len(body)
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncHTTPClient:
+    """Pooled keep-alive HTTP client for one host"""
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        basic_auth: Optional[Tuple[str, str]] = None,
+        pool_size: int = 64,
+        timeout: float = 30.0,
+        verify_tls: bool = True
+    ):
+        url = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.path_prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.ssl = None
+        if url.scheme == "https":
+            self.ssl = ssl.create_default_context()
+            if not verify_tls:
+                self.ssl.check_hostname = False
+                self.ssl.verify_mode = ssl.CERT_NONE
+
+        host_header = self.host if url.port is None else f"{self.host}:{url.port}"
+        self.headers = {"Host": host_header, "Connection": "keep-alive"}
+        if basic_auth:
+            token = base64.b64encode(f"{basic_auth[0]}:{basic_auth[1]}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {token}"
+        self.headers.update(headers or {})
+
+        self._idle = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> _Connection:
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        return _Connection(reader, writer)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json_body: Any = None,
+        body: Optional[bytes] = None
+    ) -> AsyncHTTPResponse:
+        """Send a request and return the full response (any status code)"""
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._request(method, path, body), self.timeout)
+            except asyncio.TimeoutError:
+                raise AsyncHTTPError(f"{method} {path} timed out after {self.timeout:.0f}s")
+
+    async def _request(self, method: str, path: str, body: Optional[bytes]) -> AsyncHTTPResponse:
+        head = [f"{method} {self.path_prefix}{path} HTTP/1.1"]
+        head.extend(f"{name}: {value}" for name, value in self.headers.items())
+        if body is not None:
+            head.append("Content-Type: application/json")
+        head.append(f"Content-Length: {len(body or b'')}")
+        request = ("\r\n".join(head) + "\r\n\r\n").encode() + (body or b"")
+
+        while True:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                connection.writer.write(request)
+                await connection.writer.drain()
+                response, keep_alive = await self._read_response(connection.reader)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+                connection.close()
+                # The server may have closed an idle keep-alive connection;
+                # that is only worth one more try on a fresh connection
+                if connection.reused:
+                    continue
+                raise AsyncHTTPError(f"{method} {path} failed: {type(e).__name__}: {e}")
+            except BaseException:
+                connection.close()
+                raise
+
+            if keep_alive:
+                connection.reused = True
+                self._idle.append(connection)
+            else:
+                connection.close()
+
+            if response.headers.get("content-encoding", "").lower() == "gzip":
+                response.body = gzip.decompress(response.body)
+            return response
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[AsyncHTTPResponse, bool]:
+        status_line = await reader.readuntil(b"\r\n")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ConnectionError(f"Invalid status line {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    # Skip trailers up to the final empty line
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            return AsyncHTTPResponse(status, headers, body), False
+
+        keep_alive = headers.get("connection", "").lower() != "close" and parts[0] != "HTTP/1.0"
+        return AsyncHTTPResponse(status, headers, body), keep_alive
+
+    async def close(self) -> None:
+        """Close all idle connections"""
+        while self._idle:
+            self._idle.pop().close()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Qdrant Backup Scheduler
+
+This script runs backup_snapshots.py's QdrantSnapshotBackup as a long-running
+service. Every collection has its own backup interval, a global limit caps
+how many backups run at the same time, and start times are spread out so
+that collections do not all hit Qdrant at once. After each backup the
+server-side snapshot can be deleted and old local backups are pruned with a
+grandfather-father-son (GFS) retention policy. A small state file records
+when each collection was last backed up, so a restart does not redo work.
+
+Usage:
+    python backup_scheduler.py --config scheduler.json
+    python backup_scheduler.py --config scheduler.json --once
+
+Options:
+    --config      Path to the JSON scheduler configuration
+    --once        Run the backups that are due now (or never ran), then exit
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Set
+
+from backup_snapshots import QdrantSnapshotBackup
+from change_detection import DEFAULT_MAX_AGE, STATE_FILENAME, ChangeDetector
+from qdrant_http import DEFAULT_POLL_TIMEOUT, QdrantHTTPClient, QdrantRequestError, format_size
+from snapshot_metrics import MetricsRecorder
+from snapshot_repository import SnapshotRepository
+from snapshot_storage import storage_from_options
+from transfer_throttle import throttle_from_options
+
+
+DEFAULT_INTERVAL = 24 * 3600
+DEFAULT_RETENTION = {"last": 1, "daily": 7, "weekly": 4, "monthly": 6}
+
+# strftime formats that define the GFS buckets; one backup is kept per bucket
+RETENTION_BUCKETS = {
+    "hourly": "%Y-%m-%d %H",
+    "daily": "%Y-%m-%d",
+    "weekly": "%G-W%V",
+    "monthly": "%Y-%m",
+    "yearly": "%Y",
+}
+
+
+def select_retained(backups: List[Dict[str, Any]], policy: Dict[str, int]) -> Set[str]:
+    """
+    Return the snapshot names to keep under a GFS retention policy.
+
+    policy maps "last" (newest N backups) and the RETENTION_BUCKETS names to
+    how many of each to keep; for every period the newest backup in each of
+    the N most recent periods is kept.
+    """
+    ordered = sorted(backups, key=lambda b: b["time"], reverse=True)
+    keep = {b["snapshot"] for b in ordered[:policy.get("last", 0)]}
+
+    for period, fmt in RETENTION_BUCKETS.items():
+        count = policy.get(period, 0)
+        seen = set()
+        for backup in ordered:
+            if len(seen) >= count:
+                break
+            bucket = datetime.fromtimestamp(backup["time"]).strftime(fmt)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(backup["snapshot"])
+
+    return keep
+
+
+class BackupScheduler:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.max_concurrent = max(1, config.get("max_concurrent", 1))
+        self.jitter = config.get("jitter", 300)
+        self.state_file = config.get("state_file", "./backup_scheduler_state.json")
+        self.discover_interval = config.get("discover_interval", 600)
+        self.defaults = config.get("defaults", {})
+        self.schedules = config.get("collections", {"*": {}})
+
+        repository = SnapshotRepository(config["repository"]) if config.get("repository") else None
+        # output_dir can also be s3:// or sftp://, with the same option keys as
+        # backup_snapshots.py: s3_endpoint, s3_region, part_size, transfer_jobs, sftp_key
+        storage = None if repository else storage_from_options(config.get("output_dir", "./snapshots"), config)
+        change_detector = None
+        if config.get("skip_unchanged"):
+            state_dir = config.get("repository") or config.get("output_dir", "./snapshots")
+            if storage and storage.remote:
+                # Next to the scheduler state if the backups are not on a local disk
+                state_dir = os.path.dirname(self.state_file) or "."
+            change_detector = ChangeDetector(
+                config.get("change_state") or os.path.join(state_dir, STATE_FILENAME),
+                sample_points=config.get("fingerprint_sample", 0),
+                max_age=config.get("max_unchanged_age", DEFAULT_MAX_AGE / 3600) * 3600
+            )
+        client = QdrantHTTPClient(
+            host=config.get("host", "http://localhost:6333"),
+            api_key=config.get("api_key"),
+            pool_size=max(self.max_concurrent, 2)
+        )
+        self.backup = QdrantSnapshotBackup(
+            host=config.get("host", "http://localhost:6333"),
+            api_key=config.get("api_key"),
+            output_dir=config.get("output_dir", "./snapshots"),
+            jobs=self.max_concurrent,
+            snapshot_jobs=config.get("snapshot_jobs"),
+            client=client,
+            repository=repository,
+            compression=config.get("compress"),
+            compression_level=config.get("compress_level"),
+            compression_threads=config.get("compress_threads", 1),
+            delete_remote=self.defaults.get("delete_remote", True),
+            no_wait=config.get("no_wait", False),
+            poll_timeout=config.get("poll_timeout", DEFAULT_POLL_TIMEOUT),
+            export=config.get("export", False),
+            metrics=MetricsRecorder(
+                "backup",
+                jsonl_path=config.get("metrics_jsonl"),
+                prometheus_path=config.get("metrics_prom"),
+                pushgateway_url=config.get("pushgateway")
+            ),
+            change_detector=change_detector,
+            unchanged_action=config.get("unchanged_action", "link"),
+            # Same keys as the backup_snapshots.py options: max_bandwidth, latency_target, ...
+            throttle=throttle_from_options(config, client, slots=self.max_concurrent),
+            storage=storage
+        )
+
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+        self._running: Set[str] = set()
+        self._stop = threading.Event()
+        self._collections: List[str] = []
+        self._last_discovery = 0.0
+        # Set while repository chunks wait to be pruned until no backup is writing
+        self._prune_pending = False
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_file):
+            return {"collections": {}}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Warning: could not read state file '{self.state_file}' ({e}), starting fresh")
+            return {"collections": {}}
+
+    def _save_state(self) -> None:
+        """Write the state file atomically (caller holds _state_lock)"""
+        temp_path = self.state_file + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self.state_file)
+
+    def _collection_state(self, collection_name: str) -> Dict[str, Any]:
+        return self.state["collections"].setdefault(collection_name, {"backups": []})
+
+    def settings(self, collection_name: str) -> Dict[str, Any]:
+        """Effective settings for a collection: defaults, then '*', then its own entry"""
+        settings = {"interval": DEFAULT_INTERVAL, "retention": DEFAULT_RETENTION, "delete_remote": True}
+        settings.update(self.defaults)
+        settings.update(self.schedules.get("*", {}))
+        settings.update(self.schedules.get(collection_name, {}))
+        return settings
+
+    def collections(self) -> List[str]:
+        """Configured collections, plus all server collections if '*' is configured"""
+        named = [name for name in self.schedules if name != "*"]
+        if "*" not in self.schedules:
+            return named
+
+        if time.time() - self._last_discovery >= self.discover_interval:
+            try:
+                response = self.backup.client.request_json("GET", "/collections")
+                self._collections = [col["name"] for col in response["result"]["collections"]]
+                self._last_discovery = time.time()
+            except (QdrantRequestError, KeyError, TypeError) as e:
+                print(f"Error listing collections: {e}")
+
+        return sorted(set(named) | set(self._collections))
+
+    def next_run(self, collection_name: str) -> float:
+        """When the collection is due next"""
+        interval = self.settings(collection_name)["interval"]
+        collection_state = self._collection_state(collection_name)
+        last = collection_state.get("last_success")
+
+        # Retry failed collections sooner, but never more often than every 5 minutes
+        if collection_state.get("last_attempt", 0) > (last or 0):
+            return collection_state["last_attempt"] + min(interval, max(300, interval / 10))
+            
+        if last is None:
+            # First run: spread collections over the jitter window with an
+            # offset that is stable per collection, so restarts keep the slot
+            first_seen = collection_state.setdefault("first_seen", time.time())
+            offset = zlib.crc32(collection_name.encode()) % max(1, min(interval, self.jitter or 1))
+            return first_seen + offset
+
+        return last + interval + collection_state.get("jitter", 0)
+
+    def run_backup(self, collection_name: str) -> None:
+        """Back up one collection, record it and apply retention"""
+        started = time.time()
+        print(f"\n[{datetime.now():%Y-%m-%d %H:%M:%S}] Starting backup of '{collection_name}'")
+
+        self.backup.delete_remote_overrides[collection_name] = self.settings(collection_name)["delete_remote"]
+        try:
+            success = self.backup.backup_collection(collection_name)
+        except Exception as e:
+            print(f"Unexpected error backing up collection '{collection_name}': {e}")
+            success = False
+
+        stats = self.backup.stats.get(collection_name, {})
+        with self._state_lock:
+            collection_state = self._collection_state(collection_name)
+            collection_state["last_attempt"] = started
+            if success:
+                collection_state["last_success"] = started
+                collection_state["jitter"] = random.uniform(0, self.jitter)
+                # A skipped unchanged collection has no new backup to keep
+                if stats.get("unchanged") != "skipped":
+                    collection_state["backups"].append({
+                        "snapshot": stats.get("snapshot"),
+                        "path": stats.get("path"),
+                        "time": started,
+                        "size": stats.get("size", 0),
+                    })
+                    self._apply_retention(collection_name)
+            self._save_state()
+            self._running.discard(collection_name)
+            if self._prune_pending:
+                self._prune_repository()
+
+        # Keep the textfile current after every backup, not only at exit
+        self.backup.metrics.collection_result(collection_name, success, time.time() - started)
+        try:
+            self.backup.metrics.write_prometheus()
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+        status = "SUCCESS" if success else "FAILED"
+        if success and stats.get("unchanged"):
+            status = f"UNCHANGED ({stats['unchanged']})"
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Backup of '{collection_name}': {status} "
+              f"({format_size(stats.get('size', 0))} in {time.time() - started:.2f}s)")
+
+    def _apply_retention(self, collection_name: str) -> None:
+        """Delete backups the retention policy no longer keeps (caller holds _state_lock)"""
+        collection_state = self._collection_state(collection_name)
+        policy = self.settings(collection_name)["retention"]
+        keep = select_retained(collection_state["backups"], policy)
+
+        retained = []
+        pruned = False
+        for backup in collection_state["backups"]:
+            if backup["snapshot"] in keep:
+                retained.append(backup)
+                continue
+
+            print(f"Retention: removing backup '{backup['snapshot']}' of '{collection_name}'")
+            try:
+                if self.backup.repository:
+                    self.backup.repository.remove_backup(collection_name, backup["snapshot"])
+                    pruned = True
+                elif backup.get("path") and self.backup.storage.remote:
+                    self.backup.storage.delete(self.backup.storage.key(backup["path"]))
+                elif backup.get("path") and os.path.exists(backup["path"]):
+                    os.remove(backup["path"])
+            except OSError as e:
+                print(f"Error removing backup '{backup['snapshot']}': {e}")
+                retained.append(backup)
+
+        collection_state["backups"] = retained
+        if pruned:
+            self._prune_repository()
+
+    def _prune_repository(self) -> None:
+        """
+        Free the chunks of removed backups (caller holds _state_lock).
+
+        Chunks of a backup that is still being written are not referenced by
+        any index yet, so the repository cannot be pruned while other backups
+        run; it is then pruned after the next backup that finishes instead.
+        """
+        result = self.backup.repository.prune(blocking=False)
+        self._prune_pending = result is None
+        if result is None:
+            print("Repository busy, pruning after the running backups have finished")
+            return
+        print(f"Pruned {result['removed_chunks']} unused chunks ({format_size(result['freed_bytes'])})")
+
+    def due_collections(self, include_new: bool = False) -> List[str]:
+        """Collections whose next run has come; include_new also returns never backed up ones"""
+        now = time.time()
+        with self._state_lock:
+            due = [
+                c for c in self.collections()
+                if c not in self._running and (
+                    self.next_run(c) <= now
+                    or (include_new and "last_success" not in self._collection_state(c))
+                )
+            ]
+            return sorted(due, key=self.next_run)
+
+    def run(self, once: bool = False, tick: float = 10.0) -> None:
+        """Main loop; with once=True run what is due now and return"""
+        attempted = set()
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            futures = []
+            while not self._stop.is_set():
+                due = [c for c in self.due_collections(include_new=once) if c not in attempted]
+                for collection in due:
+                    # Global cap: only hand out as many backups as there are workers
+                    if len(self._running) >= self.max_concurrent:
+                        break
+                    with self._state_lock:
+                        self._running.add(collection)
+                    if once:
+                        attempted.add(collection)
+                    futures.append(executor.submit(self.run_backup, collection))
+                    
+                if once:
+                    # Wait for this round, then pick up collections that did
+                    # not fit under the concurrency cap
+                    for future in futures:
+                        future.result()
+                    futures = []
+                    if not [c for c in self.due_collections(include_new=True) if c not in attempted]:
+                        return
+                    continue
+                # A daemon runs forever; don't hold on to finished backups
+                futures = [future for future in futures if not future.done()]
+                self._stop.wait(tick)
+
+            print("Stopping scheduler, waiting for running backups to finish...")
+
+    def stop(self, *_args) -> None:
+        self._stop.set()
+
+
+def load_config(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"Error reading config file '{path}': {e}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Qdrant Backup Scheduler",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Example configuration (JSON):
+  {
+    "host": "http://localhost:6333",
+    "api_key": "my_api_key",
+    "output_dir": "/backups/qdrant",
+    "max_concurrent": 2,
+    "jitter": 600,
+    "state_file": "/backups/qdrant/scheduler_state.json",
+    "defaults": {
+      "interval": 86400,
+      "delete_remote": true,
+      "retention": {"last": 2, "daily": 7, "weekly": 4, "monthly": 6}
+    },
+    "collections": {
+      "*": {},
+      "hot_collection": {"interval": 3600, "retention": {"last": 3, "hourly": 24, "daily": 7}}
+    }
+  }
+"""
+    )
+    parser.add_argument("--config", required=True, help="Path to the JSON scheduler configuration")
+    parser.add_argument("--once", action="store_true", help="Run the backups that are due now (or never ran), then exit")
+    args = parser.parse_args()
+
+    scheduler = BackupScheduler(load_config(args.config))
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+
+    print(f"\nQdrant Backup Scheduler - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print(f"Host: {scheduler.backup.host}")
+    print(f"Max concurrent backups: {scheduler.max_concurrent}")
+    if scheduler.backup.throttle.limited:
+        print(f"Throttle: {scheduler.backup.throttle.describe()}")
+    print(f"State file: {scheduler.state_file}")
+    print("-" * 60)
+
+    scheduler.run(once=args.once)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\nUnexpected error: {e}")
+        sys.exit(1)
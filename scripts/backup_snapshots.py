@@ -14,62 +14,176 @@ Options:
     --all         Backup all collections
     --host        Qdrant host URL (default: http://localhost:6333)
     --api-key     Qdrant API key (if required)
-    --output-dir  Directory to save snapshots (default: ./snapshots)
+    --output-dir  Directory, s3://bucket/prefix or sftp://user@host/path to save snapshots (default: ./snapshots)
+    --jobs        Number of collections to back up in parallel (default: 1)
+    --timeout     Read timeout in seconds for API calls; snapshot creation waits without one (default: 600)
+    --retries     Retries for failed idempotent API calls (default: 5)
+    --chunk-size  Download chunk size in KiB (default: 1024)
+    --repository  Store snapshots in a deduplicated chunk repository instead of --output-dir
+    --compress    Compress downloaded snapshots (gzip or zstd)
+    --delete-remote  Delete the snapshot from the server after a successful download
+    --shards      Back up each shard separately (distributed deployments)
+    --no-wait     Start snapshots with wait=false and poll until they are ready
+    --export      Export points with the scroll API instead of creating snapshots
+    --skip-unchanged  Do not back up collections that did not change since their last backup
+    --s3-endpoint Endpoint of an S3-compatible store such as MinIO (default: AWS)
+    --transfer-jobs  Parts of one snapshot uploaded to S3 in parallel (default: 4)
+    --max-bandwidth  Cap the bandwidth of all snapshot downloads together (MB/s)
+    --latency-target Adapt download bandwidth and concurrency to keep search latency under this (ms)
+    --metrics-jsonl  Append per-phase timings and a run summary as JSON lines
+    --metrics-prom   Write metrics to a Prometheus textfile
+    --summary-json   Write a machine-readable summary of the run
+
+The exit status is 0 only if every collection was backed up.
 """
 
 import argparse
+import hashlib
+import json
 import os
+import posixpath
+import re
+import shutil
 import sys
+import threading
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 
+from qdrant_http import (
+    DEFAULT_POLL_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    QdrantHTTPClient,
+    QdrantRequestError,
+    add_client_arguments,
+    format_size,
+    parse_peer_urls,
+    poll,
+    record_retry,
+    shard_clients,
+)
+from change_detection import DEFAULT_MAX_AGE, STATE_FILENAME, ChangeDetector
+from point_export import DEFAULT_EXPORT_BATCH_SIZE, POINTS_EXTENSION, PointWriter
+from snapshot_compression import COMPRESSION_EXTENSIONS, CompressingWriter, check_compression
+from snapshot_metrics import MetricsRecorder, add_metrics_arguments, metrics_from_args
+from snapshot_repository import RepositoryError, SnapshotRepository
+from snapshot_storage import LocalStorage, SnapshotStorage, add_storage_arguments, storage_from_options
+from transfer_throttle import TransferThrottle, add_throttle_arguments, throttle_from_options
+
+
+# Larger reads than the old 8 KiB keep per-chunk overhead low on fast links
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# The date part of snapshot, export and shard backup names
+BACKUP_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}")
+UNCHANGED_ACTIONS = ("link", "skip")
+# '.part' files not written to for this long were left by a run that was killed
+STALE_PART_AGE = 24 * 3600
+
 
 class QdrantSnapshotBackup:
     def __init__(
         self,
         host: str = "http://localhost:6333",
         api_key: Optional[str] = None,
-        output_dir: str = "./snapshots"
+        output_dir: str = "./snapshots",
+        jobs: int = 1,
+        snapshot_jobs: Optional[int] = None,
+        client: Optional[QdrantHTTPClient] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        repository: Optional[SnapshotRepository] = None,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        compression_threads: int = 1,
+        delete_remote: bool = False,
+        shards: bool = False,
+        peer_urls: Optional[Dict[int, str]] = None,
+        no_wait: bool = False,
+        poll_timeout: float = DEFAULT_POLL_TIMEOUT,
+        export: bool = False,
+        export_batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+        metrics: Optional[MetricsRecorder] = None,
+        change_detector: Optional[ChangeDetector] = None,
+        unchanged_action: str = "link",
+        throttle: Optional[TransferThrottle] = None,
+        storage: Optional[SnapshotStorage] = None
     ):
         self.host = host.rstrip("/")
         self.api_key = api_key
-        self.output_dir = output_dir
-        self.headers = {}
+        # Where backups are written; remote storage is rooted at output_dir's URL
+        self.storage = storage or LocalStorage(output_dir)
+        self.output_dir = self.storage.url
+        self.jobs = max(1, jobs)
+        self.chunk_size = chunk_size
+        self.repository = repository
+        self.compression = compression
+        self.compression_level = compression_level
+        self.compression_threads = compression_threads
+        self.delete_remote = delete_remote
+        # Per-collection delete_remote settings (the scheduler's collection entries)
+        self.delete_remote_overrides: Dict[str, bool] = {}
+        self.shards = shards
+        self.peer_urls = peer_urls or {}
+        self.no_wait = no_wait
+        self.poll_timeout = poll_timeout
+        self.export = export
+        self.export_batch_size = max(1, export_batch_size)
+        self.change_detector = change_detector
+        if unchanged_action not in UNCHANGED_ACTIONS:
+            raise ValueError(f"Unknown action for unchanged collections: {unchanged_action}")
+        self.unchanged_action = unchanged_action
+        # Bandwidth and concurrency limits for snapshot downloads (none by default)
+        self.throttle = throttle or TransferThrottle()
+        if compression:
+            check_compression(compression)
+        
+        # Shared keep-alive session; one pooled connection per worker is enough
+        self.client = client or QdrantHTTPClient(
+            host=self.host,
+            api_key=api_key,
+            pool_size=max(DEFAULT_POOL_SIZE, self.jobs)
+        )
+        
+        # Per-collection timing and size information, filled in by backup_collection
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._stats_lock = threading.Lock()
         
-        if api_key:
-            self.headers["api-key"] = api_key
+        # Per-phase timings, bytes and retries (recorded even without outputs)
+        self.metrics = metrics or MetricsRecorder("backup")
+        
+        # Limit how many snapshots Qdrant builds at once; downloads of finished
+        # snapshots keep running in the other workers meanwhile
+        self._snapshot_slots = threading.Semaphore(max(1, snapshot_jobs or self.jobs))
             
         # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
+        if not repository and not self.storage.remote:
+            os.makedirs(output_dir, exist_ok=True)
+            self._remove_stale_parts()
+            
+    def _remove_stale_parts(self) -> None:
+        """Delete '.part' files that a killed run left in the output directory"""
+        cutoff = time.time() - STALE_PART_AGE
+        for dirpath, _, filenames in os.walk(self.output_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if filename.endswith(".part") and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        print(f"Removed stale partial download '{path}'")
+                except OSError as e:
+                    print(f"Error removing stale partial download '{path}': {e}")
         
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Make HTTP request to Qdrant API with error handling"""
-        url = f"{self.host}{endpoint}"
-        
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                **kwargs
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            print(f"Error: Could not connect to Qdrant at {self.host}")
-            sys.exit(1)
-        except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error: {e}")
-            print(f"Response: {response.text}")
-            sys.exit(1)
-        except requests.exceptions.RequestException as e:
-            print(f"Request Error: {e}")
-            sys.exit(1)
-        except ValueError:
-            print(f"Error: Invalid JSON response from Qdrant")
-            sys.exit(1)
+            return self.client.request_json(method, endpoint, **kwargs)
+        except QdrantRequestError as e:
+            print(f"Error: {e}")
+            if e.response_text:
+                print(f"Response: {e.response_text}")
+            raise
             
     def list_collections(self) -> List[str]:
         """Get list of all collections from Qdrant"""
@@ -79,6 +193,8 @@ class QdrantSnapshotBackup:
             response = self._make_request("GET", "/collections")
             collections = [col["name"] for col in response["result"]["collections"]]
             return collections
+        except QdrantRequestError:
+            sys.exit(1)
         except (KeyError, TypeError) as e:
             print(f"Error parsing collections response: {e}")
             sys.exit(1)
@@ -86,66 +202,807 @@ class QdrantSnapshotBackup:
     def create_snapshot(self, collection_name: str) -> Dict[str, Any]:
         """Create a snapshot for the specified collection"""
         print(f"Creating snapshot for collection '{collection_name}'...")
+        return self._request_snapshot(
+            f"/collections/{collection_name}/snapshots",
+            self.client,
+            f"collection '{collection_name}'"
+        )
+            
+    def create_shard_snapshot(
+        self,
+        collection_name: str,
+        shard_id: int,
+        client: QdrantHTTPClient
+    ) -> Optional[Dict[str, Any]]:
+        """Create a snapshot of one shard on the node `client` talks to"""
+        print(f"Creating snapshot of shard {shard_id} of collection '{collection_name}'...")
+        return self._request_snapshot(
+            f"/collections/{collection_name}/shards/{shard_id}/snapshots",
+            client,
+            f"shard {shard_id} of collection '{collection_name}'"
+        )
+        
+    def _request_snapshot(
+        self,
+        endpoint: str,
+        client: QdrantHTTPClient,
+        description: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Create a snapshot at `endpoint` and return its description.
+        
+        Normally the request is held open until the snapshot is ready, which
+        a proxy in front of Qdrant may cut off for large collections. With
+        no_wait the snapshot is started with wait=false and the snapshot list
+        is polled until the new snapshot shows up.
+        """
+        try:
+            if not self.no_wait:
+                # Held open until the snapshot is ready, however long that takes. Not
+                # retried: a timed-out call keeps running and a retry would start a
+                # second snapshot next to it
+                response = client.request_json(
+                    "POST", endpoint, params={"wait": "true"}, timeout=client.blocking_timeout, retry=False
+                )
+                return response["result"]
+                
+            existing = {s["name"] for s in client.request_json("GET", endpoint).get("result") or []}
+            # Not retried: a retry of an accepted call would build a second snapshot
+            response = client.request_json("POST", endpoint, params={"wait": "false"}, retry=False)
+            started = response.get("result")
+            expected = started.get("name") if isinstance(started, dict) else None
+            
+            def check():
+                for snapshot in client.request_json("GET", endpoint).get("result") or []:
+                    if snapshot["name"] == expected or (not expected and snapshot["name"] not in existing):
+                        return snapshot
+                return None
+                
+            return poll(check, f"snapshot of {description}", timeout=self.poll_timeout)
+        except (KeyError, TypeError, QdrantRequestError) as e:
+            print(f"Error creating snapshot of {description}: {e}")
+            if getattr(e, "response_text", None):
+                print(f"Response: {e.response_text}")
+            return None
+            
+    def list_snapshots(self, collection_name: str) -> List[Dict[str, Any]]:
+        """List the snapshots stored on the server for a collection"""
+        response = self._make_request("GET", f"/collections/{collection_name}/snapshots")
+        return response.get("result") or []
+        
+    def delete_snapshot(
+        self,
+        collection_name: str,
+        snapshot_name: str,
+        shard_id: Optional[int] = None,
+        client: Optional[QdrantHTTPClient] = None
+    ) -> bool:
+        """Delete a snapshot from the server (the downloaded copy is kept)"""
+        print(f"Deleting server-side snapshot '{snapshot_name}'...")
         
         try:
-            response = self._make_request(
-                "POST", 
-                f"/collections/{collection_name}/snapshots",
+            (client or self.client).request_json(
+                "DELETE",
+                self._snapshot_url(collection_name, snapshot_name, shard_id),
                 params={"wait": "true"}
             )
-            return response["result"]
-        except (KeyError, TypeError) as e:
-            print(f"Error creating snapshot for collection '{collection_name}': {e}")
-            return None
+            return True
+        except QdrantRequestError as e:
+            print(f"Error deleting snapshot '{snapshot_name}': {e}")
+            return False
             
-    def download_snapshot(self, collection_name: str, snapshot_name: str) -> str:
-        """Download a snapshot file"""
-        snapshot_url = f"/collections/{collection_name}/snapshots/{snapshot_name}"
-        local_path = os.path.join(self.output_dir, snapshot_name)
+    def download_snapshot(
+        self,
+        collection_name: str,
+        snapshot_name: str,
+        expected_size: Optional[int] = None,
+        checksum: Optional[str] = None,
+        shard_id: Optional[int] = None,
+        output_dir: Optional[str] = None,
+        client: Optional[QdrantHTTPClient] = None
+    ) -> str:
+        """
+        Download a snapshot file.
+        
+        With shard_id, a shard snapshot is downloaded instead, from the node
+        `client` talks to. output_dir overrides the tool's output directory.
+        
+        The file is written to '<name>.part' and renamed once it is complete,
+        so a partial download never looks like a finished snapshot. Interrupted
+        transfers are resumed with HTTP Range requests; if the download still
+        fails, the '.part' file is deleted. If the size or SHA-256 checksum
+        reported by Qdrant is given, the file is verified before it is renamed.
+        
+        With compression enabled the stream is compressed on the way to disk
+        and the file gets a '.gz'/'.zst' suffix.
+        
+        With remote storage the stream goes straight to it (see
+        _download_to_storage) and the location of the stored file is returned.
+        """
+        snapshot_url = self._snapshot_url(collection_name, snapshot_name, shard_id)
+        if self.storage.remote:
+            key = posixpath.join(self.storage.key(output_dir or self.output_dir), snapshot_name)
+            if self.compression:
+                key += COMPRESSION_EXTENSIONS[self.compression]
+            return self._download_to_storage(key, snapshot_url, snapshot_name, expected_size, checksum, client)
+            
+        local_path = os.path.join(output_dir or self.output_dir, snapshot_name)
+        if self.compression:
+            local_path += COMPRESSION_EXTENSIONS[self.compression]
+        temp_path = local_path + ".part"
         
         print(f"Downloading snapshot '{snapshot_name}'...")
         
         try:
-            url = f"{self.host}{snapshot_url}"
-            response = requests.get(url, headers=self.headers, stream=True)
-            response.raise_for_status()
-            
-            with open(local_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    
-            print(f"Snapshot saved to: {local_path}")
+            with open(temp_path, "wb") as f:
+                hasher = hashlib.sha256()
+                if self.compression:
+                    writer = CompressingWriter(
+                        f,
+                        method=self.compression,
+                        level=self.compression_level,
+                        threads=self.compression_threads
+                    )
+                    self._stream_snapshot(writer, hasher, snapshot_url, snapshot_name, client)
+                    writer.close()
+                    size = writer.tell()
+                else:
+                    self._stream_snapshot(f, hasher, snapshot_url, snapshot_name, client)
+                    size = f.tell()
+                
+            if not self._verify_download(snapshot_name, size, hasher.hexdigest(), expected_size, checksum):
+                os.remove(temp_path)
+                return None
+                
+            os.replace(temp_path, local_path)
+            print(f"Snapshot saved to: {local_path}" + (" (checksum verified)" if checksum else ""))
+            if self.compression:
+                compressed_size = os.path.getsize(local_path)
+                print(f"Compressed {format_size(size)} to {format_size(compressed_size)} "
+                      f"({100.0 * compressed_size / max(size, 1):.0f}%)")
             return local_path
-        except requests.exceptions.RequestException as e:
+        except (QdrantRequestError, requests.exceptions.RequestException) as e:
             print(f"Error downloading snapshot '{snapshot_name}': {e}")
+            self._remove_partial(temp_path)
             return None
         except IOError as e:
             print(f"Error writing snapshot file '{local_path}': {e}")
+            self._remove_partial(temp_path)
+            return None
+            
+    @staticmethod
+    def _remove_partial(temp_path: str) -> None:
+        """Delete the '.part' file of a failed download"""
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing partial download '{temp_path}': {e}")
+            
+    def _download_to_storage(
+        self,
+        key: str,
+        snapshot_url: str,
+        snapshot_name: str,
+        expected_size: Optional[int],
+        checksum: Optional[str],
+        client: Optional[QdrantHTTPClient] = None
+    ) -> Optional[str]:
+        """
+        Stream a snapshot into remote storage, without a local copy.
+        
+        On S3 the stream is cut into parts that are uploaded in parallel
+        while the download goes on. An interrupted download is resumed with
+        a Range request, appending to the same upload; the upload is only
+        completed once the snapshot is verified, and aborted otherwise.
+        """
+        location = self.storage.location(key)
+        print(f"Downloading snapshot '{snapshot_name}' to '{location}'...")
+        
+        writer = None
+        try:
+            writer = self.storage.open_writer(key)
+            hasher = hashlib.sha256()
+            sink = writer
+            if self.compression:
+                sink = CompressingWriter(
+                    writer,
+                    method=self.compression,
+                    level=self.compression_level,
+                    threads=self.compression_threads
+                )
+            self._stream_snapshot(sink, hasher, snapshot_url, snapshot_name, client)
+            if self.compression:
+                sink.close()
+            size = sink.tell()
+            
+            if not self._verify_download(snapshot_name, size, hasher.hexdigest(), expected_size, checksum):
+                return None
+                
+            stored_size = writer.commit()
+            print(f"Snapshot saved to: {location}" + (" (checksum verified)" if checksum else ""))
+            if self.compression:
+                print(f"Compressed {format_size(size)} to {format_size(stored_size)} "
+                      f"({100.0 * stored_size / max(size, 1):.0f}%)")
+            return location
+        except (QdrantRequestError, requests.exceptions.RequestException) as e:
+            print(f"Error downloading snapshot '{snapshot_name}': {e}")
+            return None
+        except IOError as e:
+            print(f"Error writing snapshot to '{location}': {e}")
+            return None
+        finally:
+            if writer:
+                writer.abort()
+                
+    def _file_size(self, location: str) -> int:
+        """Size of a stored backup file"""
+        if self.storage.remote:
+            return self.storage.size(self.storage.key(location)) or 0
+        return os.path.getsize(location)
+        
+    def download_snapshot_to_repository(
+        self,
+        collection_name: str,
+        snapshot_name: str,
+        expected_size: Optional[int] = None,
+        checksum: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Download a snapshot straight into the deduplicated repository.
+        
+        The HTTP stream is chunked as it arrives, so only chunks that are not
+        in the repository yet are written to disk. The backup index is only
+        written once the whole snapshot has been received and verified.
+        """
+        snapshot_url = f"/collections/{collection_name}/snapshots/{snapshot_name}"
+        
+        print(f"Downloading snapshot '{snapshot_name}' into repository '{self.repository.path}'...")
+        
+        try:
+            with self.repository.writer(collection_name, snapshot_name) as writer:
+                hasher = hashlib.sha256()
+                self._stream_snapshot(writer, hasher, snapshot_url, snapshot_name)
+                
+                if not self._verify_download(snapshot_name, writer.tell(), hasher.hexdigest(), expected_size, checksum):
+                    return None
+
+                index = writer.commit(checksum=hasher.hexdigest())
+            print(f"Snapshot stored in repository: {len(index['chunks'])} chunks, "
+                  f"{writer.new_chunks} new ({format_size(writer.new_bytes)} written)")
+            return {"index": index, "new_bytes": writer.new_bytes}
+        except (QdrantRequestError, requests.exceptions.RequestException) as e:
+            print(f"Error downloading snapshot '{snapshot_name}': {e}")
+            return None
+        except IOError as e:
+            print(f"Error writing to repository '{self.repository.path}': {e}")
+            return None
+            
+    @staticmethod
+    def _snapshot_url(collection_name: str, snapshot_name: str, shard_id: Optional[int] = None) -> str:
+        if shard_id is None:
+            return f"/collections/{collection_name}/snapshots/{snapshot_name}"
+        return f"/collections/{collection_name}/shards/{shard_id}/snapshots/{snapshot_name}"
+        
+    def _stream_snapshot(
+        self,
+        f,
+        hasher,
+        snapshot_url: str,
+        snapshot_name: str,
+        client: Optional[QdrantHTTPClient] = None
+    ) -> None:
+        """Download a snapshot into f, resuming with Range requests after failures"""
+        client = client or self.client
+        failures = 0
+        while True:
+            try:
+                with self.throttle.transfer():
+                    self._download_to(f, hasher, snapshot_url, client)
+                return
+            except (QdrantRequestError, requests.exceptions.RequestException) as e:
+                if getattr(e, "status_code", None) == 416 and f.tell() > 0:
+                    # Nothing left to fetch: what we have is already complete
+                    return
+                failures += 1
+                if failures > client.retries:
+                    raise
+                record_retry()
+                delay = client.backoff_delay(failures - 1)
+                print(f"Download of '{snapshot_name}' interrupted at {format_size(f.tell())} "
+                      f"({e}), resuming in {delay:.1f}s")
+                time.sleep(delay)
+                
+    def _verify_download(
+        self,
+        snapshot_name: str,
+        size: int,
+        digest: str,
+        expected_size: Optional[int],
+        checksum: Optional[str]
+    ) -> bool:
+        """Compare a downloaded snapshot with the size/checksum Qdrant reported"""
+        if expected_size is not None and size != expected_size:
+            print(f"Error: snapshot '{snapshot_name}' is {size} bytes, expected {expected_size}")
+            return False
+            
+        if checksum and digest != checksum.lower():
+            print(f"Error: checksum mismatch for snapshot '{snapshot_name}' "
+                  f"(got {digest}, expected {checksum})")
+            return False
+            
+        return True
+        
+    def _download_to(self, f, hasher, snapshot_url: str, client: QdrantHTTPClient) -> None:
+        """Stream a snapshot into f, continuing from the current end of the file"""
+        offset = f.tell()
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        
+        response = client.request("GET", snapshot_url, headers=headers, stream=True)
+        with response:
+            # If the server ignored the Range header it sends the whole file;
+            # skip the bytes we already have
+            skip = offset if offset and response.status_code != 206 else 0
+            
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk[skip:]
+                    skip = 0
+                f.write(chunk)
+                hasher.update(chunk)
+                self.throttle.consume(len(chunk))
+                
+    def _record_stats(self, collection_name: str, **values) -> None:
+        """Store timing/size information for a collection"""
+        with self._stats_lock:
+            self.stats.setdefault(collection_name, {}).update(values)
+            
+    def backup_collection_shards(self, collection_name: str) -> bool:
+        """
+        Back up every shard of a collection as a separate snapshot.
+        
+        Shard snapshots are created and downloaded in parallel on the nodes
+        that hold them, into '<output-dir>/<collection>-shards-<date>/', next
+        to a manifest.json that lists the shards and their snapshot files.
+        The manifest is only written when all shards succeeded.
+        """
+        start_time = time.time()
+        
+        try:
+            shards = shard_clients(self.client, collection_name, self.peer_urls)
+        except (QdrantRequestError, KeyError, TypeError) as e:
+            print(f"Error listing shards of collection '{collection_name}': {e}")
+            return False
+            
+        backup_name = f"{collection_name}-shards-{datetime.now():%Y-%m-%d-%H-%M-%S}"
+        backup_dir = self.storage.location(backup_name)
+        if not self.storage.remote:
+            os.makedirs(backup_dir, exist_ok=True)
+        print(f"Backing up {len(shards)} shards of collection '{collection_name}' into '{backup_dir}'")
+        
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [
+                executor.submit(self._backup_shard, collection_name, shard_id, peer_id, client, backup_dir)
+                for shard_id, peer_id, client in shards
+            ]
+            entries = [future.result() for future in futures]
+            
+        size = sum(entry["size"] for entry in entries if entry)
+        self._record_stats(
+            collection_name,
+            snapshot=backup_name,
+            path=backup_dir,
+            size=size,
+            elapsed=time.time() - start_time
+        )
+        
+        if not all(entries):
+            failed = [shard_id for (shard_id, _, _), entry in zip(shards, entries) if not entry]
+            print(f"Failed to back up shards {failed} of collection '{collection_name}'")
+            return False
+            
+        manifest = {
+            "collection": collection_name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "shard_count": len(entries),
+            "shards": entries,
+        }
+        try:
+            self.storage.write_bytes(posixpath.join(backup_name, "manifest.json"), json.dumps(manifest, indent=2).encode())
+        except IOError as e:
+            print(f"Error writing the shard manifest of collection '{collection_name}': {e}")
+            return False
+            
+        print(f"Successfully backed up {len(entries)} shards of collection '{collection_name}'")
+        return True
+        
+    def _backup_shard(
+        self,
+        collection_name: str,
+        shard_id: int,
+        peer_id: Optional[int],
+        client: QdrantHTTPClient,
+        backup_dir: str
+    ) -> Optional[Dict[str, Any]]:
+        """Create and download one shard snapshot; returns its manifest entry"""
+        try:
+            with self._snapshot_slots:
+                with self.metrics.phase(collection_name, "snapshot", shard=shard_id) as phase:
+                    snapshot_info = self.create_shard_snapshot(collection_name, shard_id, client)
+                    phase.success = bool(snapshot_info)
+            if not snapshot_info:
+                return None
+                
+            with self.metrics.phase(collection_name, "download", shard=shard_id) as phase:
+                local_path = self.download_snapshot(
+                    collection_name,
+                    snapshot_info["name"],
+                    expected_size=snapshot_info.get("size"),
+                    checksum=snapshot_info.get("checksum"),
+                    shard_id=shard_id,
+                    output_dir=backup_dir,
+                    client=client
+                )
+                phase.success = bool(local_path)
+                if local_path:
+                    phase.bytes = snapshot_info.get("size") or self._file_size(local_path)
+            if not local_path:
+                # Not part of any backup; a later run takes a new snapshot anyway
+                self.delete_snapshot(collection_name, snapshot_info["name"], shard_id=shard_id, client=client)
+                return None
+                
+            if self._delete_remote(collection_name):
+                self.delete_snapshot(collection_name, snapshot_info["name"], shard_id=shard_id, client=client)
+                
+            return {
+                "shard_id": shard_id,
+                "peer_id": peer_id,
+                "snapshot": snapshot_info["name"],
+                "file": os.path.basename(local_path),
+                "size": self._file_size(local_path),
+                "checksum": snapshot_info.get("checksum"),
+            }
+        except Exception as e:
+            print(f"Unexpected error backing up shard {shard_id} of collection '{collection_name}': {e}")
             return None
             
+    def export_collection(self, collection_name: str) -> bool:
+        """
+        Export all points of a collection with the scroll API.
+        
+        Writes '<collection>-<date>.points' (see point_export.py) with the
+        collection config and every point, one scroll page at a time. Unlike
+        a snapshot the export does not depend on the Qdrant version, but it
+        is not a point-in-time copy: writes during the export may or may not
+        be included.
+        """
+        start_time = time.time()
+        export_name = f"{collection_name}-{datetime.now():%Y-%m-%d-%H-%M-%S}{POINTS_EXTENSION}"
+        key = export_name + (COMPRESSION_EXTENSIONS[self.compression] if self.compression else "")
+        location = self.storage.location(key)
+        
+        print(f"Exporting points of collection '{collection_name}'...")
+        
+        # Written as '.part' (or a pending upload) and only committed when complete
+        output = None
+        try:
+            config = self._make_request("GET", f"/collections/{collection_name}")["result"].get("config")
+            output = self.storage.open_writer(key)
+            sink = output
+            if self.compression:
+                sink = CompressingWriter(
+                    output,
+                    method=self.compression,
+                    level=self.compression_level,
+                    threads=self.compression_threads
+                )
+            writer = PointWriter(sink, collection_name, config)
+            
+            offset = None
+            last_report = time.time()
+            while True:
+                body = {"limit": self.export_batch_size, "with_payload": True, "with_vector": True}
+                if offset is not None:
+                    body["offset"] = offset
+                # Scroll only reads, so it is safe to retry
+                result = self.client.request_json(
+                    "POST",
+                    f"/collections/{collection_name}/points/scroll",
+                    json=body,
+                    retry=True
+                )["result"]
+                writer.write_points(result["points"])
+                
+                offset = result.get("next_page_offset")
+                if offset is None:
+                    break
+                if time.time() - last_report >= 10:
+                    print(f"  {collection_name}: {writer.count} points exported")
+                    last_report = time.time()
+                    
+            writer.close()
+            if self.compression:
+                sink.close()
+            size = output.commit()
+        except (QdrantRequestError, KeyError, TypeError) as e:
+            print(f"Error exporting collection '{collection_name}': {e}")
+            return False
+        except IOError as e:
+            print(f"Error writing export file '{location}': {e}")
+            return False
+        finally:
+            if output:
+                output.abort()
+                
+        elapsed = time.time() - start_time
+        self._record_stats(
+            collection_name,
+            snapshot=export_name,
+            path=location,
+            size=size,
+            points=writer.count,
+            download_time=elapsed,
+            elapsed=elapsed
+        )
+        print(f"Exported {writer.count} points of collection '{collection_name}' to: {location}")
+        return True
+        
     def backup_collection(self, collection_name: str) -> bool:
+        """
+        Back up a collection.
+        
+        With change detection, the collection is fingerprinted first. If it
+        has not changed since its last backup, no snapshot is created: the
+        previous backup is hard-linked under a new name (or, with the 'skip'
+        action, left as the latest backup).
+        """
+        # A long-running caller (the scheduler) backs up a collection many times
+        with self._stats_lock:
+            self.stats.pop(collection_name, None)
+        self.metrics.start_collection(collection_name)
+        if not self.change_detector:
+            return self._backup_collection(collection_name)
+            
+        try:
+            with self.metrics.phase(collection_name, "fingerprint"):
+                fingerprint = self.change_detector.fingerprint(self.client, collection_name)
+        except (QdrantRequestError, KeyError, TypeError) as e:
+            print(f"Could not fingerprint collection '{collection_name}' ({e}), backing it up")
+            return self._backup_collection(collection_name)
+            
+        mode = self.backup_mode()
+        previous = self.change_detector.previous_backup(collection_name, fingerprint, mode)
+        if previous and self._reuse_backup(collection_name, previous):
+            return True
+            
+        success = self._backup_collection(collection_name)
+        if success:
+            stats = self.stats.get(collection_name, {})
+            self.change_detector.record_backup(collection_name, fingerprint, mode, {
+                "snapshot": stats.get("snapshot"),
+                "path": stats.get("path"),
+                "size": stats.get("size", 0),
+            })
+        return success
+        
+    def _delete_remote(self, collection_name: str) -> bool:
+        """Whether to delete the server-side snapshot after a collection's backup"""
+        return self.delete_remote_overrides.get(collection_name, self.delete_remote)
+        
+    def backup_mode(self) -> str:
+        """How backups are made; a backup is only reused by a run in the same mode"""
+        if self.export:
+            mode = "export"
+        elif self.shards:
+            mode = "shards"
+        elif self.repository:
+            mode = "repository"
+        else:
+            mode = "snapshot"
+        return f"{mode}+{self.compression}" if self.compression else mode
+        
+    def _reuse_backup(self, collection_name: str, previous: Dict[str, Any]) -> bool:
+        """
+        Keep the previous backup of an unchanged collection.
+        
+        Returns False if that backup no longer exists (for example removed
+        by retention), in which case the collection has to be backed up.
+        """
+        start_time = time.time()
+        backup = previous["backup"]
+        since = datetime.fromtimestamp(previous["backed_up"]).strftime("%Y-%m-%d %H:%M:%S")
+        
+        index = None
+        if self.repository:
+            try:
+                index = self.repository.load_index(collection_name, backup["snapshot"])
+            except RepositoryError:
+                pass
+            available = index is not None
+        elif self.storage.remote:
+            try:
+                available = bool(backup.get("path")) and self.storage.exists(self.storage.key(backup["path"]))
+            except IOError:
+                available = False
+        else:
+            available = bool(backup.get("path")) and os.path.exists(backup["path"])
+        if not available:
+            print(f"Collection '{collection_name}' is unchanged, but its last backup "
+                  f"'{backup.get('snapshot')}' is gone; backing it up again")
+            return False
+            
+        with self.metrics.phase(collection_name, "unchanged") as phase:
+            phase.extra["avoided_bytes"] = backup.get("size", 0)
+            linked = None
+            if self.unchanged_action == "link":
+                linked = self._link_backup(collection_name, backup, index)
+                
+        action = "linked" if linked else "skipped"
+        phase.extra["action"] = action
+        self._record_stats(
+            collection_name,
+            unchanged=action,
+            snapshot=(linked or backup)["snapshot"],
+            path=(linked or backup).get("path"),
+            size=backup.get("size", 0),
+            avoided_bytes=backup.get("size", 0),
+            new_bytes=0,
+            elapsed=time.time() - start_time
+        )
+        self.change_detector.record_reuse(collection_name, linked)
+        
+        if linked:
+            print(f"Collection '{collection_name}' unchanged since {since}, "
+                  f"linked '{backup['snapshot']}' as '{linked['snapshot']}'")
+        else:
+            print(f"Collection '{collection_name}' unchanged since {since}, "
+                  f"skipped (latest backup: '{backup['snapshot']}')")
+        return True
+        
+    def _link_backup(
+        self,
+        collection_name: str,
+        backup: Dict[str, Any],
+        index: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Make the previous backup available under a name with today's date.
+        
+        Files and shard backup directories are hard-linked, so no data is
+        copied; in a repository a new index refers to the same chunks.
+        Returns the new backup, or None if it could not be linked (always
+        with remote storage, which has no hard links).
+        """
+        if self.storage.remote and index is None:
+            return None
+            
+        now = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+        snapshot_name, count = BACKUP_TIMESTAMP.subn(now, backup["snapshot"])
+        if not count or snapshot_name == backup["snapshot"]:
+            return None
+            
+        if index is not None:
+            self.repository.write_index(dict(
+                index, snapshot=snapshot_name, created=datetime.now().isoformat(timespec="seconds")
+            ))
+            return {"snapshot": snapshot_name, "path": None, "size": backup.get("size", 0)}
+            
+        source = backup["path"]
+        target = os.path.join(os.path.dirname(source), BACKUP_TIMESTAMP.sub(now, os.path.basename(source)))
+        if os.path.exists(target):
+            return None
+        try:
+            if os.path.isdir(source):
+                os.makedirs(target)
+                for filename in os.listdir(source):
+                    os.link(os.path.join(source, filename), os.path.join(target, filename))
+            else:
+                os.link(source, target)
+        except OSError as e:
+            print(f"Could not link the last backup of collection '{collection_name}' ({e}), skipping it instead")
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors=True)
+            return None
+        return {"snapshot": snapshot_name, "path": target, "size": backup.get("size", 0)}
+        
+    def _backup_collection(self, collection_name: str) -> bool:
         """Create and download a snapshot for a collection"""
+        if self.export:
+            with self.metrics.phase(collection_name, "export") as phase:
+                phase.success = self.export_collection(collection_name)
+                if phase.success:
+                    phase.bytes = self.stats[collection_name]["size"]
+                    phase.extra["points"] = self.stats[collection_name]["points"]
+            return phase.success
+        if self.shards:
+            return self.backup_collection_shards(collection_name)
+            
+        start_time = time.time()
+        
         try:
             # Create snapshot
-            snapshot_info = self.create_snapshot(collection_name)
+            with self._snapshot_slots:
+                with self.metrics.phase(collection_name, "snapshot") as phase:
+                    snapshot_info = self.create_snapshot(collection_name)
+                    phase.success = bool(snapshot_info)
+            self._record_stats(collection_name, snapshot_time=time.time() - start_time)
+            
             if not snapshot_info:
                 print(f"Failed to create snapshot for collection '{collection_name}'")
                 return False
                 
             # Download snapshot
             snapshot_name = snapshot_info["name"]
-            local_path = self.download_snapshot(collection_name, snapshot_name)
+            self._record_stats(collection_name, snapshot=snapshot_name)
+            download_start = time.time()
             
+            if self.repository:
+                with self.metrics.phase(collection_name, "download") as phase:
+                    stored = self.download_snapshot_to_repository(
+                        collection_name,
+                        snapshot_name,
+                        expected_size=snapshot_info.get("size"),
+                        checksum=snapshot_info.get("checksum")
+                    )
+                    phase.success = bool(stored)
+                    if stored:
+                        phase.bytes = stored["index"]["size"]
+                        phase.extra["new_bytes"] = stored["new_bytes"]
+                if not stored:
+                    print(f"Failed to download snapshot for collection '{collection_name}'")
+                    # Not part of any backup; a later run takes a new snapshot anyway
+                    self.delete_snapshot(collection_name, snapshot_name)
+                    return False
+                    
+                self._record_stats(
+                    collection_name,
+                    download_time=time.time() - download_start,
+                    size=stored["index"]["size"],
+                    new_bytes=stored["new_bytes"]
+                )
+                if self._delete_remote(collection_name):
+                    self.delete_snapshot(collection_name, snapshot_name)
+                print(f"Successfully backed up collection '{collection_name}'")
+                return True
+                
+            with self.metrics.phase(collection_name, "download") as phase:
+                local_path = self.download_snapshot(
+                    collection_name,
+                    snapshot_name,
+                    expected_size=snapshot_info.get("size"),
+                    checksum=snapshot_info.get("checksum")
+                )
+                phase.success = bool(local_path)
+                if local_path:
+                    # The uncompressed size is what was transferred
+                    phase.bytes = snapshot_info.get("size") or self._file_size(local_path)
+                    
             if local_path:
+                self._record_stats(
+                    collection_name,
+                    download_time=time.time() - download_start,
+                    size=self._file_size(local_path),
+                    path=local_path
+                )
+                if self._delete_remote(collection_name):
+                    self.delete_snapshot(collection_name, snapshot_name)
                 print(f"Successfully backed up collection '{collection_name}'")
                 return True
             else:
                 print(f"Failed to download snapshot for collection '{collection_name}'")
+                # Not part of any backup; a later run takes a new snapshot anyway
+                self.delete_snapshot(collection_name, snapshot_name)
                 return False
                 
         except Exception as e:
             print(f"Unexpected error backing up collection '{collection_name}': {e}")
             return False
+        finally:
+            self._record_stats(collection_name, elapsed=time.time() - start_time)
             
     def backup_all_collections(self) -> Dict[str, bool]:
         """Backup all collections"""
@@ -157,6 +1014,9 @@ class QdrantSnapshotBackup:
             
         print(f"Found {len(collections)} collections: {', '.join(collections)}")
         
+        if self.jobs > 1:
+            return self._backup_collections_parallel(collections)
+            
         results = {}
         for collection in collections:
             print(f"\n{'=' * 50}")
@@ -167,6 +1027,38 @@ class QdrantSnapshotBackup:
             results[collection] = success
             
         return results
+        
+    def _backup_collections_parallel(self, collections: List[str]) -> Dict[str, bool]:
+        """Backup collections using a bounded pool of worker threads"""
+        print(f"Running {self.jobs} backup workers in parallel")
+        
+        results = {}
+        total = len(collections)
+        
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {
+                executor.submit(self.backup_collection, collection): collection
+                for collection in collections
+            }
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                collection = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"Unexpected error backing up collection '{collection}': {e}")
+                    success = False
+                    
+                results[collection] = success
+                stats = self.stats.get(collection, {})
+                status = "SUCCESS" if success else "FAILED"
+                print(
+                    f"[{done}/{total}] {collection}: {status} "
+                    f"({format_size(stats.get('size', 0))} in {stats.get('elapsed', 0):.2f}s)"
+                )
+                
+        # Keep the summary in the order Qdrant listed the collections
+        return {collection: results[collection] for collection in collections}
 
 
 def print_usage():
@@ -188,7 +1080,50 @@ Options:
   --all                 Backup all collections
   --host <url>          Qdrant host URL (default: http://localhost:6333)
   --api-key <key>       Qdrant API key (if required)
-  --output-dir <path>   Directory to save snapshots (default: ./snapshots)
+  --output-dir <path>   Directory to save snapshots (default: ./snapshots), or
+                        s3://bucket/prefix or sftp://user@host/path to stream them there
+  --jobs <n>            Number of collections to back up in parallel (default: 1)
+  --snapshot-jobs <n>   Max snapshots created on the server at once (default: same as --jobs)
+  --timeout <sec>       Read timeout for API calls; snapshot creation waits without one (default: 600)
+  --connect-timeout <s> Connect timeout (default: 10)
+  --retries <n>         Retries for failed idempotent API calls (default: 5)
+  --chunk-size <kib>    Download chunk size in KiB (default: 1024)
+  --repository <path>   Store snapshots in a deduplicated chunk repository
+  --prune               Remove repository chunks no backup refers to (with --repository)
+  --compress <method>   Compress downloaded snapshots: gzip or zstd (zstd needs 'zstandard')
+  --compress-level <n>  Compression level (default: 6 for gzip, 3 for zstd)
+  --compress-threads <n> Threads used for compression (default: 1)
+  --delete-remote       Delete the snapshot from the server after it was downloaded
+  --shards              Back up each shard separately, in parallel on the nodes holding them
+  --peer-url <id=url>   HTTP address of a cluster peer for --shards (repeatable)
+  --no-wait             Start snapshots with wait=false and poll until they are ready
+  --poll-timeout <sec>  Max time to poll for a --no-wait snapshot (default: 21600)
+  --export              Export points with the scroll API instead of creating snapshots
+  --export-batch-size <n> Points read per scroll request with --export (default: 1000)
+  --skip-unchanged      Do not back up collections that did not change since their last backup
+  --unchanged-action <a> link: hard-link the last backup under a new name (default); skip: keep it as is
+  --change-state <path> Change detection state file (default: backup-state.json in the output directory)
+  --fingerprint-sample <n> Also hash the first N points to detect changes (default: 0, counts only)
+  --max-unchanged-age <h> Back up unchanged collections again after this many hours (default: 168, 0 = never)
+  --s3-endpoint <url>   Endpoint of an S3-compatible store, e.g. http://minio:9000 (default: AWS)
+  --s3-region <region>  S3 region (default: $AWS_REGION or us-east-1)
+  --part-size <MiB>     S3 multipart part size (default: 16)
+  --transfer-jobs <n>   Parts of one snapshot uploaded in parallel (default: 4)
+  --sftp-key <path>     Private key for sftp:// output (needs 'paramiko')
+  --max-bandwidth <MB/s> Hard cap on the bandwidth of all snapshot downloads together
+  --latency-target <ms> Adapt download bandwidth and parallel downloads to keep search latency under this
+  --min-bandwidth <MB/s> Bandwidth never throttled below with --latency-target (default: 1)
+  --canary-collection <name> Collection searched to measure latency
+  --canary-query <json|@file> Body of the canary search (default: a search with a stored vector)
+  --canary-host <url>   Send canary searches here, e.g. through Caddy (default: --host)
+  --latency-metric <selector> Read latency from a Prometheus histogram or gauge instead of a canary search
+  --latency-metrics-url <url> Metrics endpoint for --latency-metric (default: <host>/metrics)
+  --latency-quantile <q> Quantile of a --latency-metric histogram (default: 0.99)
+  --probe-interval <sec> Seconds between latency probes (default: 2)
+  --metrics-jsonl <path> Append per-phase timings, bytes and retries as JSON lines
+  --metrics-prom <path> Write metrics to a Prometheus textfile (node_exporter textfile collector)
+  --pushgateway <url>   Push the metrics to a Prometheus Pushgateway
+  --summary-json <path> Write a machine-readable summary of the run
   --help                Show this help message and exit
 
 Examples:
@@ -204,6 +1139,36 @@ Examples:
 
   # Specify custom output directory
   ./backup_snapshots.py --all --output-dir /path/to/backups
+
+  # Backup all collections with 4 workers, building at most 2 snapshots at a time
+  ./backup_snapshots.py --all --jobs 4 --snapshot-jobs 2
+
+  # Backup all collections into a deduplicated repository
+  ./backup_snapshots.py --all --repository /backups/qdrant-repo
+
+  # Compress snapshots with zstd on 4 threads
+  ./backup_snapshots.py --all --compress zstd --compress-threads 4
+
+  # Back up the shards of a distributed collection in parallel
+  ./backup_snapshots.py --collection my_collection --shards --jobs 8
+
+  # Large collections behind a proxy with a short timeout: poll instead of waiting
+  ./backup_snapshots.py --all --jobs 4 --no-wait
+
+  # Version-independent export of all points (for upgrades and migrations)
+  ./backup_snapshots.py --all --export --compress zstd
+
+  # Nightly cron job feeding node_exporter's textfile collector
+  ./backup_snapshots.py --all --metrics-prom /var/lib/node_exporter/qdrant_backup.prom
+
+  # Nightly backup that only snapshots collections with changes
+  ./backup_snapshots.py --all --skip-unchanged --fingerprint-sample 1000
+
+  # Daytime backup that keeps search latency under 50 ms, never above 100 MB/s
+  ./backup_snapshots.py --all --jobs 4 --max-bandwidth 100 --latency-target 50 --canary-collection my_collection
+
+  # Stream snapshots straight into a MinIO bucket (credentials from AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY)
+  ./backup_snapshots.py --all --output-dir s3://qdrant-backups/nightly --s3-endpoint http://minio:9000
 """)
 
 
@@ -224,6 +1189,33 @@ Examples:
 
   # Specify custom output directory
   %(prog)s --all --output-dir /path/to/backups
+
+  # Backup all collections with 4 workers, building at most 2 snapshots at a time
+  %(prog)s --all --jobs 4 --snapshot-jobs 2
+
+  # Backup all collections into a deduplicated repository
+  %(prog)s --all --repository /backups/qdrant-repo
+
+  # Compress snapshots with zstd on 4 threads
+  %(prog)s --all --compress zstd --compress-threads 4
+
+  # Back up the shards of a distributed collection in parallel
+  %(prog)s --collection my_collection --shards --jobs 8
+
+  # Large collections behind a proxy with a short timeout: poll instead of waiting
+  %(prog)s --all --jobs 4 --no-wait
+
+  # Version-independent export of all points (for upgrades and migrations)
+  %(prog)s --all --export --compress zstd
+
+  # Nightly backup that only snapshots collections with changes
+  %(prog)s --all --skip-unchanged --fingerprint-sample 1000
+
+  # Daytime backup that keeps search latency under 50 ms, never above 100 MB/s
+  %(prog)s --all --jobs 4 --max-bandwidth 100 --latency-target 50 --canary-collection my_collection
+
+  # Stream snapshots straight into a MinIO bucket (credentials from AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY)
+  %(prog)s --all --output-dir s3://qdrant-backups/nightly --s3-endpoint http://minio:9000
 """
     )
     
@@ -238,15 +1230,106 @@ Examples:
     
     parser.add_argument("--host", default="http://localhost:6333", help="Qdrant host URL")
     parser.add_argument("--api-key", help="Qdrant API key (if required)")
-    parser.add_argument("--output-dir", default="./snapshots", help="Directory to save snapshots")
+    parser.add_argument("--output-dir", default="./snapshots",
+                        help="Directory, s3://bucket/prefix or sftp://user@host/path to save snapshots")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of collections to back up in parallel")
+    parser.add_argument("--snapshot-jobs", type=int, help="Max snapshots created on the server at once (default: same as --jobs)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE // 1024, help="Download chunk size in KiB")
+    parser.add_argument("--repository", help="Store snapshots in a deduplicated chunk repository instead of --output-dir")
+    parser.add_argument("--prune", action="store_true", help="Remove repository chunks no backup refers to (with --repository)")
+    parser.add_argument("--compress", choices=sorted(COMPRESSION_EXTENSIONS), help="Compress downloaded snapshots")
+    parser.add_argument("--compress-level", type=int, help="Compression level (default: 6 for gzip, 3 for zstd)")
+    parser.add_argument("--compress-threads", type=int, default=1, help="Threads used for compression")
+    parser.add_argument("--delete-remote", action="store_true", help="Delete the snapshot from the server after it was downloaded")
+    parser.add_argument("--shards", action="store_true", help="Back up each shard separately, in parallel on the nodes holding them")
+    parser.add_argument("--export", action="store_true", help="Export points with the scroll API instead of creating snapshots")
+    parser.add_argument("--export-batch-size", type=int, default=DEFAULT_EXPORT_BATCH_SIZE, help="Points read per scroll request with --export")
+    parser.add_argument("--skip-unchanged", action="store_true", help="Do not back up collections that did not change since their last backup")
+    parser.add_argument("--unchanged-action", choices=UNCHANGED_ACTIONS, default="link",
+                        help="link: hard-link the last backup under a new name; skip: keep it as the latest backup")
+    parser.add_argument("--change-state", help="Change detection state file (default: backup-state.json in the output directory)")
+    parser.add_argument("--fingerprint-sample", type=int, default=0, help="Also hash the first N points to detect changes")
+    parser.add_argument("--max-unchanged-age", type=float, default=DEFAULT_MAX_AGE / 3600,
+                        help="Back up unchanged collections again after this many hours (0 = never)")
+    add_client_arguments(parser)
+    add_storage_arguments(parser)
+    add_throttle_arguments(parser)
+    add_metrics_arguments(parser)
     
     args = parser.parse_args()
     
+    storage = None
+    if not args.repository:
+        try:
+            storage = storage_from_options(args.output_dir, vars(args))
+        except (IOError, ValueError) as e:
+            parser.error(str(e))
+        if storage.remote and args.skip_unchanged and not args.change_state:
+            parser.error("--skip-unchanged with a remote --output-dir requires a local --change-state file")
+    
+    if args.shards and args.repository:
+        parser.error("--shards cannot be combined with --repository")
+    if args.export and (args.shards or args.repository):
+        parser.error("--export cannot be combined with --shards or --repository")
+    try:
+        peer_urls = parse_peer_urls(args.peer_url)
+    except ValueError as e:
+        parser.error(str(e))
+        
+    if args.compress:
+        if args.repository:
+            parser.error("--compress cannot be combined with --repository")
+        try:
+            check_compression(args.compress)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    change_detector = None
+    if args.skip_unchanged:
+        change_detector = ChangeDetector(
+            args.change_state or os.path.join(args.repository or args.output_dir, STATE_FILENAME),
+            sample_points=args.fingerprint_sample,
+            max_age=args.max_unchanged_age * 3600
+        )
+        
+    client = QdrantHTTPClient(
+        host=args.host,
+        api_key=args.api_key,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.timeout,
+        retries=args.retries,
+        pool_size=max(DEFAULT_POOL_SIZE, args.jobs)
+    )
+    try:
+        throttle = throttle_from_options(vars(args), client, slots=args.jobs)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    
     # Initialize backup tool
     backup_tool = QdrantSnapshotBackup(
         host=args.host,
         api_key=args.api_key,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        jobs=args.jobs,
+        snapshot_jobs=args.snapshot_jobs,
+        client=client,
+        chunk_size=max(1, args.chunk_size) * 1024,
+        repository=SnapshotRepository(args.repository) if args.repository else None,
+        compression=args.compress,
+        compression_level=args.compress_level,
+        compression_threads=args.compress_threads,
+        delete_remote=args.delete_remote,
+        shards=args.shards,
+        peer_urls=peer_urls,
+        no_wait=args.no_wait,
+        poll_timeout=args.poll_timeout,
+        export=args.export,
+        export_batch_size=args.export_batch_size,
+        metrics=metrics_from_args("backup", args),
+        change_detector=change_detector,
+        unchanged_action=args.unchanged_action,
+        throttle=throttle,
+        storage=storage
     )
     
     start_time = time.time()
@@ -254,7 +1337,12 @@ Examples:
     
     print(f"\nQdrant Snapshot Backup - {timestamp}")
     print(f"Host: {args.host}")
-    print(f"Output directory: {args.output_dir}")
+    if args.repository:
+        print(f"Repository: {args.repository}")
+    else:
+        print(f"Output directory: {args.output_dir}")
+    if throttle.limited:
+        print(f"Throttle: {throttle.describe()}")
     print("-" * 60)
     
     # Perform backup
@@ -269,25 +1357,72 @@ Examples:
         
         success_count = sum(1 for success in results.values() if success)
         total_count = len(results)
+        total_size = 0
+        total_new = 0
         
         for collection, success in results.items():
             status = "SUCCESS" if success else "FAILED"
-            print(f"{collection}: {status}")
+            stats = backup_tool.stats.get(collection, {})
+            total_size += stats.get("size", 0)
+            total_new += stats.get("new_bytes", 0)
+            if stats.get("unchanged"):
+                print(f"{collection}: UNCHANGED ({stats['unchanged']}, {format_size(stats.get('size', 0))})")
+                continue
+            new_info = f", {format_size(stats['new_bytes'])} new" if "new_bytes" in stats else ""
+            print(
+                f"{collection}: {status} "
+                f"({format_size(stats.get('size', 0))}{new_info}, "
+                f"snapshot {stats.get('snapshot_time', 0):.2f}s, "
+                f"download {stats.get('download_time', 0):.2f}s)"
+            )
             
         print("-" * 60)
         print(f"Total: {success_count}/{total_count} collections backed up successfully")
+        print(f"Total size: {format_size(total_size)}")
+        if backup_tool.repository:
+            print(f"Written to repository: {format_size(total_new)}")
+        if backup_tool.change_detector:
+            unchanged = [stats for stats in backup_tool.stats.values() if stats.get("unchanged")]
+            avoided = sum(stats.get("avoided_bytes", 0) for stats in unchanged)
+            print(f"Unchanged: {len(unchanged)}/{total_count} collections, "
+                  f"{len(unchanged)} snapshots not created, {format_size(avoided)} not transferred")
         
     else:
         print(f"Backing up collection: {args.collection}")
         success = backup_tool.backup_collection(args.collection)
+        results = {args.collection: success}
         
         print("\n" + "=" * 60)
         print("Backup Summary:")
         print("-" * 60)
-        print(f"{args.collection}: {'SUCCESS' if success else 'FAILED'}")
+        stats = backup_tool.stats.get(args.collection, {})
+        if stats.get("unchanged"):
+            print(f"{args.collection}: UNCHANGED ({stats['unchanged']}, "
+                  f"{format_size(stats.get('avoided_bytes', 0))} not transferred)")
+        else:
+            print(f"{args.collection}: {'SUCCESS' if success else 'FAILED'}")
+        
+    if backup_tool.repository and args.prune:
+        pruned = backup_tool.repository.prune()
+        print(f"Pruned {pruned['removed_chunks']} unused chunks ({format_size(pruned['freed_bytes'])})")
+        
+    throttle.close()
+    if throttle.limited:
+        throttle.print_summary()
+    if storage:
+        storage.close()
         
     elapsed_time = time.time() - start_time
     print(f"\nBackup completed in {elapsed_time:.2f} seconds")
+    
+    for collection, success in results.items():
+        backup_tool.metrics.collection_result(
+            collection, success, backup_tool.stats.get(collection, {}).get("elapsed")
+        )
+    summary = backup_tool.metrics.finish(elapsed_time)
+    if args.summary_json:
+        print(f"Summary written to: {args.summary_json}")
+    sys.exit(0 if summary["success"] else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Qdrant API Load Generation and Latency Benchmark
+
+This script measures throughput and latency of search, upsert and scroll
+calls against one or more endpoints, typically Qdrant directly and the same
+Qdrant through the Caddy proxy, and reports the difference. It fills a
+synthetic collection of configurable size and dimension, then drives a mix
+of operations from many concurrent requests in one asyncio event loop.
+
+Two load models are supported:
+
+    closed loop  --concurrency workers each send the next request as soon as
+                 the previous one returned (measures maximum throughput)
+    open loop    --qps requests per second are started on a fixed schedule,
+                 whether or not earlier requests have finished. Latency is
+                 measured from the scheduled start, so a stall is not hidden
+                 by the requests that were never sent (coordinated omission)
+
+Latencies are recorded in log-linear histograms (HdrHistogram style, about
+1% precision) and reported as percentiles.
+
+Usage:
+    python benchmark_api.py --target direct=http://localhost:8081 --api-key KEY
+    python benchmark_api.py --target direct=http://localhost:8081 \\
+        --target proxy=https://localhost:8080 --basic-auth admin:PASSWORD --insecure --api-key KEY
+    python benchmark_api.py --stub --duration 10
+
+Options:
+    --target       NAME=URL of an endpoint to benchmark (repeatable, first is the baseline)
+    --stub         Also start an in-process stub server and benchmark it (no Docker needed)
+    --collection   Benchmark collection name (default: benchmark)
+    --points       Number of synthetic points (default: 10000)
+    --dim          Vector dimension (default: 128)
+    --mix          Operation mix, e.g. search=90,upsert=5,scroll=5 (default: search=1)
+    --qps          Open loop at this request rate (default: closed loop)
+    --concurrency  Max requests in flight (default: 16)
+    --duration     Measured seconds per endpoint (default: 30)
+    --warmup       Unmeasured seconds before each run (default: 5)
+    --compressed   Ask for gzip-compressed responses (Accept-Encoding: gzip)
+    --baseline     Results of an earlier run (--json file) to compare against
+    --json         Write the results as JSON to this file
+    --hdr-dir      Write HdrHistogram percentile distribution files to this directory
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from async_http import AsyncHTTPClient, AsyncHTTPError
+from qdrant_stub import QdrantStub
+
+
+OPERATIONS = ("search", "upsert", "scroll")
+REPORT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# Request bodies are prepared up front so that JSON encoding of large
+# vectors does not compete with sending requests
+QUERY_POOL_SIZE = 256
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies in microseconds.
+
+    Values below SUB_BUCKETS are counted exactly; above that every power of
+    two is split into SUB_BUCKETS buckets, which bounds the relative error to
+    1/SUB_BUCKETS regardless of the range, like HdrHistogram.
+    """
+
+    SUB_BUCKETS = 128
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - self.SUB_BUCKETS.bit_length()
+        return (shift + 1) * self.SUB_BUCKETS + (value >> shift) - self.SUB_BUCKETS
+
+    def _value(self, index: int) -> int:
+        """Highest value that falls into a bucket"""
+        if index < self.SUB_BUCKETS:
+            return index
+        shift = index // self.SUB_BUCKETS - 1
+        sub_bucket = index % self.SUB_BUCKETS + self.SUB_BUCKETS
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = max(1, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """Latency in microseconds at a percentile (0-100)"""
+        if not self.total:
+            return 0
+        threshold = max(1, round(self.total * percentile / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile_distribution(self, ticks_per_half: int = 5) -> str:
+        """
+        Percentile table in the HdrHistogram text format (values in ms).
+
+        Like HdrHistogram, the distance to 100% is halved after every
+        ticks_per_half lines, so the tail gets more lines than the median.
+        """
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        low = 0.0
+        half = 50.0
+        while self.total:
+            for tick in range(ticks_per_half):
+                percentile = low + tick * half / ticks_per_half
+                count = min(self.total, max(1, math.ceil(self.total * percentile / 100)))
+                value = self.percentile(percentile) / 1000
+                if count >= self.total:
+                    break
+                lines.append(f"{value:12.3f} {percentile / 100:14.12f} {count:10d} {1 / (1 - percentile / 100):14.2f}")
+            else:
+                low += half
+                half /= 2
+                continue
+            break
+        lines.append(f"{self.max / 1000:12.3f} {1.0:14.12f} {self.total:10d}")
+        lines.append(f"#[Mean    = {self.mean() / 1000:12.3f}, Max = {self.max / 1000:12.3f}]")
+        lines.append(f"#[Total count = {self.total:12d}]")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        result = {"count": self.total, "mean_ms": round(self.mean() / 1000, 3), "max_ms": self.max / 1000}
+        for percentile in REPORT_PERCENTILES:
+            result[f"p{percentile:g}_ms"] = self.percentile(percentile) / 1000
+        return result
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'search=90,upsert=5,scroll=5' into operation weights"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}', expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Operation mix has no weight")
+    return mix
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client: AsyncHTTPClient,
+        collection_name: str,
+        points: int,
+        dim: int,
+        mix: Dict[str, float],
+        search_limit: int = 10,
+        upsert_batch: int = 16,
+        seed: int = 42
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.points = points
+        self.dim = dim
+        self.mix = mix
+        self.search_limit = search_limit
+        self.upsert_batch = upsert_batch
+        self.rng = random.Random(seed)
+
+        self.histograms = {op: LatencyHistogram() for op in mix}
+        self.errors = {op: 0 for op in mix}
+        self.last_error: Optional[str] = None
+        # Response bytes of measured requests, as sent by the server
+        self.response_bytes = 0
+
+        queries = [self._vector() for _ in range(QUERY_POOL_SIZE)]
+        self._search_bodies = [
+            json.dumps({"vector": q, "limit": search_limit, "with_payload": False}).encode() for q in queries
+        ]
+
+    def _vector(self) -> List[float]:
+        vector = [self.rng.gauss(0, 1) for _ in range(self.dim)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [round(v / norm, 6) for v in vector]
+
+    def _point(self, point_id: int) -> Dict[str, Any]:
+        return {
+            "id": point_id,
+            "vector": self._vector(),
+            "payload": {"group": point_id % 100, "value": round(self.rng.random(), 4)},
+        }
+
+    async def setup(self, recreate: bool = False, batch_size: int = 256, concurrency: int = 8) -> None:
+        """Create the collection and fill it, unless it already holds enough points"""
+        path = f"/collections/{self.collection_name}"
+        response = await self.client.request("GET", path)
+        if response.status == 200 and not recreate:
+            count = response.json()["result"].get("points_count") or 0
+            if count >= self.points:
+                print(f"Collection '{self.collection_name}' already has {count} points, skipping setup")
+                return
+        if response.status == 200:
+            await self.client.request("DELETE", path)
+        if response.status == 200 and not recreate:
+            print(f"Collection '{self.collection_name}' has fewer than {self.points} points, recreating it")
+
+        response = await self.client.request("PUT", path, json_body={
+            "vectors": {"size": self.dim, "distance": "Cosine"},
+        })
+        if response.status >= 300:
+            raise AsyncHTTPError(f"Creating collection failed: {response.status} {response.body[:200]!r}")
+
+        print(f"Uploading {self.points} points of dimension {self.dim}...")
+        start = time.time()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def upload(first: int) -> None:
+            async with slots:
+                batch = [self._point(i) for i in range(first, min(first + batch_size, self.points))]
+                response = await self.client.request("PUT", f"{path}/points?wait=true", json_body={"points": batch})
+                if response.status >= 300:
+                    raise AsyncHTTPError(f"Upload failed: {response.status} {response.body[:200]!r}")
+
+        await asyncio.gather(*(upload(first) for first in range(0, self.points, batch_size)))
+        print(f"Uploaded in {time.time() - start:.2f}s")
+
+    def _next_request(self) -> Tuple[str, str, str, Optional[bytes], Any]:
+        op = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        path = f"/collections/{self.collection_name}/points"
+        if op == "search":
+            return op, "POST", f"{path}/search", self.rng.choice(self._search_bodies), None
+        if op == "upsert":
+            ids = [self.rng.randrange(self.points) for _ in range(self.upsert_batch)]
+            return op, "PUT", f"{path}?wait=true", None, {"points": [self._point(i) for i in ids]}
+        offset = self.rng.randrange(self.points)
+        return op, "POST", f"{path}/scroll", None, {"limit": 100, "offset": offset, "with_payload": True}
+
+    async def _send(self, started: float, record: bool) -> None:
+        op, method, path, body, json_body = self._next_request()
+        try:
+            response = await self.client.request(method, path, json_body=json_body, body=body)
+            failed = response.status >= 300
+            if failed:
+                self.last_error = f"{op}: HTTP {response.status} {response.body[:200]!r}"
+        except AsyncHTTPError as e:
+            failed = True
+            self.last_error = f"{op}: {e}"
+
+        if not record:
+            return
+        if failed:
+            self.errors[op] += 1
+        else:
+            self.histograms[op].record(time.perf_counter() - started)
+            self.response_bytes += response.encoded_size
+
+    async def run(self, duration: float, warmup: float, concurrency: int, qps: Optional[float] = None) -> float:
+        """Run the workload; returns the measured wall time"""
+        start = time.perf_counter()
+        measure_from = start + warmup
+        end = measure_from + duration
+
+        if qps:
+            # Open loop: request i is due at start + i / qps
+            slots = asyncio.Semaphore(concurrency)
+            pending = set()
+
+            async def timed(due: float) -> None:
+                async with slots:
+                    await self._send(due, due >= measure_from)
+
+            sent = 0
+            while True:
+                due = start + sent / qps
+                if due >= end:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Bound the backlog; late requests still count from their due time
+                if len(pending) >= concurrency * 10:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.ensure_future(timed(due))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sent += 1
+            if pending:
+                await asyncio.wait(pending)
+        else:
+            async def worker() -> None:
+                while time.perf_counter() < end:
+                    started = time.perf_counter()
+                    await self._send(started, started >= measure_from)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        return max(time.perf_counter(), end) - measure_from
+
+    async def drop(self) -> None:
+        await self.client.request("DELETE", f"/collections/{self.collection_name}")
+
+
+def parse_target(value: str) -> Tuple[str, str]:
+    name, _, url = value.partition("=")
+    if not url:
+        raise ValueError(f"Invalid --target '{value}', expected NAME=URL")
+    return name, url
+
+
+async def benchmark_target(name: str, url: str, args) -> Dict[str, Any]:
+    headers = {}
+    if args.api_key:
+        # Qdrant reads api-key; the local Caddyfile forwards X-API-KEY as api-key
+        headers["api-key"] = args.api_key
+        headers["X-API-KEY"] = args.api_key
+    if args.compressed:
+        headers["Accept-Encoding"] = "gzip"
+    basic_auth = tuple(args.basic_auth.split(":", 1)) if args.basic_auth else None
+
+    client = AsyncHTTPClient(
+        url,
+        headers=headers,
+        basic_auth=basic_auth,
+        pool_size=args.concurrency,
+        timeout=args.timeout,
+        verify_tls=not args.insecure
+    )
+    generator = LoadGenerator(
+        client,
+        args.collection,
+        points=args.points,
+        dim=args.dim,
+        mix=args.mix,
+        search_limit=args.search_limit,
+        upsert_batch=args.upsert_batch,
+        seed=args.seed
+    )
+
+    try:
+        print(f"\n[{name}] {url}")
+        if not args.skip_setup:
+            await generator.setup(recreate=args.recreate)
+        mode = f"open loop at {args.qps:g} req/s" if args.qps else "closed loop"
+        print(f"[{name}] Running {mode} with up to {args.concurrency} requests in flight "
+              f"for {args.duration:g}s (+{args.warmup:g}s warm-up)...")
+        elapsed = await generator.run(args.duration, args.warmup, args.concurrency, args.qps)
+        if args.drop:
+            await generator.drop()
+    finally:
+        await client.close()
+
+    if generator.last_error:
+        print(f"[{name}] Last error: {generator.last_error}")
+
+    total = LatencyHistogram()
+    operations = {}
+    for op, histogram in generator.histograms.items():
+        total.merge(histogram)
+        operations[op] = dict(histogram.summary(), errors=generator.errors[op],
+                              throughput=round(histogram.total / elapsed, 1))
+    return {
+        "name": name,
+        "url": url,
+        "elapsed": round(elapsed, 3),
+        "bytes_per_response": round(generator.response_bytes / total.total) if total.total else 0,
+        "operations": operations,
+        "total": dict(total.summary(), errors=sum(generator.errors.values()),
+                      throughput=round(total.total / elapsed, 1)),
+        "histograms": dict(generator.histograms, total=total),
+    }
+
+
+def _compare(label: str, baseline: Dict[str, Any], result: Dict[str, Any]) -> None:
+    b, r = baseline["total"], result["total"]
+    line = (f"  {label}: p50 {r['p50_ms'] - b['p50_ms']:+.2f} ms, "
+            f"p99 {r['p99_ms'] - b['p99_ms']:+.2f} ms, "
+            f"throughput {100.0 * (r['throughput'] - b['throughput']) / max(b['throughput'], 0.1):+.1f}%")
+    if baseline.get("bytes_per_response") and result.get("bytes_per_response"):
+        line += f", response size {baseline['bytes_per_response']} -> {result['bytes_per_response']} bytes"
+    print(line)
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Print the results; with baseline (an earlier run), every target is compared with it"""
+    shown = [dict(result, name=f"base/{result['name']}") for result in baseline or []] + results
+    print("\n" + "=" * 78)
+    print("Benchmark Summary (latency in ms):")
+    print("-" * 78)
+    print(f"{'target':<12}{'operation':<10}{'req/s':>9}{'errors':>8}{'mean':>8}"
+          f"{'p50':>8}{'p90':>8}{'p99':>8}{'p99.9':>8}{'max':>9}")
+    for result in shown:
+        rows = list(result["operations"].items())
+        if len(rows) > 1:
+            rows.append(("total", result["total"]))
+        for op, stats in rows:
+            print(f"{result['name']:<12}{op:<10}{stats['throughput']:>9.1f}{stats['errors']:>8}"
+                  f"{stats['mean_ms']:>8.2f}{stats['p50_ms']:>8.2f}{stats['p90_ms']:>8.2f}"
+                  f"{stats['p99_ms']:>8.2f}{stats['p99.9_ms']:>8.2f}{stats['max_ms']:>9.2f}")
+
+    if baseline:
+        # Same target name in both runs, otherwise the first target of the baseline
+        by_name = {result["name"]: result for result in baseline}
+        print("-" * 78)
+        print("Compared with the baseline run:")
+        for result in results:
+            _compare(result["name"], by_name.get(result["name"], baseline[0]), result)
+    elif len(results) > 1:
+        print("-" * 78)
+        print(f"Compared with '{results[0]['name']}':")
+        for result in results[1:]:
+            _compare(result["name"], results[0], result)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Qdrant API Load Generation and Latency Benchmark",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Local stack (docker-compose.local.yml), Qdrant directly
+  %(prog)s --target direct=http://localhost:8081 --api-key my_api_key
+
+  # Direct vs. through Caddy (tls internal, basic auth), 90%% search / 10%% upsert
+  %(prog)s --target direct=http://localhost:8081 --target proxy=https://localhost:8080 \\
+      --basic-auth admin:password --insecure --api-key my_api_key --mix search=90,upsert=10
+
+  # Fixed request rate instead of maximum throughput
+  %(prog)s --target direct=http://localhost:8081 --qps 500 --concurrency 64
+
+  # Compare with an earlier run, e.g. before switching to the high-throughput profile
+  %(prog)s --target proxy=https://qdrant.example.com --basic-auth admin:password --api-key my_api_key \\
+      --compressed --json highqps.json --baseline standard.json
+
+  # Try the tool without Docker
+  %(prog)s --stub --duration 10
+"""
+    )
+    parser.add_argument("--target", action="append", default=[], help="NAME=URL of an endpoint to benchmark (repeatable)")
+    parser.add_argument("--stub", action="store_true", help="Also start an in-process stub server and benchmark it")
+    parser.add_argument("--api-key", help="Qdrant API key (sent as api-key and X-API-KEY)")
+    parser.add_argument("--basic-auth", metavar="USER:PASSWORD", help="Basic auth credentials for the Caddy proxy")
+    parser.add_argument("--insecure", action="store_true", help="Do not verify TLS certificates (Caddy 'tls internal')")
+    parser.add_argument("--collection", default="benchmark", help="Benchmark collection name")
+    parser.add_argument("--points", type=int, default=10000, help="Number of synthetic points")
+    parser.add_argument("--dim", type=int, default=128, help="Vector dimension")
+    parser.add_argument("--recreate", action="store_true", help="Recreate the collection even if it is already filled")
+    parser.add_argument("--skip-setup", action="store_true", help="Use the existing collection as it is")
+    parser.add_argument("--drop", action="store_true", help="Delete the collection after the benchmark")
+    parser.add_argument("--mix", default="search=1", help="Operation mix, e.g. search=90,upsert=5,scroll=5")
+    parser.add_argument("--qps", type=float, help="Open loop at this request rate (default: closed loop)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each run")
+    parser.add_argument("--search-limit", type=int, default=10, help="Results per search")
+    parser.add_argument("--upsert-batch", type=int, default=16, help="Points per upsert request")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for vectors and the operation sequence")
+    parser.add_argument("--compressed", action="store_true", help="Ask for gzip-compressed responses")
+    parser.add_argument("--baseline", metavar="FILE", help="Results of an earlier run (--json file) to compare against")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--hdr-dir", help="Write HdrHistogram percentile distribution files to this directory")
+    args = parser.parse_args()
+
+    try:
+        args.mix = parse_mix(args.mix)
+        targets = [parse_target(value) for value in args.target]
+    except ValueError as e:
+        parser.error(str(e))
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"cannot read baseline results from {args.baseline}: {e}")
+
+    stub = None
+    if args.stub:
+        stub = QdrantStub(api_key=args.api_key).start()
+        targets.append(("stub", stub.url))
+    if not targets:
+        parser.error("no endpoint given, use --target NAME=URL or --stub")
+
+    print(f"\nQdrant API Benchmark - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print(f"Collection: {args.collection} ({args.points} points, dimension {args.dim})")
+    print(f"Mix: {', '.join(f'{op}={weight:g}' for op, weight in args.mix.items())}")
+    print("-" * 60)
+
+    results = []
+    try:
+        for name, url in targets:
+            try:
+                results.append(asyncio.run(benchmark_target(name, url, args)))
+            except (AsyncHTTPError, OSError, ValueError, KeyError) as e:
+                print(f"[{name}] Benchmark failed: {e}")
+    finally:
+        if stub:
+            stub.stop()
+
+    if not results:
+        sys.exit(1)
+    print_results(results, baseline)
+
+    if args.hdr_dir:
+        os.makedirs(args.hdr_dir, exist_ok=True)
+        for result in results:
+            for op, histogram in result["histograms"].items():
+                if histogram.total:
+                    with open(os.path.join(args.hdr_dir, f"{result['name']}-{op}.hgrm"), "w") as f:
+                        f.write(histogram.percentile_distribution())
+        print(f"\nPercentile distributions written to: {args.hdr_dir}")
+
+    if args.json:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "collection": args.collection, "points": args.points, "dim": args.dim, "mix": args.mix,
+                "qps": args.qps, "concurrency": args.concurrency, "duration": args.duration,
+            },
+            "results": [{k: v for k, v in result.items() if k != "histograms"} for result in results],
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to: {args.json}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user")
+        sys.exit(1)
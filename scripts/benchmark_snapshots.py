@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Qdrant Snapshot Backup and Restore Throughput Benchmark
+
+This script measures how fast backup_snapshots.py and restore_snapshots.py
+move snapshots, and how much memory they need doing it, without a Qdrant
+server. An in-process stub serves the snapshot endpoints (create, list,
+download, upload, recover) with synthetic snapshots of any size, optionally
+limited to a bandwidth and with a delay for snapshot creation, so runs are
+repeatable and multi-GB snapshots need no disk space on the server side.
+
+Every combination of --jobs and --chunk-size is run as a separate case in a
+fresh child process, so the peak RSS reported for a case belongs to that
+case alone. Restore cases upload the snapshots written by the first backup
+case. Results can be written as JSON and compared with an earlier run.
+
+Usage:
+    python benchmark_snapshots.py
+    python benchmark_snapshots.py --collections 4 --size 2048 --jobs 1,4 --chunk-size 64,1024
+    python benchmark_snapshots.py --json current.json --compare baseline.json
+
+Options:
+    --collections  Number of collections (default: 4)
+    --size         Snapshot size per collection in MB (default: 256)
+    --jobs         Comma-separated parallel job counts to try (default: 1,4)
+    --chunk-size   Comma-separated download/upload chunk sizes in KiB to try (default: 64,1024)
+    --compress     Compress backups (gzip or zstd); restores then decompress
+    --bandwidth    Stub transfer limit per connection in MB/s (default: unlimited)
+    --latency-ms   Stub delay added to every API response (default: 0)
+    --snapshot-delay  Stub delay in seconds for creating a snapshot (default: 0)
+    --workdir      Directory for the downloaded snapshots (default: a temporary directory)
+    --json         Write the results as JSON to this file
+    --compare      Compare with a JSON file written by an earlier run with the same settings
+    --tolerance    Allowed throughput drop or peak RSS growth in percent (default: 10)
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from backup_snapshots import QdrantSnapshotBackup
+from qdrant_http import QdrantHTTPClient, format_size
+from qdrant_stub import QdrantStub
+from restore_snapshots import QdrantSnapshotRestore, load_batch
+
+
+MB = 1024 * 1024
+
+
+def parse_int_list(value: str) -> List[int]:
+    """Parse '1,4,8' into [1, 4, 8]"""
+    try:
+        values = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got '{value}'")
+    if not values or min(values) < 1:
+        raise argparse.ArgumentTypeError(f"expected positive integers, got '{value}'")
+    return values
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_case(case: Dict[str, Any], connection) -> None:
+    """Run one backup or restore case (in a child process) and send back its measurements"""
+    result = {"success": False}
+    try:
+        client = QdrantHTTPClient(host=case["host"], pool_size=max(10, case["jobs"]))
+        # The tools report progress on stdout; only the measurements matter here
+        with redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            if case["operation"] == "backup":
+                tool = QdrantSnapshotBackup(
+                    host=case["host"],
+                    output_dir=case["output_dir"],
+                    jobs=case["jobs"],
+                    client=client,
+                    chunk_size=case["chunk_size"],
+                    compression=case["compression"]
+                )
+                results = tool.backup_all_collections()
+            else:
+                tool = QdrantSnapshotRestore(host=case["host"], client=client, upload_chunk_size=case["chunk_size"])
+                results = tool.restore_batch(load_batch(case["source_dir"]), jobs=case["jobs"])
+            wall_time = time.perf_counter() - start_time
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        result = {
+            "success": bool(results) and all(results.values()),
+            "wall_time": wall_time,
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+            "peak_rss": _peak_rss(),
+            "bytes": sum(stats.get("size", 0) for stats in tool.stats.values()),
+        }
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        connection.send(result)
+        connection.close()
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a case in a fresh process so its peak RSS is not shared with other cases"""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(case, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"success": False, "error": "benchmark process exited without a result"}
+    process.join()
+    return result
+
+
+class SnapshotBenchmark:
+    def __init__(
+        self,
+        stub: QdrantStub,
+        workdir: str,
+        collections: int,
+        jobs: List[int],
+        chunk_sizes: List[int],
+        compression: Optional[str] = None
+    ):
+        self.stub = stub
+        self.workdir = workdir
+        self.collections = collections
+        self.jobs = jobs
+        self.chunk_sizes = chunk_sizes
+        self.compression = compression
+        self.source_dir = os.path.join(workdir, "source")
+
+    def _case(self, operation: str, jobs: int, chunk_size: int) -> Dict[str, Any]:
+        return {
+            "operation": operation,
+            "host": self.stub.url,
+            "jobs": jobs,
+            "chunk_size": chunk_size * 1024,
+            "compression": self.compression,
+            "output_dir": os.path.join(self.workdir, "backup"),
+            "source_dir": self.source_dir,
+        }
+
+    def _measure(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        label = f"{case['operation']} jobs={case['jobs']} chunk={case['chunk_size'] // 1024}KiB"
+        print(f"Running {label}...", flush=True)
+        uploaded = self.stub.uploaded_bytes
+        measured = run_case(case)
+        if case["operation"] == "restore":
+            # The restore tool does not know the uncompressed size it sent
+            measured["bytes"] = self.stub.uploaded_bytes - uploaded
+
+        result = {key: case[key] for key in ("operation", "jobs", "chunk_size", "compression")}
+        result.update(measured)
+        wall_time = measured.get("wall_time") or 0
+        result["throughput"] = measured.get("bytes", 0) / wall_time if wall_time else 0.0
+        if result["success"]:
+            print(f"  {format_size(result['bytes'])} in {wall_time:.2f}s, "
+                  f"{result['throughput'] / MB:.1f} MB/s, peak RSS {format_size(result['peak_rss'])}")
+        else:
+            print(f"  FAILED{': ' + result['error'] if 'error' in result else ''}")
+        return result
+
+    def run_backups(self) -> List[Dict[str, Any]]:
+        results = []
+        for jobs in self.jobs:
+            for chunk_size in self.chunk_sizes:
+                case = self._case("backup", jobs, chunk_size)
+                results.append(self._measure(case))
+                # Keep the first complete backup as the source of the restore cases
+                if results[-1]["success"] and not os.path.isdir(self.source_dir):
+                    os.rename(case["output_dir"], self.source_dir)
+                else:
+                    shutil.rmtree(case["output_dir"], ignore_errors=True)
+        return results
+
+    def prepare_restore_source(self) -> bool:
+        """Write the snapshots the restore cases upload (unless a backup case already did)"""
+        if os.path.isdir(self.source_dir):
+            return True
+        print("Preparing snapshots for the restore cases...", flush=True)
+        case = self._case("backup", max(self.jobs), max(self.chunk_sizes))
+        case["output_dir"] = self.source_dir
+        return run_case(case)["success"]
+
+    def run_restores(self) -> List[Dict[str, Any]]:
+        if not self.prepare_restore_source():
+            print("Could not create the snapshots to restore; skipping the restore cases")
+            return []
+        return [
+            self._measure(self._case("restore", jobs, chunk_size))
+            for jobs in self.jobs
+            for chunk_size in self.chunk_sizes
+        ]
+
+
+def _case_key(result: Dict[str, Any]) -> Tuple:
+    return (result["operation"], result["jobs"], result["chunk_size"], result.get("compression"))
+
+
+def compare_config(config: Dict[str, Any], baseline_config: Dict[str, Any]) -> List[str]:
+    """Return a description of every setting the baseline was run with differently"""
+    return [
+        f"{key}: {baseline_config.get(key)!r} in the baseline, {config.get(key)!r} now"
+        for key in sorted(set(config) | set(baseline_config))
+        if config.get(key) != baseline_config.get(key)
+    ]
+
+
+def compare_results(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float
+) -> List[str]:
+    """Return a description of every case that got slower or bigger than tolerance (percent) allows"""
+    previous = {_case_key(result): result for result in baseline if result.get("success")}
+    regressions = []
+    for result in results:
+        before = previous.get(_case_key(result))
+        if not before:
+            continue
+        label = f"{result['operation']} jobs={result['jobs']} chunk={result['chunk_size'] // 1024}KiB"
+        if not result["success"]:
+            regressions.append(f"{label}: failed")
+            continue
+        if result["throughput"] < before["throughput"] * (1 - tolerance / 100):
+            regressions.append(f"{label}: throughput {before['throughput'] / MB:.1f} -> "
+                               f"{result['throughput'] / MB:.1f} MB/s")
+        if result["peak_rss"] > before["peak_rss"] * (1 + tolerance / 100):
+            regressions.append(f"{label}: peak RSS {format_size(before['peak_rss'])} -> "
+                               f"{format_size(result['peak_rss'])}")
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print("\n" + "=" * 72)
+    print("Benchmark Summary:")
+    print("-" * 72)
+    print(f"{'operation':<10}{'jobs':>6}{'chunk KiB':>11}{'size':>12}{'wall s':>9}{'MB/s':>9}{'cpu s':>8}{'peak RSS':>11}")
+    for result in results:
+        if not result["success"]:
+            print(f"{result['operation']:<10}{result['jobs']:>6}{result['chunk_size'] // 1024:>11}  FAILED")
+            continue
+        print(f"{result['operation']:<10}{result['jobs']:>6}{result['chunk_size'] // 1024:>11}"
+              f"{format_size(result['bytes']):>12}{result['wall_time']:>9.2f}{result['throughput'] / MB:>9.1f}"
+              f"{result['cpu_time']:>8.2f}{format_size(result['peak_rss']):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Qdrant Snapshot Backup and Restore Throughput Benchmark",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default matrix: 4 collections of 256 MB, jobs 1 and 4, 64 KiB and 1 MiB chunks
+  %(prog)s
+
+  # Multi-GB snapshots over a simulated 100 MB/s link
+  %(prog)s --collections 2 --size 4096 --bandwidth 100 --jobs 1,2
+
+  # Check for regressions against a stored run
+  %(prog)s --json current.json --compare baseline.json --tolerance 15
+"""
+    )
+    parser.add_argument("--collections", type=int, default=4, help="Number of collections")
+    parser.add_argument("--size", type=int, default=256, help="Snapshot size per collection in MB")
+    parser.add_argument("--jobs", type=parse_int_list, default=[1, 4], help="Comma-separated parallel job counts to try")
+    parser.add_argument("--chunk-size", type=parse_int_list, default=[64, 1024], help="Comma-separated chunk sizes in KiB to try")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], help="Compress backups; restores then decompress")
+    parser.add_argument("--bandwidth", type=float, help="Stub transfer limit per connection in MB/s")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub delay added to every API response")
+    parser.add_argument("--snapshot-delay", type=float, default=0.0, help="Stub delay in seconds for creating a snapshot")
+    parser.add_argument("--skip-backup", action="store_true", help="Only run the restore cases")
+    parser.add_argument("--skip-restore", action="store_true", help="Only run the backup cases")
+    parser.add_argument("--workdir", help="Directory for the downloaded snapshots (default: a temporary directory)")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with a JSON file written by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed throughput drop or peak RSS growth in percent")
+    args = parser.parse_args()
+
+    if args.skip_backup and args.skip_restore:
+        parser.error("--skip-backup and --skip-restore leave nothing to run")
+
+    workdir = tempfile.mkdtemp(prefix="snapshot-benchmark-", dir=args.workdir)
+    stub = QdrantStub(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth * MB if args.bandwidth else None,
+        snapshot_delay=args.snapshot_delay,
+        snapshot_size=args.size * MB
+    )
+    for i in range(args.collections):
+        stub.add_collection(f"benchmark_{i}")
+    stub.start()
+
+    print(f"\nQdrant Snapshot Benchmark - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print(f"Collections: {args.collections} x {args.size} MB"
+          + (f", bandwidth {args.bandwidth:g} MB/s per connection" if args.bandwidth else ""))
+    print(f"Jobs: {args.jobs}, chunk sizes (KiB): {args.chunk_size}, compression: {args.compress or 'none'}")
+    print("-" * 60)
+
+    benchmark = SnapshotBenchmark(stub, workdir, args.collections, args.jobs, args.chunk_size, args.compress)
+    results = []
+    try:
+        if not args.skip_backup:
+            results.extend(benchmark.run_backups())
+        if not args.skip_restore:
+            results.extend(benchmark.run_restores())
+    finally:
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+
+    config = {
+        "collections": args.collections, "size": args.size * MB, "bandwidth": args.bandwidth,
+        "latency_ms": args.latency_ms, "snapshot_delay": args.snapshot_delay, "compression": args.compress,
+    }
+    if args.json:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": config,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to: {args.json}")
+
+    failed = not results or not all(result["success"] for result in results)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Cases of a run with another size, bandwidth or stub delays are not comparable
+        differences = compare_config(config, baseline.get("config", {}))
+        if differences:
+            print(f"\nNot comparing with {args.compare}, it was run with a different configuration:")
+            for difference in differences:
+                print(f"  {difference}")
+            failed = True
+        else:
+            regressions = compare_results(results, baseline["results"], args.tolerance)
+            print(f"\nCompared with {args.compare} (tolerance {args.tolerance:g}%):")
+            for regression in regressions:
+                print(f"  REGRESSION {regression}")
+            if not regressions:
+                print("  no regressions")
+            failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user")
+        sys.exit(1)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Change detection for Qdrant collection backups
+
+Most collections do not change between two nightly backups, yet creating and
+downloading their snapshots costs server CPU, disk and transfer every time.
+A ChangeDetector compares a cheap fingerprint of a collection with the one
+recorded at its last successful backup:
+
+    counts    points_count, indexed_vectors_count and segments_count
+    status    the collection must be green with optimizer status "ok" (an
+              optimization in progress means recent writes)
+    schema    hashes of the collection config and the payload schema
+    sample    optionally, a hash of the first N points in id order, with
+              payloads and vectors (one scroll request)
+
+Qdrant does not expose a change counter, so an update that overwrites
+existing points outside the sample without changing any count is not seen.
+max_age bounds how long such a change can go unnoticed: a collection is
+backed up again once its last real backup is older than that.
+
+The state is a JSON file that is written atomically after every change.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Any
+
+from qdrant_http import QdrantHTTPClient
+
+
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+STATE_FILENAME = "backup-state.json"
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:32]
+
+
+def collection_fingerprint(client: QdrantHTTPClient, collection_name: str, sample_points: int = 0) -> Dict[str, Any]:
+    """Fingerprint of a collection: counts, status and hashes of config, schema and a sample of points"""
+    info = client.request_json("GET", f"/collections/{collection_name}", retry=True)["result"]
+    fingerprint = {
+        "points_count": info.get("points_count"),
+        "indexed_vectors_count": info.get("indexed_vectors_count"),
+        "segments_count": info.get("segments_count"),
+        "status": info.get("status"),
+        "optimizer_status": info.get("optimizer_status"),
+        "config": _digest(info.get("config")),
+        "payload_schema": _digest(info.get("payload_schema")),
+    }
+    if sample_points > 0:
+        points = client.request_json(
+            "POST",
+            f"/collections/{collection_name}/points/scroll",
+            json={"limit": sample_points, "with_payload": True, "with_vector": True},
+            retry=True
+        )["result"]["points"]
+        fingerprint["sample"] = _digest(points)
+        fingerprint["sample_points"] = sample_points
+    return fingerprint
+
+
+def is_settled(fingerprint: Dict[str, Any]) -> bool:
+    """Whether the collection is idle: green and not optimizing"""
+    return fingerprint.get("status") == "green" and fingerprint.get("optimizer_status") == "ok"
+
+
+class ChangeDetector:
+    def __init__(self, state_path: str, sample_points: int = 0, max_age: Optional[float] = DEFAULT_MAX_AGE):
+        """max_age in seconds; None or 0 never forces a backup of an unchanged collection"""
+        self.state_path = state_path
+        self.sample_points = max(0, sample_points)
+        self.max_age = max_age or None
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_path):
+            return {"collections": {}}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Warning: could not read change state '{self.state_path}' ({e}), backing up everything")
+            return {"collections": {}}
+
+    def _save_state(self) -> None:
+        """Write the state file atomically (caller holds _lock)"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def fingerprint(self, client: QdrantHTTPClient, collection_name: str) -> Dict[str, Any]:
+        return collection_fingerprint(client, collection_name, self.sample_points)
+
+    def previous_backup(self, collection_name: str, fingerprint: Dict[str, Any], mode: str) -> Optional[Dict[str, Any]]:
+        """
+        The recorded backup if the collection is unchanged since it was made.
+
+        mode describes how backups are made (snapshot, export, compression),
+        so that switching modes never reuses a backup of the other kind.
+        """
+        with self._lock:
+            record = self.state["collections"].get(collection_name)
+        if not record or record.get("mode") != mode or not is_settled(fingerprint):
+            return None
+        if record.get("fingerprint") != fingerprint:
+            return None
+        if self.max_age and time.time() - record.get("backed_up", 0) > self.max_age:
+            return None
+        return record
+
+    def record_backup(self, collection_name: str, fingerprint: Dict[str, Any], mode: str, backup: Dict[str, Any]) -> None:
+        """Remember a real backup, made after fingerprint was taken"""
+        now = time.time()
+        with self._lock:
+            self.state["collections"][collection_name] = {
+                "fingerprint": fingerprint,
+                "mode": mode,
+                "backed_up": now,
+                "checked": now,
+                "backup": backup,
+            }
+            self._save_state()
+
+    def record_reuse(self, collection_name: str, backup: Optional[Dict[str, Any]] = None) -> None:
+        """Remember that an unchanged collection was checked (and its latest backup, if it was linked)"""
+        with self._lock:
+            record = self.state["collections"][collection_name]
+            record["checked"] = time.time()
+            record["unchanged_runs"] = record.get("unchanged_runs", 0) + 1
+            if backup is not None:
+                record["backup"] = backup
+            self._save_state()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Warm-up of restored collections
+
+A collection that was just restored answers its first queries slowly: its
+HNSW graphs and vectors are still on disk (mmap) instead of in the page
+cache, and the optimizer may still be building indexes. CollectionWarmup
+runs after a restore, so that failover traffic only reaches a hot collection:
+
+    1. wait until the collection is green, the optimizer is idle and the
+       point and indexed vector counts have stopped changing
+    2. replay queries concurrently, in rounds: recorded ones (a JSON lines
+       file of search or query request bodies) or synthetic ones that search
+       with a sample of the stored vectors
+    3. stop once the p95 latency of the last rounds varies by less than a
+       tolerance (or a time limit is reached), and report the latency of
+       every round
+
+A recorded query is one JSON object per line: the body of a search request,
+or of a universal query if it has a 'query' key. To replay queries against
+one collection of a batch only, a line can also be
+{"collection": "<name>", "body": {...}}.
+"""
+
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_http import DEFAULT_POLL_TIMEOUT, QdrantHTTPClient, QdrantRequestError, poll
+
+
+DEFAULT_SAMPLE = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_TIME = 600.0
+DEFAULT_TOLERANCE = 0.1
+# Short rounds would hide a slow but steady improvement
+MIN_ROUND_QUERIES = 500
+# Rounds whose p95 must lie within the tolerance of each other
+STABLE_ROUNDS = 3
+SEARCH_LIMIT = 10
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    """Read a JSON lines file of recorded queries (raises IOError/ValueError)"""
+    queries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            query = json.loads(line)
+            if not isinstance(query, dict):
+                raise ValueError(f"{path}:{line_number}: expected a JSON object")
+            queries.append(query)
+    if not queries:
+        raise ValueError(f"no queries in {path}")
+    return queries
+
+
+def query_endpoint(collection_name: str, body: Dict[str, Any]) -> str:
+    return f"/collections/{collection_name}/points/{'query' if 'query' in body else 'search'}"
+
+
+class CollectionWarmup:
+    def __init__(
+        self,
+        client: QdrantHTTPClient,
+        queries_path: Optional[str] = None,
+        sample: int = DEFAULT_SAMPLE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_time: float = DEFAULT_MAX_TIME,
+        tolerance: float = DEFAULT_TOLERANCE,
+        ready_timeout: float = DEFAULT_POLL_TIMEOUT,
+        queries: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Recorded queries come from queries_path or are passed as queries;
+        without either, synthetic queries use `sample` stored vectors.
+        max_time bounds the replay (not the wait for the collection), which
+        ready_timeout bounds.
+        """
+        self.recorded = load_queries(queries_path) if queries_path else queries
+        self.sample = max(1, sample)
+        self.concurrency = max(1, concurrency)
+        self.max_time = max_time
+        self.tolerance = tolerance
+        self.ready_timeout = ready_timeout
+        # Own connection pool, large enough for the concurrent queries
+        self.client = QdrantHTTPClient(
+            host=client.host,
+            api_key=client.api_key,
+            connect_timeout=client.connect_timeout,
+            read_timeout=client.read_timeout,
+            retries=client.retries,
+            pool_size=self.concurrency
+        )
+
+    def wait_until_ready(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        """Collection info once it is green, not optimizing and its counts are stable; None on timeout"""
+        seen = []
+
+        def check():
+            info = self.client.request_json("GET", f"/collections/{collection_name}", retry=False)["result"]
+            if info.get("status") != "green" or info.get("optimizer_status", "ok") != "ok":
+                seen.clear()
+                return None
+            seen.append((info.get("points_count"), info.get("indexed_vectors_count")))
+            if len(seen) >= 2 and seen[-1] == seen[-2]:
+                return info
+            return None
+
+        return poll(check, f"collection '{collection_name}' to finish indexing", timeout=self.ready_timeout)
+
+    def build_queries(self, collection_name: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """(endpoint, body) of the queries to replay"""
+        if self.recorded is not None:
+            queries = []
+            for query in self.recorded:
+                if "body" in query:
+                    if query.get("collection", collection_name) != collection_name:
+                        continue
+                    query = query["body"]
+                queries.append((query_endpoint(collection_name, query), query))
+            return queries
+
+        points = self._sample_points(collection_name)
+        endpoint = f"/collections/{collection_name}/points/search"
+        queries = []
+        for point in points:
+            vector = point.get("vector")
+            if isinstance(vector, dict):
+                # Named vectors: search every dense one, so all indexes get warm
+                for name, value in vector.items():
+                    if isinstance(value, list) and value and not isinstance(value[0], list):
+                        queries.append((endpoint, {"vector": {"name": name, "vector": value},
+                                                   "limit": SEARCH_LIMIT, "with_payload": True}))
+            elif isinstance(vector, list) and vector and not isinstance(vector[0], list):
+                queries.append((endpoint, {"vector": vector, "limit": SEARCH_LIMIT, "with_payload": True}))
+        return queries
+
+    def _sample_points(self, collection_name: str) -> List[Dict[str, Any]]:
+        """Random points with their vectors (the first points if random sampling is not supported)"""
+        try:
+            return self.client.request_json(
+                "POST",
+                f"/collections/{collection_name}/points/query",
+                json={"query": {"sample": "random"}, "limit": self.sample, "with_payload": False, "with_vector": True}
+            )["result"]["points"]
+        except (QdrantRequestError, KeyError, TypeError):
+            # Qdrant before 1.11 has neither the query API nor random sampling
+            return self.client.request_json(
+                "POST",
+                f"/collections/{collection_name}/points/scroll",
+                json={"limit": self.sample, "with_payload": False, "with_vector": True}
+            )["result"]["points"]
+
+    def _timed_query(self, query: Tuple[str, Dict[str, Any]]) -> Optional[float]:
+        endpoint, body = query
+        start = time.perf_counter()
+        try:
+            self.client.request("POST", endpoint, json=body, retry=False).close()
+        except QdrantRequestError:
+            return None
+        return time.perf_counter() - start
+
+    def replay_round(self, queries: List[Tuple[str, Dict[str, Any]]], executor: ThreadPoolExecutor) -> Tuple[List[float], int]:
+        """
+        Send every query in random order, repeated up to MIN_ROUND_QUERIES;
+        returns the sorted latencies and the number of errors
+        """
+        order = list(queries) * -(-MIN_ROUND_QUERIES // len(queries))
+        random.shuffle(order)
+        results = list(executor.map(self._timed_query, order))
+        latencies = sorted(latency for latency in results if latency is not None)
+        return latencies, len(results) - len(latencies)
+
+    def warm_up(self, collection_name: str) -> Dict[str, Any]:
+        """
+        Wait for the collection and replay queries until latency is stable.
+
+        The result has 'ready' (False if the collection never became ready),
+        'stable', the number of queries and errors, and the latency curve:
+        one entry per round with its elapsed time and percentiles in ms.
+        """
+        result = {"ready": False, "stable": False, "queries": 0, "errors": 0, "rounds": []}
+        print(f"[{collection_name}] Warm-up: waiting for the collection to finish indexing...")
+        wait_start = time.time()
+        info = self.wait_until_ready(collection_name)
+        result["ready_time"] = round(time.time() - wait_start, 3)
+        if info is None:
+            print(f"[{collection_name}] Warm-up: collection did not become ready")
+            return result
+        result["ready"] = True
+
+        try:
+            queries = self.build_queries(collection_name)
+        except (QdrantRequestError, KeyError) as e:
+            print(f"[{collection_name}] Warm-up: could not build queries ({e})")
+            return result
+        if not queries:
+            print(f"[{collection_name}] Warm-up: no queries to replay")
+            result["stable"] = True
+            return result
+        print(f"[{collection_name}] Warm-up: replaying {len(queries)} "
+              f"{'recorded' if self.recorded is not None else 'synthetic'} queries, {self.concurrency} at a time")
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while time.time() - start < self.max_time:
+                latencies, errors = self.replay_round(queries, executor)
+                result["queries"] += len(latencies) + errors
+                result["errors"] += errors
+                if not latencies:
+                    print(f"[{collection_name}] Warm-up: every query failed, giving up")
+                    break
+                point = {
+                    "round": len(result["rounds"]) + 1,
+                    "elapsed": round(time.time() - start, 3),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                    "max_ms": round(latencies[-1] * 1000, 3),
+                }
+                print(f"[{collection_name}] Warm-up round {point['round']}: p50 {point['p50_ms']:.1f} ms, "
+                      f"p95 {point['p95_ms']:.1f} ms, p99 {point['p99_ms']:.1f} ms"
+                      + (f", {errors} errors" if errors else ""))
+                result["rounds"].append(point)
+                window = [round_["p95_ms"] for round_ in result["rounds"][-STABLE_ROUNDS:]]
+                if len(window) == STABLE_ROUNDS and max(window) - min(window) <= self.tolerance * min(window):
+                    result["stable"] = True
+                    break
+
+        result["elapsed"] = round(time.time() - start, 3)
+        rounds = result["rounds"]
+        if rounds:
+            print(f"[{collection_name}] Warm-up {'finished' if result['stable'] else 'stopped before latency was stable'} "
+                  f"after {len(rounds)} rounds in {result['elapsed']:.1f}s: "
+                  f"p95 {rounds[0]['p95_ms']:.1f} ms -> {rounds[-1]['p95_ms']:.1f} ms")
+        return result
+
+
+def add_warmup_arguments(parser) -> None:
+    """Add the warm-up options of restore_snapshots.py"""
+    parser.add_argument("--warmup", action="store_true",
+                        help="After restoring, wait until the collection is indexed and replay queries until latency is stable")
+    parser.add_argument("--warmup-queries", metavar="FILE",
+                        help="JSON lines file of recorded search/query bodies to replay (default: synthetic queries)")
+    parser.add_argument("--warmup-sample", type=int, default=DEFAULT_SAMPLE,
+                        help=f"Stored vectors used as synthetic queries (default: {DEFAULT_SAMPLE})")
+    parser.add_argument("--warmup-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Warm-up queries in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--warmup-max-time", type=float, default=DEFAULT_MAX_TIME,
+                        help=f"Max seconds of query replay per collection (default: {DEFAULT_MAX_TIME:.0f})")
+    parser.add_argument("--warmup-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Relative p95 spread of the last {STABLE_ROUNDS} rounds that counts as stable (default: {DEFAULT_TOLERANCE})")
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 reverse proxy for sidecars in front of Qdrant
+
+The sidecars (query_cache.py, ingest_gateway.py) handle a few requests
+themselves and pass everything else through. ReverseProxy does the pass-through:
+it keeps a pool of upstream keep-alive connections, streams large bodies
+(snapshot uploads and downloads) without buffering them, and answers
+Expect: 100-continue itself. Subclasses override handle() to intercept
+requests. Only the Python standard library is needed.
+"""
+
+import asyncio
+import json
+import ssl
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+# Request bodies up to this size are read before forwarding, so the request
+# can be retried on a fresh upstream connection; larger ones are streamed
+BUFFERED_BODY_LIMIT = 1024 * 1024
+COPY_CHUNK_SIZE = 256 * 1024
+
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-connection", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "upgrade", "expect",
+})
+# Headers that carry the client's credentials
+CREDENTIAL_HEADERS = ("api-key", "authorization")
+
+
+class Head:
+    """Start line and headers of a request or response"""
+
+    def __init__(self, start_line: str, headers: List[Tuple[str, str]]):
+        self.start_line = start_line
+        self.headers = headers
+
+    def get(self, name: str, default: str = "") -> str:
+        for header, value in self.headers:
+            if header.lower() == name:
+                return value
+        return default
+
+    def is_chunked(self) -> bool:
+        return "chunked" in self.get("transfer-encoding").lower()
+
+    def content_length(self) -> Optional[int]:
+        value = self.get("content-length")
+        return int(value) if value.isdigit() else None
+
+    def status(self) -> int:
+        """Status code of a response head"""
+        return int(self.start_line.split(" ")[1])
+
+
+async def read_head(reader: asyncio.StreamReader) -> Optional[Head]:
+    """Read a start line and headers; None at a clean end of the connection"""
+    line = await reader.readline()
+    while line in (b"\r\n", b"\n"):
+        line = await reader.readline()
+    if not line:
+        return None
+    headers = []
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers.append((name.strip(), value.strip()))
+    return Head(line.decode("latin-1").strip(), headers)
+
+
+async def copy_body(
+    reader: asyncio.StreamReader,
+    writer: Optional[asyncio.StreamWriter],
+    head: Head,
+    until_eof: bool = False,
+    tee: Optional[bytearray] = None,
+    tee_limit: int = 0
+) -> Optional[bytearray]:
+    """
+    Copy one message body with its framing from reader to writer.
+
+    With tee, the body data (without chunk framing) is collected as well;
+    None is returned instead once it would exceed tee_limit.
+    """
+    def collect(data: bytes) -> None:
+        nonlocal tee
+        if tee is not None:
+            if len(tee) + len(data) > tee_limit:
+                tee = None
+            else:
+                tee.extend(data)
+
+    async def forward(data: bytes) -> None:
+        if writer is not None:
+            writer.write(data)
+            await writer.drain()
+
+    if head.is_chunked():
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise ConnectionError("connection closed inside a chunked body")
+            await forward(size_line)
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                # Trailers, up to the empty line
+                while True:
+                    line = await reader.readline()
+                    await forward(line)
+                    if line in (b"\r\n", b"\n", b""):
+                        return tee
+            while size:
+                data = await reader.readexactly(min(size, COPY_CHUNK_SIZE))
+                size -= len(data)
+                collect(data)
+                await forward(data)
+            await forward(await reader.readexactly(2))
+
+    remaining = head.content_length()
+    if remaining is None and until_eof:
+        while True:
+            data = await reader.read(COPY_CHUNK_SIZE)
+            if not data:
+                return tee
+            collect(data)
+            await forward(data)
+    while remaining:
+        data = await reader.readexactly(min(remaining, COPY_CHUNK_SIZE))
+        remaining -= len(data)
+        collect(data)
+        await forward(data)
+    return tee
+
+
+class Request:
+    """A client request; body is None while it still has to be streamed from reader"""
+
+    def __init__(self, head: Head, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.head = head
+        self.reader = reader
+        self.writer = writer
+        self.method, self.target, version = head.start_line.split(" ", 2)
+        url = urlsplit(self.target)
+        self.path = url.path
+        self.query = url.query
+        connection_header = head.get("connection").lower()
+        self.keep_alive = connection_header != "close" and (version != "HTTP/1.0" or connection_header == "keep-alive")
+        self.body: Optional[bytes] = None
+
+
+class UpstreamConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ReverseProxy:
+    def __init__(self, upstream: str, pool_size: int = 64):
+        url = urlsplit(upstream)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.host_header = url.netloc
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.pool_size = pool_size
+        self._idle: List[UpstreamConnection] = []
+
+    # Upstream connections
+
+    async def _connection(self) -> UpstreamConnection:
+        if self._idle:
+            return self._idle.pop()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        return UpstreamConnection(reader, writer)
+
+    def _release(self, connection: UpstreamConnection, reusable: bool) -> None:
+        if reusable and len(self._idle) < self.pool_size:
+            connection.reused = True
+            self._idle.append(connection)
+        else:
+            connection.close()
+
+    async def _send(self, request_head: bytes, body: Optional[bytes],
+                    stream_from: Optional[Tuple[asyncio.StreamReader, Head]] = None) -> Tuple[UpstreamConnection, Head]:
+        """
+        Send a request and read the final response head.
+
+        An idle keep-alive connection may have been closed by Qdrant; the
+        request is retried once on a fresh one if its body is still at hand.
+        """
+        while True:
+            connection = await self._connection()
+            try:
+                connection.writer.write(request_head + (body or b""))
+                if stream_from is not None:
+                    await copy_body(stream_from[0], connection.writer, stream_from[1])
+                await connection.writer.drain()
+                response = await read_head(connection.reader)
+                # Skip interim responses (100 Continue)
+                while response is not None and response.status() < 200:
+                    response = await read_head(connection.reader)
+                if response is None:
+                    raise ConnectionError("upstream closed the connection")
+                return connection, response
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+                if connection.reused and stream_from is None:
+                    continue
+                raise
+
+    async def fetch(self, method: str, target: str, body: bytes = b"",
+                    headers: Iterable[Tuple[str, str]] = (), limit: int = 64 * 1024 * 1024) -> Tuple[int, Head, bytes]:
+        """Request made by the proxy itself; returns status, response head and body"""
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        request_head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        connection, response = await self._send(request_head, body)
+        try:
+            data = await copy_body(connection.reader, None, response, until_eof=True, tee=bytearray(), tee_limit=limit)
+        except BaseException:
+            connection.close()
+            raise
+        if data is None:
+            connection.close()
+            raise ValueError(f"response to {method} {target} is larger than {limit} bytes")
+        self._release(connection, response.get("connection").lower() != "close")
+        return response.status(), response, bytes(data)
+
+    # Client side
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                request = Request(head, reader, writer)
+                if head.get("expect").lower() == "100-continue":
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                    await writer.drain()
+                # Small bodies are read first, which also lets a failed upstream
+                # connection be retried; large ones (snapshot uploads) are streamed
+                length = head.content_length()
+                if not head.is_chunked() and (length or 0) <= BUFFERED_BODY_LIMIT:
+                    request.body = await reader.readexactly(length) if length else b""
+                if not await self.handle(request):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, UnicodeDecodeError):
+            pass
+        except asyncio.CancelledError:
+            # Idle client connections are cancelled when the proxy shuts down
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, request: Request) -> bool:
+        """Serve one request; returns whether the client connection stays open"""
+        return (await self.forward(request))[3]
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes,
+                      extra_headers: str = "", keep_alive: bool = True) -> None:
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"{extra_headers}Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    @classmethod
+    async def respond_json(cls, writer: asyncio.StreamWriter, status: str, data, extra_headers: str = "",
+                           keep_alive: bool = True) -> None:
+        await cls.respond(writer, status, "application/json", json.dumps(data).encode(), extra_headers, keep_alive)
+
+    async def forward(
+        self,
+        request: Request,
+        extra_headers: Iterable[str] = (),
+        tee_limit: int = 0
+    ) -> Tuple[int, str, Optional[bytearray], bool]:
+        """
+        Send a request upstream and stream the response back to the client.
+
+        Returns the status, the content type, the response body if it is
+        at most tee_limit bytes and not content-encoded (None otherwise) and
+        whether the client connection stays open. An encoded body could not
+        be replayed without its Content-Encoding, so it is never collected.
+        """
+        lines = [f"{request.method} {request.target} HTTP/1.1", f"Host: {self.host_header}", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in request.head.headers
+                     if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != "host")
+        request_head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        try:
+            connection, response = await self._send(
+                request_head, request.body,
+                stream_from=(request.reader, request.head) if request.body is None else None
+            )
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            await self.respond_json(request.writer, "502 Bad Gateway", {"status": {"error": f"Upstream error: {e}"}},
+                                    keep_alive=False)
+            return 502, "", None, False
+
+        status = response.status()
+        upstream_keep_alive = response.get("connection").lower() != "close"
+        no_body = request.method == "HEAD" or status in (204, 304)
+        framed = no_body or response.is_chunked() or response.content_length() is not None
+        keep_alive = request.keep_alive and framed
+
+        lines = [f"HTTP/1.1 {response.start_line.split(' ', 1)[1]}"]
+        lines.extend(f"{name}: {value}" for name, value in response.headers if name.lower() not in HOP_BY_HOP_HEADERS)
+        lines.extend(extra_headers)
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        request.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        collected = None
+        collect = tee_limit and response.get("content-encoding", "identity").lower() == "identity"
+        try:
+            if not no_body:
+                collected = await copy_body(
+                    connection.reader, request.writer, response, until_eof=not framed,
+                    tee=bytearray() if collect else None, tee_limit=tee_limit
+                )
+            await request.writer.drain()
+        except BaseException:
+            connection.close()
+            raise
+        self._release(connection, upstream_keep_alive and framed)
+        return status, response.get("content-type", "application/json"), collected, keep_alive
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Write-coalescing ingest gateway for the Qdrant REST API
+
+Producers that upsert one point per request spend most of Qdrant's ingest
+capacity on per-request overhead. This proxy sits between Caddy and Qdrant,
+collects small upserts (PUT /collections/{name}/points with a "points" list)
+per collection and sends them as one batched upsert:
+
+    batching    requests are grouped by collection, query string (wait,
+                ordering), shard key and credentials; a batch is sent once it
+                holds --max-batch points or its oldest request has waited
+                --max-delay milliseconds
+    results     every caller of a batch gets Qdrant's response to it. If a
+                batch is rejected (for example one point has a wrong vector
+                size), its requests are sent again one by one, so only the
+                faulty request fails
+    ordering    batches of one group are sent one at a time, in order, so a
+                producer's later upsert never overtakes an earlier one. While
+                a batch is being sent the next one keeps filling, so batches
+                grow when Qdrant is slow to answer
+    backpressure at most --max-pending points are queued or being sent; further
+                upserts wait up to --queue-timeout seconds for room and are
+                then answered with 503 and Retry-After
+
+Every other request, including upserts in the columnar "batch" format, is
+passed through unchanged. Pending batches are sent before the gateway exits.
+
+Usage:
+    python ingest_gateway.py --upstream http://qdrant:6333 --port 6333
+    python ingest_gateway.py --upstream http://localhost:8081 --port 8083 --max-delay 20
+
+Options:
+    --listen         Address to listen on (default: 0.0.0.0)
+    --port           Port to listen on (default: 6333)
+    --upstream       Qdrant URL (default: http://qdrant:6333)
+    --max-batch      Points per batched upsert (default: 256)
+    --max-delay      Milliseconds a request may wait for its batch to fill (default: 10)
+    --max-pending    Points queued or in flight before producers are held back (default: 10000)
+    --max-inflight   Batched upserts sent to Qdrant at the same time (default: 4)
+    --queue-timeout  Seconds an upsert may wait for room before it gets a 503 (default: 5)
+
+GET /__ingest/stats returns request, point and batch counters and the current
+throughput as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import signal
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
+
+from http_proxy import CREDENTIAL_HEADERS, Request, ReverseProxy
+
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY_MS = 10.0
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_MAX_INFLIGHT = 4
+DEFAULT_QUEUE_TIMEOUT = 5.0
+STATS_PATH = "/__ingest/stats"
+# Window over which the current throughput is reported
+THROUGHPUT_WINDOW = 10.0
+
+UPSERT_PATH = re.compile(r"^/collections/(?P<collection>[^/]+)/points$")
+
+# collection, query string, credentials, shard key
+GroupKey = Tuple[str, str, Tuple[str, ...], str]
+
+
+class _Pending:
+    """One producer's upsert waiting for the result of its batch"""
+
+    def __init__(self, request: Request, points: List[Any]):
+        self.request = request
+        self.points = points
+        self.result: "asyncio.Future[Tuple[str, str, bytes]]" = asyncio.get_running_loop().create_future()
+
+
+class _Batch:
+    def __init__(self):
+        self.requests: List[_Pending] = []
+        self.points = 0
+        self.created = asyncio.get_running_loop().time()
+        self.full = asyncio.Event()
+
+
+class IngestGateway(ReverseProxy):
+    def __init__(
+        self,
+        upstream: str,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY_MS / 1000,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_inflight: int = DEFAULT_MAX_INFLIGHT,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+        pool_size: int = 64
+    ):
+        super().__init__(upstream, pool_size)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+
+        # Batches of each group in order; only the last one still takes requests.
+        # One sender task per group sends them one after the other
+        self.batches: Dict[GroupKey, List[_Batch]] = {}
+        self.senders: Dict[GroupKey, asyncio.Task] = {}
+        self.inflight = asyncio.Semaphore(max_inflight)
+        self.stopping = False
+        self.pending_points = 0
+        self.room = asyncio.Condition()
+
+        self.started = time.time()
+        self.recent: Deque[Tuple[float, int]] = deque()
+        self.stats = {
+            "requests": 0, "points": 0, "batches": 0, "batched_points": 0, "passthrough": 0,
+            "failed_batches": 0, "split_batches": 0, "rejected": 0,
+        }
+
+    # Request classification
+
+    @staticmethod
+    def parse_upsert(request: Request) -> Optional[Tuple[GroupKey, List[Any]]]:
+        """Group and points of an upsert that can be batched, None for anything else"""
+        match = UPSERT_PATH.match(request.path)
+        if request.method != "PUT" or not match or request.body is None:
+            return None
+        try:
+            body = json.loads(request.body)
+        except ValueError:
+            return None
+        if not isinstance(body, dict) or not isinstance(body.get("points"), list) or not body["points"]:
+            return None
+        if set(body) - {"points", "shard_key"}:
+            return None
+        credentials = tuple(request.head.get(name) for name in CREDENTIAL_HEADERS)
+        shard_key = json.dumps(body.get("shard_key"), sort_keys=True)
+        return (match.group("collection"), request.query, credentials, shard_key), body["points"]
+
+    # Backpressure
+
+    async def _admit(self, points: int) -> bool:
+        """Wait until the points fit under --max-pending; False on timeout"""
+        async with self.room:
+            # A request larger than the limit on its own is let through once nothing else is pending
+            def fits() -> bool:
+                return self.pending_points + points <= self.max_pending or self.pending_points == 0
+
+            try:
+                await asyncio.wait_for(self.room.wait_for(fits), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+            self.pending_points += points
+            return True
+
+    async def _release_room(self, points: int) -> None:
+        async with self.room:
+            self.pending_points -= points
+            self.room.notify_all()
+
+    # Batching
+
+    def _add(self, key: GroupKey, pending: _Pending) -> None:
+        batches = self.batches.setdefault(key, [])
+        if not batches or batches[-1].points + len(pending.points) > self.max_batch:
+            if batches:
+                batches[-1].full.set()
+            batches.append(_Batch())
+        batch = batches[-1]
+        batch.requests.append(pending)
+        batch.points += len(pending.points)
+        if batch.points >= self.max_batch or self.stopping:
+            batch.full.set()
+        if key not in self.senders:
+            self.senders[key] = asyncio.ensure_future(self._sender(key))
+
+    async def _sender(self, key: GroupKey) -> None:
+        """
+        Send the batches of a group in order, one at a time.
+
+        A batch is sent once it is full or its first request has waited
+        max_delay. While one batch is being sent the next one keeps filling,
+        so batches grow by themselves when Qdrant is slow to answer.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self.batches.get(key):
+                batch = self.batches[key][0]
+                remaining = batch.created + self.max_delay - loop.time()
+                if remaining > 0 and not batch.full.is_set():
+                    try:
+                        await asyncio.wait_for(batch.full.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                self.batches[key].pop(0)
+                async with self.inflight:
+                    await self._send_batch(key, batch)
+        finally:
+            del self.senders[key]
+            if not self.batches.get(key):
+                self.batches.pop(key, None)
+
+    async def flush_all(self) -> None:
+        """Send every pending batch and wait for the results"""
+        self.stopping = True
+        for batches in self.batches.values():
+            for batch in batches:
+                batch.full.set()
+        while self.senders:
+            await asyncio.gather(*list(self.senders.values()), return_exceptions=True)
+
+    async def _upsert(self, key: GroupKey, requests: List[_Pending]) -> Tuple[str, str, bytes]:
+        """One upsert of the points of several requests; returns status line, content type and body"""
+        collection, query, credentials, shard_key = key
+        body: Dict[str, Any] = {"points": [point for pending in requests for point in pending.points]}
+        if shard_key != "null":
+            body["shard_key"] = json.loads(shard_key)
+        headers = [("Content-Type", "application/json")]
+        headers.extend((name, value) for name, value in zip(CREDENTIAL_HEADERS, credentials) if value)
+        target = f"/collections/{collection}/points" + (f"?{query}" if query else "")
+        try:
+            status, response, data = await self.fetch("PUT", target, json.dumps(body).encode(), headers)
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            error = json.dumps({"status": {"error": f"Upstream error: {e}"}}).encode()
+            return "502 Bad Gateway", "application/json", error
+        return response.start_line.split(" ", 1)[1], response.get("content-type", "application/json"), data
+
+    async def _send_batch(self, key: GroupKey, batch: _Batch) -> None:
+        try:
+            result = await self._upsert(key, batch.requests)
+            self.stats["batches"] += 1
+            self.stats["batched_points"] += batch.points
+            if result[0].startswith("2"):
+                self.recent.append((time.monotonic(), batch.points))
+                for pending in batch.requests:
+                    pending.result.set_result(result)
+                return
+
+            self.stats["failed_batches"] += 1
+            if len(batch.requests) == 1 or result[0].startswith("502"):
+                for pending in batch.requests:
+                    pending.result.set_result(result)
+                return
+
+            # Find the faulty requests: send each one on its own
+            self.stats["split_batches"] += 1
+            for pending in batch.requests:
+                result = await self._upsert(key, [pending])
+                if result[0].startswith("2"):
+                    self.recent.append((time.monotonic(), len(pending.points)))
+                pending.result.set_result(result)
+        except BaseException as e:
+            for pending in batch.requests:
+                if not pending.result.done():
+                    pending.result.set_exception(e)
+            raise
+
+    # Client side
+
+    def throughput(self) -> float:
+        """Points per second acknowledged by Qdrant over the last THROUGHPUT_WINDOW seconds"""
+        now = time.monotonic()
+        while self.recent and self.recent[0][0] < now - THROUGHPUT_WINDOW:
+            self.recent.popleft()
+        elapsed = min(THROUGHPUT_WINDOW, time.time() - self.started)
+        return sum(points for _, points in self.recent) / elapsed if elapsed > 0 else 0.0
+
+    def stats_document(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return dict(
+            self.stats,
+            pending_points=self.pending_points,
+            queued_batches=sum(len(batches) for batches in self.batches.values()),
+            average_batch_points=round(self.stats["batched_points"] / batches, 1) if batches else None,
+            points_per_second=round(self.throughput(), 1),
+            uptime=round(time.time() - self.started, 1),
+        )
+
+    async def handle(self, request: Request) -> bool:
+        if request.path == STATS_PATH:
+            await self.respond_json(request.writer, "200 OK", self.stats_document(), keep_alive=request.keep_alive)
+            return request.keep_alive
+
+        upsert = self.parse_upsert(request)
+        if upsert is None:
+            self.stats["passthrough"] += 1
+            return await super().handle(request)
+
+        key, points = upsert
+        self.stats["requests"] += 1
+        self.stats["points"] += len(points)
+        if not await self._admit(len(points)):
+            self.stats["rejected"] += 1
+            error = {"status": {"error": "Ingest queue is full, retry later"}}
+            await self.respond_json(request.writer, "503 Service Unavailable", error, "Retry-After: 1\r\n",
+                                    request.keep_alive)
+            return request.keep_alive
+
+        pending = _Pending(request, points)
+        try:
+            self._add(key, pending)
+            status, content_type, body = await pending.result
+        finally:
+            await self._release_room(len(points))
+        await self.respond(request.writer, status, content_type, body, keep_alive=request.keep_alive)
+        return request.keep_alive
+
+
+async def serve(args) -> None:
+    gateway = IngestGateway(
+        args.upstream,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay / 1000,
+        max_pending=args.max_pending,
+        max_inflight=args.max_inflight,
+        queue_timeout=args.queue_timeout
+    )
+    server = await asyncio.start_server(gateway.handle_client, args.listen, args.port)
+    print(f"Ingest gateway listening on {args.listen}:{args.port}, upstream {args.upstream} "
+          f"(batches of up to {args.max_batch} points, {args.max_delay:g} ms)", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    # Stop accepting requests, then send what is still queued
+    server.close()
+    await gateway.flush_all()
+    stats = gateway.stats_document()
+    print(f"Ingest gateway stopped: {stats['points']} points in {stats['requests']} requests, "
+          f"{stats['batches']} batches", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-coalescing ingest gateway for the Qdrant REST API")
+    parser.add_argument("--listen", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=6333, help="Port to listen on")
+    parser.add_argument("--upstream", default="http://qdrant:6333", help="Qdrant URL")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Points per batched upsert")
+    parser.add_argument("--max-delay", type=float, default=DEFAULT_MAX_DELAY_MS,
+                        help="Milliseconds a request may wait for its batch to fill")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="Points queued or in flight before producers are held back")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Batched upserts sent to Qdrant at the same time")
+    parser.add_argument("--queue-timeout", type=float, default=DEFAULT_QUEUE_TIMEOUT,
+                        help="Seconds an upsert may wait for room before it gets a 503")
+    args = parser.parse_args()
+
+    if args.max_batch < 1 or args.max_pending < 1 or args.max_inflight < 1:
+        parser.error("--max-batch, --max-pending and --max-inflight must be at least 1")
+
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Qdrant Live Collection Migration Tool
+
+This script copies a collection directly from one Qdrant instance (or
+collection) to another while the source stays online. Points are read with
+the scroll API and written to the target with batched upserts; a reader
+thread and several writer threads are connected by a bounded queue, so the
+copy runs in constant memory and the slower side sets the pace.
+
+After the full copy, catch-up passes bring the target up to date with the
+writes that happened in the meantime, so the final cut-over only needs a
+short write pause for the last catch-up pass.
+
+Usage:
+    python migrate_collection.py --collection <name> --target-host <url>
+    python migrate_collection.py --collection <name> --target-host <url> --updated-field updated_at
+    python migrate_collection.py --collection <name> --target-host <url> --since <timestamp>
+
+Options:
+    --collection         Collection to migrate
+    --target-collection  Name of the collection on the target (default: same name)
+    --source-host        Source Qdrant URL (default: http://localhost:6333)
+    --source-api-key     Source Qdrant API key (if required)
+    --target-host        Target Qdrant URL (default: same as --source-host)
+    --target-api-key     Target Qdrant API key (default: same as --source-api-key)
+    --batch-size         Points per scroll page and upsert request (default: 500)
+    --writers            Number of concurrent upsert workers (default: 4)
+    --queue-size         Batches buffered between reader and writers (default: 8)
+    --catch-up           Number of catch-up passes after the copy (default: 1)
+    --updated-field      Payload field holding the last update time of a point
+    --updated-format     Format of --updated-field: epoch (seconds) or datetime
+    --since              Skip the full copy and only catch up from this Unix time
+"""
+
+import argparse
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Any
+
+from point_export import collection_create_body
+from qdrant_http import QdrantHTTPClient, QdrantRequestError, add_connection_arguments
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WRITERS = 4
+DEFAULT_QUEUE_SIZE = 8
+
+# Catch-up passes look this far back before the previous pass started, to
+# cover clock differences between this host and the writers
+CLOCK_SKEW_MARGIN = 60
+
+
+def point_sort_key(point_id: Any) -> tuple:
+    """Order of point ids in scroll results: numeric ids first, then UUIDs"""
+    if isinstance(point_id, int):
+        return (0, point_id, "")
+    return (1, 0, str(point_id).lower())
+
+
+class QdrantMigration:
+    def __init__(
+        self,
+        source: QdrantHTTPClient,
+        target: QdrantHTTPClient,
+        collection_name: str,
+        target_collection: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        writers: int = DEFAULT_WRITERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        updated_field: Optional[str] = None,
+        updated_format: str = "epoch"
+    ):
+        self.source = source
+        self.target = target
+        self.collection_name = collection_name
+        self.target_collection = target_collection or collection_name
+        self.batch_size = max(1, batch_size)
+        self.writers = max(1, writers)
+        self.queue_size = max(1, queue_size)
+        self.updated_field = updated_field
+        self.updated_format = updated_format
+
+        self.stats = {"copied": 0, "deleted": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, value: int) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def ensure_target(self) -> bool:
+        """Create the target collection with the source configuration if it does not exist"""
+        try:
+            self.target.request_json("GET", f"/collections/{self.target_collection}")
+            print(f"Target collection '{self.target_collection}' exists, points will be upserted into it")
+            return True
+        except QdrantRequestError as e:
+            if e.status_code != 404:
+                print(f"Error checking target collection '{self.target_collection}': {e}")
+                return False
+
+        try:
+            config = self.source.request_json("GET", f"/collections/{self.collection_name}")["result"].get("config")
+            print(f"Creating target collection '{self.target_collection}' with the source configuration")
+            self.target.request_json(
+                "PUT",
+                f"/collections/{self.target_collection}",
+                json=collection_create_body(config)
+            )
+            return True
+        except (QdrantRequestError, KeyError, TypeError) as e:
+            print(f"Error creating target collection '{self.target_collection}': {e}")
+            return False
+
+    def scroll(
+        self,
+        client: QdrantHTTPClient,
+        collection_name: str,
+        scroll_filter: Optional[Dict[str, Any]] = None,
+        with_data: bool = True,
+        limit: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the points of a collection page by page, in id order"""
+        offset = None
+        while True:
+            body = {"limit": limit or self.batch_size, "with_payload": with_data, "with_vector": with_data}
+            if scroll_filter:
+                body["filter"] = scroll_filter
+            if offset is not None:
+                body["offset"] = offset
+            # Scroll only reads, so it is safe to retry
+            result = client.request_json(
+                "POST",
+                f"/collections/{collection_name}/points/scroll",
+                json=body,
+                retry=True
+            )["result"]
+            if result["points"]:
+                yield result["points"]
+
+            offset = result.get("next_page_offset")
+            if offset is None:
+                return
+
+    def _upsert(self, points: List[Dict[str, Any]]) -> None:
+        # Upserts by id are idempotent, so the PUT is retried on transient errors
+        self.target.request_json(
+            "PUT",
+            f"/collections/{self.target_collection}/points",
+            params={"wait": "true"},
+            json={"points": [
+                {"id": p["id"], "vector": p.get("vector") or {}, "payload": p.get("payload") or {}}
+                for p in points
+            ]}
+        )
+        self._count("copied", len(points))
+
+    def copy_points(self, scroll_filter: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Copy the points matching scroll_filter (all points by default).
+
+        The reader blocks once queue_size batches are waiting, so at most
+        queue_size + writers batches are in memory at any time.
+        """
+        batches = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        start = self.stats["copied"]
+
+        def writer():
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    self._upsert(batch)
+                except Exception as e:
+                    # Keep draining the queue, or the reader would block on put() forever
+                    errors.append(e)
+
+        threads = [threading.Thread(target=writer, daemon=True) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+
+        started = time.time()
+        last_report = started
+        try:
+            for points in self.scroll(self.source, self.collection_name, scroll_filter):
+                if errors:
+                    break
+                batches.put(points)
+                if time.time() - last_report >= 10:
+                    copied = self.stats["copied"] - start
+                    print(f"  {copied} points copied ({copied / (time.time() - started):.0f} points/s, "
+                          f"{batches.qsize()}/{self.queue_size} batches queued)")
+                    last_report = time.time()
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+        return self.stats["copied"] - start
+
+    def _updated_since(self, since: float) -> Dict[str, Any]:
+        since -= CLOCK_SKEW_MARGIN
+        if self.updated_format == "datetime":
+            value = datetime.fromtimestamp(since, tz=timezone.utc).isoformat()
+        else:
+            value = since
+        return {"must": [{"key": self.updated_field, "range": {"gte": value}}]}
+
+    def _ids(self, client: QdrantHTTPClient, collection_name: str) -> Iterator[Any]:
+        for points in self.scroll(client, collection_name, with_data=False, limit=self.batch_size * 10):
+            for point in points:
+                yield point["id"]
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Compare the point ids of source and target and fix the differences.
+
+        Both id lists are streamed in scroll order and merged, so no id set is
+        held in memory. Points missing on the target are copied, points that
+        no longer exist on the source are deleted from the target. Points
+        changed in place are not detected here; use updated_field for those.
+        """
+        source_ids = self._ids(self.source, self.collection_name)
+        target_ids = self._ids(self.target, self.target_collection)
+        missing = []
+        extra = []
+        result = {"copied": 0, "deleted": 0}
+
+        source_id = next(source_ids, None)
+        target_id = next(target_ids, None)
+        while source_id is not None or target_id is not None:
+            if target_id is None or (source_id is not None and point_sort_key(source_id) < point_sort_key(target_id)):
+                missing.append(source_id)
+                source_id = next(source_ids, None)
+            elif source_id is None or point_sort_key(target_id) < point_sort_key(source_id):
+                extra.append(target_id)
+                target_id = next(target_ids, None)
+            else:
+                source_id = next(source_ids, None)
+                target_id = next(target_ids, None)
+
+            if len(missing) >= self.batch_size or (missing and source_id is None and target_id is None):
+                result["copied"] += self._copy_ids(missing)
+                missing = []
+            if len(extra) >= self.batch_size or (extra and source_id is None and target_id is None):
+                result["deleted"] += self._delete_ids(extra)
+                extra = []
+
+        return result
+
+    def _copy_ids(self, ids: List[Any]) -> int:
+        points = self.source.request_json(
+            "POST",
+            f"/collections/{self.collection_name}/points",
+            json={"ids": ids, "with_payload": True, "with_vector": True},
+            retry=True
+        )["result"]
+        if points:
+            self._upsert(points)
+        return len(points)
+
+    def _delete_ids(self, ids: List[Any]) -> int:
+        # Deleting by id is idempotent
+        self.target.request_json(
+            "POST",
+            f"/collections/{self.target_collection}/points/delete",
+            params={"wait": "true"},
+            json={"points": ids},
+            retry=True
+        )
+        self._count("deleted", len(ids))
+        return len(ids)
+
+    def migrate(self, catch_up_passes: int = 1, since: Optional[float] = None) -> Optional[float]:
+        """
+        Run the full copy (unless `since` is given) and the catch-up passes.
+
+        Returns the start time of the last pass: writes from that point on
+        may not have been copied yet, so pass it as `since` to the final
+        catch-up run after writes to the source have been stopped.
+        """
+        if not self.ensure_target():
+            return None
+
+        try:
+            pass_start = since
+            if since is None:
+                print(f"Copying collection '{self.collection_name}' to '{self.target_collection}' "
+                      f"({self.writers} writers, batches of {self.batch_size})...")
+                pass_start = time.time()
+                copy_start = time.time()
+                copied = self.copy_points()
+                elapsed = time.time() - copy_start
+                print(f"Copied {copied} points in {elapsed:.2f}s ({copied / max(elapsed, 0.001):.0f} points/s)")
+
+            for number in range(1, catch_up_passes + 1):
+                next_start = time.time()
+                print(f"Catch-up pass {number}/{catch_up_passes} "
+                      f"(changes since {datetime.fromtimestamp(pass_start):%Y-%m-%d %H:%M:%S})...")
+                if self.updated_field:
+                    updated = self.copy_points(self._updated_since(pass_start))
+                    print(f"  {updated} updated points copied")
+                result = self.reconcile()
+                print(f"  {result['copied']} missing points copied, {result['deleted']} deleted points removed "
+                      f"in {time.time() - next_start:.2f}s")
+                pass_start = next_start
+
+            return pass_start
+        except (QdrantRequestError, KeyError, TypeError) as e:
+            print(f"Error migrating collection '{self.collection_name}': {e}")
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Qdrant Live Collection Migration Tool",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Copy a collection to a new server while it stays online
+  %(prog)s --collection my_collection --target-host https://new-qdrant.example.com:6333 --target-api-key new_key
+
+  # Copy into a new collection on the same server, 8 writers
+  %(prog)s --collection my_collection --target-collection my_collection_v2 --writers 8
+
+  # Pick up points changed during the copy using an "updated_at" payload field
+  %(prog)s --collection my_collection --target-host http://new:6333 --updated-field updated_at --catch-up 2
+
+  # Final catch-up after writes to the source were stopped
+  %(prog)s --collection my_collection --target-host http://new:6333 --updated-field updated_at --since 1706666400
+"""
+    )
+
+    parser.add_argument("--collection", required=True, help="Collection to migrate")
+    parser.add_argument("--target-collection", help="Name of the collection on the target (default: same name)")
+    parser.add_argument("--source-host", default="http://localhost:6333", help="Source Qdrant URL")
+    parser.add_argument("--source-api-key", help="Source Qdrant API key (if required)")
+    parser.add_argument("--target-host", help="Target Qdrant URL (default: same as --source-host)")
+    parser.add_argument("--target-api-key", help="Target Qdrant API key (default: same as --source-api-key)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Points per scroll page and upsert request")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS, help="Number of concurrent upsert workers")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Batches buffered between reader and writers")
+    parser.add_argument("--catch-up", type=int, default=1, help="Number of catch-up passes after the copy")
+    parser.add_argument("--updated-field", help="Payload field holding the last update time of a point")
+    parser.add_argument("--updated-format", choices=["epoch", "datetime"], default="epoch",
+                        help="Format of --updated-field: Unix time in seconds or RFC 3339 datetime")
+    parser.add_argument("--since", type=float, help="Skip the full copy and only catch up from this Unix time")
+    add_connection_arguments(parser)
+
+    args = parser.parse_args()
+
+    target_host = args.target_host or args.source_host
+    target_collection = args.target_collection or args.collection
+    if target_host.rstrip("/") == args.source_host.rstrip("/") and target_collection == args.collection:
+        parser.error("source and target are the same collection, use --target-host or --target-collection")
+    if args.since is not None and args.catch_up < 1:
+        parser.error("--since needs at least one --catch-up pass")
+
+    def make_client(host: str, api_key: Optional[str]) -> QdrantHTTPClient:
+        return QdrantHTTPClient(
+            host=host,
+            api_key=api_key,
+            connect_timeout=args.connect_timeout,
+            read_timeout=args.timeout,
+            retries=args.retries,
+            pool_size=max(args.writers, 1) + 2
+        )
+
+    migration = QdrantMigration(
+        source=make_client(args.source_host, args.source_api_key),
+        target=make_client(target_host, args.target_api_key or args.source_api_key),
+        collection_name=args.collection,
+        target_collection=target_collection,
+        batch_size=args.batch_size,
+        writers=args.writers,
+        queue_size=args.queue_size,
+        updated_field=args.updated_field,
+        updated_format=args.updated_format
+    )
+
+    start_time = time.time()
+    print(f"\nQdrant Collection Migration - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print(f"Source: {args.source_host}/collections/{args.collection}")
+    print(f"Target: {target_host}/collections/{target_collection}")
+    print("-" * 60)
+
+    last_pass = migration.migrate(catch_up_passes=max(0, args.catch_up), since=args.since)
+
+    print("\n" + "=" * 60)
+    print("Migration Summary:")
+    print("-" * 60)
+    print(f"Status: {'SUCCESS' if last_pass is not None else 'FAILED'}")
+    print(f"Points copied: {migration.stats['copied']}")
+    print(f"Points deleted on target: {migration.stats['deleted']}")
+    print(f"\nMigration completed in {time.time() - start_time:.2f} seconds")
+
+    if last_pass is None:
+        sys.exit(1)
+
+    print("\nTo finish the cut-over, stop writes to the source and run the final catch-up with:")
+    print(f"  --since {last_pass:.0f}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nMigration interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nUnexpected error: {e}")
+        sys.exit(1)
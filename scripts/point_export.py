@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Logical point export format for the Qdrant backup tools
+
+Snapshots are tied to the Qdrant version and storage layout that produced
+them. A point export only contains the collection configuration and the
+points themselves (ids, vectors, payloads), read with the scroll API, so it
+can be imported into any Qdrant version or cluster layout.
+
+File layout (all integers little-endian):
+
+    b"QDRPTS01"                               magic
+    frame: header JSON                        collection name and config
+    frame: block JSON, then block data        repeated, one per scroll page
+    frame: {"count": 0, "total": N}           end marker
+
+A frame is a 4-byte length followed by that many bytes of JSON. Each block
+stores the ids, payloads and any sparse or multi-vectors of its points as one
+JSON column, followed by every dense vector as a contiguous float32 array of
+count * dim values. Only one block is held in memory at a time.
+"""
+
+import json
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Any
+
+
+FILE_MAGIC = b"QDRPTS01"
+POINTS_EXTENSION = ".points"
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+
+# Name used in the file for the default (unnamed) vector
+UNNAMED_VECTOR = ""
+
+
+class PointFileError(Exception):
+    """Raised when a point export file is truncated or not an export at all"""
+
+
+def _is_dense(vector: Any) -> bool:
+    return isinstance(vector, list) and bool(vector) and not isinstance(vector[0], list)
+
+
+def _point_vectors(point: Dict[str, Any]) -> Dict[str, Any]:
+    vector = point.get("vector")
+    if vector is None:
+        return {}
+    if isinstance(vector, dict):
+        return vector
+    return {UNNAMED_VECTOR: vector}
+
+
+def _float32_array(data: bytes) -> array:
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class PointWriter:
+    """Write scrolled points to a file object block by block"""
+
+    def __init__(self, fileobj, collection_name: str, config: Optional[Dict[str, Any]] = None):
+        self.fileobj = fileobj
+        self.count = 0
+        self.fileobj.write(FILE_MAGIC)
+        self._write_frame({
+            "format": 1,
+            "collection": collection_name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "config": config,
+        })
+
+    def _write_frame(self, obj: Dict[str, Any]) -> None:
+        data = json.dumps(obj, separators=(",", ":")).encode()
+        self.fileobj.write(struct.pack("<I", len(data)))
+        self.fileobj.write(data)
+
+    def write_points(self, points: List[Dict[str, Any]]) -> None:
+        """Append one block; points are records as returned by points/scroll"""
+        if not points:
+            return
+
+        vectors = [_point_vectors(point) for point in points]
+        names = sorted({name for point_vectors in vectors for name in point_vectors})
+
+        # A vector goes into a float32 block only if every point has a dense
+        # vector of the same size under that name; anything else stays JSON
+        dense = []
+        other = {}
+        for name in names:
+            values = [point_vectors.get(name) for point_vectors in vectors]
+            if all(_is_dense(v) for v in values) and len({len(v) for v in values}) == 1:
+                dense.append((name, len(values[0]), values))
+            else:
+                other[name] = values
+
+        column = json.dumps({
+            "ids": [point["id"] for point in points],
+            "payloads": [point.get("payload") for point in points],
+            "vectors": other,
+        }, separators=(",", ":")).encode()
+
+        self._write_frame({
+            "count": len(points),
+            "json": len(column),
+            "dense": [[name, dim] for name, dim, _ in dense],
+        })
+        self.fileobj.write(column)
+
+        for _, _, values in dense:
+            block = array("f")
+            for vector in values:
+                block.extend(vector)
+            if sys.byteorder == "big":
+                block.byteswap()
+            self.fileobj.write(block.tobytes())
+
+        self.count += len(points)
+
+    def close(self) -> None:
+        """Write the end marker (fileobj itself is left open)"""
+        self._write_frame({"count": 0, "total": self.count})
+
+
+class PointReader:
+    """Iterate over the points of an export file, one block in memory at a time"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        if self._read_exact(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise PointFileError("Not a point export file")
+        self.header = self._read_frame()
+        self.count = 0
+
+    def _read_exact(self, size: int) -> bytes:
+        # Decompressing readers may return less than requested
+        data = b""
+        while len(data) < size:
+            part = self.fileobj.read(size - len(data))
+            if not part:
+                raise PointFileError("Point export file is truncated")
+            data += part
+        return data
+
+    def _read_frame(self) -> Dict[str, Any]:
+        (length,) = struct.unpack("<I", self._read_exact(4))
+        try:
+            return json.loads(self._read_exact(length))
+        except ValueError as e:
+            raise PointFileError(f"Corrupt point export file: {e}")
+
+    def blocks(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the points block by block, as records accepted by points upsert"""
+        while True:
+            meta = self._read_frame()
+            count = meta["count"]
+            if not count:
+                if meta.get("total") != self.count:
+                    raise PointFileError(f"Point export file lists {meta.get('total')} points, read {self.count}")
+                return
+
+            column = json.loads(self._read_exact(meta["json"]))
+            vectors = [{} for _ in range(count)]
+            for name, values in column["vectors"].items():
+                for point_vectors, value in zip(vectors, values):
+                    if value is not None:
+                        point_vectors[name] = value
+            for name, dim in meta["dense"]:
+                values = _float32_array(self._read_exact(count * dim * 4))
+                for i, point_vectors in enumerate(vectors):
+                    point_vectors[name] = values[i * dim:(i + 1) * dim].tolist()
+
+            points = []
+            for point_id, payload, point_vectors in zip(column["ids"], column["payloads"], vectors):
+                if list(point_vectors) == [UNNAMED_VECTOR]:
+                    point_vectors = point_vectors[UNNAMED_VECTOR]
+                points.append({"id": point_id, "vector": point_vectors, "payload": payload or {}})
+
+            self.count += count
+            yield points
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for block in self.blocks():
+            yield from block
+
+
+def collection_create_body(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Request body that creates a collection like the exported one"""
+    config = config or {}
+    params = config.get("params", {})
+    body = {"vectors": params.get("vectors", {})}
+    for key in ("sparse_vectors", "shard_number", "replication_factor", "on_disk_payload"):
+        if params.get(key) is not None:
+            body[key] = params[key]
+    for key in ("hnsw_config", "quantization_config"):
+        if config.get(key):
+            body[key] = config[key]
+    return body
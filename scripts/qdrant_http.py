@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Qdrant snapshot tools
+
+Both backup_snapshots.py and restore_snapshots.py talk to Qdrant (usually
+through the Caddy proxy) using this client. It keeps a pooled keep-alive
+session so that the TCP/TLS handshake is paid once per connection instead of
+once per call, and it retries idempotent calls on connection errors and
+transient proxy errors (502/503/504) with jittered exponential backoff. A
+request that could not even be sent (no connection) is retried regardless
+of its method.
+"""
+
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from urllib.parse import urlsplit
+
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 600.0
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POLL_TIMEOUT = 6 * 3600.0
+
+
+# Retries per thread, so a tool can attribute them to the work of that thread
+_thread_retries = threading.local()
+
+
+def record_retry() -> None:
+    """Count a retry (or resumed transfer) for the current thread"""
+    _thread_retries.count = getattr(_thread_retries, "count", 0) + 1
+
+
+def thread_retry_count() -> int:
+    """Retries recorded by the current thread so far"""
+    return getattr(_thread_retries, "count", 0)
+
+
+def format_size(num_bytes: int) -> str:
+    """Format a byte count as a human readable string"""
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+
+    size = float(num_bytes)
+    for unit in ("KB", "MB", "GB", "TB"):
+        size /= 1024
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
+
+
+def _not_sent(error: requests.exceptions.RequestException) -> bool:
+    """True if a request failed while connecting, before anything was sent"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class QdrantRequestError(Exception):
+    """Raised when a request to Qdrant fails after all retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response_text: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response_text = response_text
+
+
+class QdrantHTTPClient:
+    """Pooled keep-alive HTTP client with retry/backoff for the Qdrant API"""
+
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+    def __init__(
+        self,
+        host: str = "http://localhost:6333",
+        api_key: Optional[str] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        self.host = host.rstrip("/")
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["api-key"] = api_key
+
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+
+        # Retries are handled in request() so that they also cover HTTP status
+        # codes and are logged; the adapter only provides the connection pool
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def for_host(self, host: str) -> "QdrantHTTPClient":
+        """New client for another Qdrant node with the same settings"""
+        return QdrantHTTPClient(
+            host=host,
+            api_key=self.api_key,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries=self.retries,
+            backoff=self.backoff,
+            max_backoff=self.max_backoff,
+            pool_size=self.pool_size
+        )
+
+    @property
+    def blocking_timeout(self) -> Tuple[float, None]:
+        """Timeout of wait=true calls, which take as long as the operation on the server"""
+        return (self.connect_timeout, None)
+
+    def url(self, endpoint: str) -> str:
+        """Build a full URL for an API endpoint"""
+        return f"{self.host}{endpoint}"
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (full jitter exponential backoff)"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        retry: Optional[bool] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Send a request and return the response, retrying transient failures.
+
+        By default only idempotent methods are retried; pass retry=True or
+        retry=False to override that for a single call. Failures to connect
+        are retried either way, since the server never saw the request.
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in self.IDEMPOTENT_METHODS
+        attempts = self.retries + 1
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(endpoint)
+
+        for attempt in range(attempts):
+            try:
+                response = self.session.request(method=method, url=url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = QdrantRequestError(f"Could not connect to Qdrant at {self.host} ({type(e).__name__})")
+                if not retry and not _not_sent(e):
+                    raise error
+            except requests.exceptions.RequestException as e:
+                raise QdrantRequestError(f"Request Error: {e}")
+            else:
+                if response.status_code < 400:
+                    return response
+
+                error = QdrantRequestError(
+                    f"HTTP Error: {response.status_code} {response.reason} for url: {url}",
+                    status_code=response.status_code,
+                    response_text=response.text
+                )
+                response.close()
+                if not retry or response.status_code not in self.RETRY_STATUS_CODES:
+                    raise error
+
+            if attempt + 1 >= attempts:
+                raise error
+
+            delay = self.backoff_delay(attempt)
+            record_retry()
+            print(f"{method} {endpoint} failed ({error}), retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 2}/{attempts})")
+            time.sleep(delay)
+
+    def request_json(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Send a request and decode the JSON response body"""
+        response = self.request(method, endpoint, **kwargs)
+        try:
+            return response.json()
+        except ValueError:
+            raise QdrantRequestError("Invalid JSON response from Qdrant", response_text=response.text)
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
+
+def poll(
+    check: Callable[[], Any],
+    description: str,
+    timeout: float = DEFAULT_POLL_TIMEOUT,
+    initial_delay: float = 1.0,
+    max_delay: float = 30.0
+) -> Any:
+    """
+    Call check() with exponential backoff until it returns something truthy.
+
+    Used instead of wait=true so that long server-side operations are not
+    bounded by proxy timeouts. Transient request errors while polling are
+    ignored; returns None when the timeout is reached.
+    """
+    deadline = time.time() + timeout
+    delay = initial_delay
+    start = time.time()
+
+    while True:
+        try:
+            result = check()
+            if result:
+                return result
+        except QdrantRequestError as e:
+            print(f"Polling {description}: {e}")
+
+        if time.time() + delay > deadline:
+            print(f"Timed out after {time.time() - start:.0f}s waiting for {description}")
+            return None
+        time.sleep(delay)
+        delay = min(max_delay, delay * 2)
+
+
+def wait_for_collection(
+    client: QdrantHTTPClient,
+    collection_name: str,
+    timeout: float = DEFAULT_POLL_TIMEOUT,
+    settle_polls: int = 2
+) -> Optional[Dict[str, Any]]:
+    """
+    Wait until a new collection exists and is green with a stable point count.
+
+    Only for collections that did not exist before the operation: an
+    existing collection is already green, so its recovery cannot be told
+    apart from a finished one. A collection that was just created can still
+    be filling up, so it must report the same state for settle_polls polls
+    in a row.
+    """
+    seen = []
+
+    def check():
+        try:
+            info = client.request_json("GET", f"/collections/{collection_name}", retry=False)["result"]
+        except QdrantRequestError as e:
+            if e.status_code == 404:
+                seen.clear()
+                return None
+            raise
+        if info.get("status") != "green":
+            seen.clear()
+            return None
+        seen.append(info.get("points_count"))
+        if len(seen) >= settle_polls and len(set(seen[-settle_polls:])) == 1:
+            return info
+        return None
+
+    return poll(check, f"collection '{collection_name}'", timeout=timeout)
+
+
+def parse_peer_urls(values: Optional[List[str]]) -> Dict[int, str]:
+    """Parse repeated '--peer-url <peer_id>=<url>' options"""
+    peer_urls = {}
+    for value in values or []:
+        peer_id, _, url = value.partition("=")
+        if not url:
+            raise ValueError(f"Invalid --peer-url '{value}', expected <peer_id>=<url>")
+        peer_urls[int(peer_id)] = url
+    return peer_urls
+
+
+def shard_clients(
+    client: QdrantHTTPClient,
+    collection_name: str,
+    peer_urls: Optional[Dict[int, str]] = None
+) -> List[Tuple[int, int, QdrantHTTPClient]]:
+    """
+    Find one active replica of every shard of a collection.
+
+    Returns (shard_id, peer_id, client) tuples, where client talks to the
+    node that holds the replica. Replicas on the node behind `client` are
+    preferred. The HTTP address of other nodes comes from peer_urls, or is
+    guessed from the peer's cluster URI with the scheme and port of `client`
+    (Qdrant only reports the internal p2p address of its peers).
+    """
+    info = client.request_json("GET", f"/collections/{collection_name}/cluster")["result"]
+    this_peer = info.get("peer_id")
+    replicas = {}
+
+    for shard in info.get("local_shards", []):
+        if shard.get("state", "Active") == "Active":
+            replicas.setdefault(shard["shard_id"], (shard["shard_id"], this_peer, client))
+
+    remote = [s for s in info.get("remote_shards", []) if s.get("state", "Active") == "Active"]
+    if any(shard["shard_id"] not in replicas for shard in remote):
+        peers = client.request_json("GET", "/cluster")["result"].get("peers", {})
+        base = urlsplit(client.host)
+        clients = {}
+        for shard in remote:
+            if shard["shard_id"] in replicas:
+                continue
+            peer_id = shard["peer_id"]
+            if peer_id not in clients:
+                url = (peer_urls or {}).get(peer_id)
+                if not url:
+                    peer_host = urlsplit(peers.get(str(peer_id), {}).get("uri", "")).hostname
+                    if not peer_host:
+                        raise QdrantRequestError(f"No address known for peer {peer_id}, use --peer-url")
+                    url = f"{base.scheme}://{peer_host}:{base.port or 6333}"
+                clients[peer_id] = client.for_host(url)
+            replicas[shard["shard_id"]] = (shard["shard_id"], peer_id, clients[peer_id])
+
+    return [replicas[shard_id] for shard_id in sorted(replicas)]
+
+
+def add_connection_arguments(parser) -> None:
+    """Add the timeout and retry options"""
+    parser.add_argument("--timeout", type=float, default=DEFAULT_READ_TIMEOUT,
+                        help=f"Read timeout in seconds for API calls, except wait=true snapshot and recover calls (default: {DEFAULT_READ_TIMEOUT:.0f})")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                        help=f"Connect timeout in seconds (default: {DEFAULT_CONNECT_TIMEOUT:.0f})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries for failed idempotent API calls (default: {DEFAULT_RETRIES})")
+
+
+def add_client_arguments(parser) -> None:
+    """Add the connection tuning options shared by the snapshot tools"""
+    add_connection_arguments(parser)
+    parser.add_argument("--peer-url", action="append", metavar="PEER_ID=URL",
+                        help="HTTP address of a cluster peer for shard operations (repeatable)")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="Start long operations with wait=false and poll for completion instead of holding the request open "
+                             "(restores: only into a new collection)")
+    parser.add_argument("--poll-timeout", type=float, default=DEFAULT_POLL_TIMEOUT,
+                        help=f"Max seconds to poll for a --no-wait operation (default: {DEFAULT_POLL_TIMEOUT:.0f})")
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+In-process stub of the Qdrant REST API
+
+A small in-memory server that answers the calls the tools in this directory
+make, so they can be exercised and benchmarked without a Qdrant container.
+It keeps points in memory, but search does not rank anything: it returns the
+first `limit` points with made-up scores. Numbers measured against the stub
+describe the client and proxy path, not Qdrant itself.
+
+Snapshots are synthetic: their content is generated on the fly from a seed,
+so snapshots of many GB can be served and verified without storing them.
+Uploaded snapshots are read and discarded. A bandwidth limit and a delay for
+snapshot creation can be set to mimic a remote server.
+
+Usage:
+    python qdrant_stub.py --port 6333
+    python qdrant_stub.py --port 6333 --latency-ms 2
+
+Options:
+    --host        Address to listen on (default: 127.0.0.1)
+    --port        Port to listen on (default: 6333)
+    --latency-ms  Extra delay added to every response, to mimic server work
+    --bandwidth   Limit snapshot transfers to this many MB/s per connection
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Any
+
+
+SNAPSHOT_BLOCK_SIZE = 1024 * 1024
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+# Synthetic snapshots repeat a few random blocks, stamped with their block
+# number every 64 KiB so that no two blocks (or dedup chunks) are identical
+_BLOCK_POOL = [random.Random(i).randbytes(SNAPSHOT_BLOCK_SIZE) for i in range(8)]
+_STAMP_INTERVAL = 64 * 1024
+
+
+def _id_key(point_id: Any) -> tuple:
+    # Qdrant orders numeric ids before UUIDs
+    if isinstance(point_id, int):
+        return (0, point_id, "")
+    return (1, 0, str(point_id))
+
+
+class SyntheticSnapshot:
+    """Deterministic pseudo-random snapshot content of any size"""
+
+    def __init__(self, name: str, size: int, seed: int = 0):
+        self.name = name
+        self.size = size
+        self.seed = seed
+        self.checksum: Optional[str] = None
+        self.created = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def _block(self, index: int) -> bytearray:
+        block = bytearray(_BLOCK_POOL[(index + self.seed) % len(_BLOCK_POOL)])
+        stamp = (self.seed << 40 | index).to_bytes(8, "little")
+        for offset in range(0, SNAPSHOT_BLOCK_SIZE, _STAMP_INTERVAL):
+            block[offset:offset + 8] = stamp
+        return block
+
+    def iter_bytes(self, start: int = 0) -> Iterator[bytes]:
+        index, skip = divmod(start, SNAPSHOT_BLOCK_SIZE)
+        position = start
+        while position < self.size:
+            block = memoryview(self._block(index))[skip:skip + self.size - position]
+            yield block
+            position += len(block)
+            index += 1
+            skip = 0
+
+    def compute_checksum(self) -> None:
+        hasher = hashlib.sha256()
+        for block in self.iter_bytes():
+            hasher.update(block)
+        self.checksum = hasher.hexdigest()
+
+    def description(self) -> Dict[str, Any]:
+        return {"name": self.name, "creation_time": self.created, "size": self.size, "checksum": self.checksum}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, Nagle's
+    # algorithm and delayed ACKs add about 40 ms to every response
+    disable_nagle_algorithm = True
+    server: "_StubServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, result: Any, status: int = 200, api_status: str = "ok") -> None:
+        data = json.dumps({"result": result, "status": api_status, "time": 0.0}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        return json.loads(data) if data else {}
+
+    def _iter_raw_body(self) -> Iterator[bytes]:
+        """Yield the request body in pieces (Content-Length or chunked)"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b""):
+                        pass
+                    return
+                while size:
+                    data = self.rfile.read(min(size, TRANSFER_CHUNK_SIZE))
+                    size -= len(data)
+                    yield data
+                self.rfile.readline()
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining:
+            data = self.rfile.read(min(remaining, TRANSFER_CHUNK_SIZE))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+    def _throttle(self, transferred: int, started: float) -> None:
+        bandwidth = self.server.stub.bandwidth
+        if bandwidth:
+            ahead = transferred / bandwidth - (time.perf_counter() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def _dispatch(self, method: str) -> None:
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.api_key and self.headers.get("api-key") != stub.api_key:
+            self._read_body()
+            return self._send_json({"error": "Must provide an API key or an Authorization bearer token"}, 401, "error")
+
+        path = self.path.split("?")[0]
+        for route_method, pattern, handler, raw_body in stub.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                # Snapshot uploads are streamed by the handler itself
+                body = None if raw_body else self._read_body()
+                try:
+                    return handler(self, body, *match.groups())
+                except KeyError as e:
+                    return self._send_json({"error": f"Not found: {e}"}, 404, "error")
+        self._read_body()
+        self._send_json({"error": f"Unknown route {method} {path}"}, 404, "error")
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "QdrantStub"
+
+
+class QdrantStub:
+    """In-memory Qdrant stand-in; use start()/stop() or as a context manager"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        api_key: Optional[str] = None,
+        bandwidth: Optional[float] = None,
+        snapshot_delay: float = 0.0,
+        snapshot_size: int = 64 * 1024 * 1024
+    ):
+        """
+        latency is added to every response; bandwidth (bytes/s per connection)
+        limits snapshot downloads and uploads; snapshot_delay is added to
+        snapshot creation on top of computing the checksum; snapshot_size is
+        the default size of the snapshots of a collection.
+        """
+        self.latency = latency
+        self.api_key = api_key
+        self.bandwidth = bandwidth
+        self.snapshot_delay = snapshot_delay
+        self.snapshot_size = snapshot_size
+        self.collections: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.uploaded_bytes = 0
+        self.recovered: Dict[str, str] = {}
+        self.routes = [
+            ("GET", r"/collections", QdrantStub._list_collections, False),
+            ("GET", r"/aliases", QdrantStub._list_aliases, False),
+            ("GET", r"/collections/([^/]+)", QdrantStub._get_collection, False),
+            ("PUT", r"/collections/([^/]+)", QdrantStub._create_collection, False),
+            ("PATCH", r"/collections/([^/]+)", QdrantStub._update_collection, False),
+            ("DELETE", r"/collections/([^/]+)", QdrantStub._delete_collection, False),
+            ("PUT", r"/collections/([^/]+)/points", QdrantStub._upsert, False),
+            ("POST", r"/collections/([^/]+)/points", QdrantStub._retrieve, False),
+            ("POST", r"/collections/([^/]+)/points/delete", QdrantStub._delete_points, False),
+            ("POST", r"/collections/([^/]+)/points/scroll", QdrantStub._scroll, False),
+            ("POST", r"/collections/([^/]+)/points/search", QdrantStub._search, False),
+            ("POST", r"/collections/([^/]+)/points/count", QdrantStub._count, False),
+            ("POST", r"/collections/([^/]+)/snapshots", QdrantStub._create_snapshot, False),
+            ("GET", r"/collections/([^/]+)/snapshots", QdrantStub._list_snapshots, False),
+            ("GET", r"/collections/([^/]+)/snapshots/([^/]+)", QdrantStub._download_snapshot, False),
+            ("DELETE", r"/collections/([^/]+)/snapshots/([^/]+)", QdrantStub._delete_snapshot, False),
+            ("PUT", r"/collections/([^/]+)/snapshots/recover", QdrantStub._recover_snapshot, False),
+            ("POST", r"/snapshots", QdrantStub._upload_snapshot, True),
+            ("POST", r"/collections/([^/]+)/snapshots/upload", QdrantStub._upload_snapshot, True),
+        ]
+
+        self.server = _StubServer((host, port), _StubHandler)
+        self.server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "QdrantStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "QdrantStub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _collection(self, name: str) -> Dict[str, Any]:
+        return self.collections[name]
+
+    def add_collection(self, name: str, snapshot_size: Optional[int] = None) -> None:
+        """Create a collection whose snapshots have the given size"""
+        with self.lock:
+            self.collections[name] = {
+                "config": {"params": {"vectors": {"size": 4, "distance": "Cosine"}}},
+                "points": {},
+                "snapshot_size": snapshot_size,
+                "snapshots": {},
+            }
+
+    # Route handlers; `request` is the _StubHandler of the current request
+
+    @staticmethod
+    def _list_collections(request, body) -> None:
+        request._send_json({"collections": [{"name": name} for name in request.server.stub.collections]})
+
+    @staticmethod
+    def _list_aliases(request, body) -> None:
+        request._send_json({"aliases": []})
+
+    @staticmethod
+    def _get_collection(request, body, name) -> None:
+        collection = request.server.stub._collection(name)
+        request._send_json({
+            "status": "green",
+            "optimizer_status": "ok",
+            "points_count": len(collection["points"]),
+            "indexed_vectors_count": len(collection["points"]),
+            "segments_count": 1,
+            "config": collection["config"],
+        })
+
+    @staticmethod
+    def _create_collection(request, body, name) -> None:
+        stub = request.server.stub
+        with stub.lock:
+            if name in stub.collections:
+                return request._send_json({"error": f"Collection `{name}` already exists!"}, 409, "error")
+            config = {"params": {key: body[key] for key in ("vectors", "sparse_vectors") if key in body}}
+            stub.collections[name] = {"config": config, "points": {}, "snapshot_size": None, "snapshots": {}}
+        request._send_json(True)
+
+    @staticmethod
+    def _update_collection(request, body, name) -> None:
+        """Store index, quantization and vector parameter changes (nothing is rebuilt)"""
+        stub = request.server.stub
+        config = stub._collection(name)["config"]
+        with stub.lock:
+            for key in ("hnsw_config", "optimizers_config", "quantization_config"):
+                if key in body:
+                    config[key] = body[key] if key == "quantization_config" or not isinstance(body[key], dict) \
+                        else dict(config.get(key) or {}, **body[key])
+            vectors = config["params"].get("vectors", {})
+            for vector_name, changes in (body.get("vectors") or {}).items():
+                target = vectors if "size" in vectors and vector_name == "" else vectors.get(vector_name)
+                if target is not None:
+                    target.update(changes)
+        request._send_json(True)
+
+    @staticmethod
+    def _delete_collection(request, body, name) -> None:
+        stub = request.server.stub
+        with stub.lock:
+            existed = stub.collections.pop(name, None) is not None
+        request._send_json(existed)
+
+    @staticmethod
+    def _upsert(request, body, name) -> None:
+        stub = request.server.stub
+        points = stub._collection(name)["points"]
+        with stub.lock:
+            for point in body.get("points", []):
+                points[point["id"]] = point
+        request._send_json({"operation_id": 0, "status": "completed"})
+
+    @staticmethod
+    def _retrieve(request, body, name) -> None:
+        points = request.server.stub._collection(name)["points"]
+        request._send_json([points[i] for i in body.get("ids", []) if i in points])
+
+    @staticmethod
+    def _delete_points(request, body, name) -> None:
+        stub = request.server.stub
+        points = stub._collection(name)["points"]
+        with stub.lock:
+            for point_id in body.get("points", []):
+                points.pop(point_id, None)
+        request._send_json({"operation_id": 0, "status": "completed"})
+
+    @staticmethod
+    def _scroll(request, body, name) -> None:
+        stub = request.server.stub
+        points = stub._collection(name)["points"]
+        with stub.lock:
+            ids = sorted(points, key=_id_key)
+        offset = body.get("offset")
+        if offset is not None:
+            ids = [i for i in ids if _id_key(i) >= _id_key(offset)]
+        limit = body.get("limit", 10)
+        page = ids[:limit]
+
+        def record(point_id):
+            point = points[point_id]
+            result = {"id": point_id}
+            if body.get("with_payload", True):
+                result["payload"] = point.get("payload") or {}
+            if body.get("with_vector", False):
+                result["vector"] = point.get("vector")
+            return result
+
+        request._send_json({
+            "points": [record(i) for i in page if i in points],
+            "next_page_offset": ids[limit] if len(ids) > limit else None,
+        })
+
+    @staticmethod
+    def _search(request, body, name) -> None:
+        points = request.server.stub._collection(name)["points"]
+        limit = body.get("limit", 10)
+        hits = []
+        for rank, point_id in enumerate(list(points)[:limit]):
+            hits.append({"id": point_id, "version": 0, "score": 1.0 - rank / (limit + 1)})
+        request._send_json(hits)
+
+    @staticmethod
+    def _count(request, body, name) -> None:
+        request._send_json({"count": len(request.server.stub._collection(name)["points"])})
+
+    @staticmethod
+    def _create_snapshot(request, body, name) -> None:
+        stub = request.server.stub
+        collection = stub._collection(name)
+        with stub.lock:
+            seed = len(collection["snapshots"]) + 1
+        snapshot = SyntheticSnapshot(
+            # Qdrant names snapshots <collection>-<peer id>-<time>; the counter
+            # stands in for the peer id so names are unique within a second
+            f"{name}-{seed}-{time.strftime('%Y-%m-%d-%H-%M-%S')}.snapshot",
+            collection["snapshot_size"] or stub.snapshot_size,
+            seed=seed * 7919 + sum(name.encode())
+        )
+
+        def build():
+            time.sleep(stub.snapshot_delay)
+            snapshot.compute_checksum()
+            with stub.lock:
+                collection["snapshots"][snapshot.name] = snapshot
+
+        if "wait=false" in request.path:
+            threading.Thread(target=build, daemon=True).start()
+            return request._send_json(None, api_status="accepted")
+        build()
+        request._send_json(snapshot.description())
+
+    @staticmethod
+    def _list_snapshots(request, body, name) -> None:
+        snapshots = request.server.stub._collection(name)["snapshots"]
+        request._send_json([snapshot.description() for snapshot in list(snapshots.values())])
+
+    @staticmethod
+    def _download_snapshot(request, body, name, snapshot_name) -> None:
+        snapshot = request.server.stub._collection(name)["snapshots"][snapshot_name]
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", request.headers.get("Range", ""))
+        if match:
+            start = min(int(match.group(1)), snapshot.size)
+
+        request.send_response(206 if match else 200)
+        request.send_header("Content-Type", "application/octet-stream")
+        request.send_header("Content-Length", str(snapshot.size - start))
+        if match:
+            request.send_header("Content-Range", f"bytes {start}-{snapshot.size - 1}/{snapshot.size}")
+        request.end_headers()
+
+        started = time.perf_counter()
+        sent = 0
+        for block in snapshot.iter_bytes(start):
+            request.wfile.write(block)
+            sent += len(block)
+            request._throttle(sent, started)
+
+    @staticmethod
+    def _delete_snapshot(request, body, name, snapshot_name) -> None:
+        stub = request.server.stub
+        with stub.lock:
+            existed = stub._collection(name)["snapshots"].pop(snapshot_name, None) is not None
+        request._send_json(existed)
+
+    @staticmethod
+    def _upload_snapshot(request, body, name=None) -> None:
+        stub = request.server.stub
+        started = time.perf_counter()
+        received = 0
+        for data in request._iter_raw_body():
+            received += len(data)
+            request._throttle(received, started)
+        with stub.lock:
+            stub.uploaded_bytes += received
+        request._send_json(True)
+
+    @staticmethod
+    def _recover_snapshot(request, body, name) -> None:
+        stub = request.server.stub
+        if name not in stub.collections:
+            stub.add_collection(name)
+        with stub.lock:
+            stub.recovered[name] = body.get("snapshot_name") or body.get("location")
+        request._send_json(True, api_status="accepted" if "wait=false" in request.path else "ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process stub of the Qdrant REST API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=6333, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Extra delay added to every response")
+    parser.add_argument("--api-key", help="Require this API key")
+    parser.add_argument("--bandwidth", type=float, help="Limit snapshot transfers to this many MB/s per connection")
+    args = parser.parse_args()
+
+    stub = QdrantStub(
+        host=args.host,
+        port=args.port,
+        latency=args.latency_ms / 1000,
+        api_key=args.api_key,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    )
+    print(f"Qdrant stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Read-through response cache for the Qdrant REST API
+
+A small reverse proxy that sits between Caddy and Qdrant and answers repeated
+read requests (searches, queries, counts, collection info) from memory. It
+only needs the Python standard library, so it runs in a plain python image.
+
+    cacheable   GET /collections..., GET /aliases and the read-only POST
+                endpoints under /collections/{name}/points (search, query,
+                recommend, discover, count, scroll, retrieve) and facet
+    key         method, path, query string, credentials and the JSON body
+                with its keys sorted, so formatting differences do not matter
+    encoding    cacheable requests are forwarded without Accept-Encoding, so
+                cached bodies are plain and can be served to any client
+    eviction    least recently used entries go once --max-memory is reached;
+                entries older than --ttl are never served
+    writes      every other request is forwarded unchanged (bodies are
+                streamed, so snapshot uploads and downloads are not buffered)
+                and invalidates the cached responses of its collection, both
+                before and after it runs. Aliases are resolved, so a write to
+                a collection also invalidates reads through its aliases.
+
+A write without wait=true is applied by Qdrant after it answered, so its
+collection is invalidated once more a moment later. Writes that bypass this
+proxy (for example directly on port 6333) are only picked up after --ttl.
+
+Usage:
+    python query_cache.py --upstream http://qdrant:6333 --port 6333
+    python query_cache.py --upstream http://localhost:8081 --port 8082 --ttl 10
+
+Options:
+    --listen       Address to listen on (default: 0.0.0.0)
+    --port         Port to listen on (default: 6333)
+    --upstream     Qdrant URL (default: http://qdrant:6333)
+    --api-key      API key used to read the alias list (default: $QDRANT_API_KEY)
+    --max-memory   Memory for cached responses in MB (default: 256)
+    --max-entry    Largest response that is cached, in KB (default: 1024)
+    --ttl          Seconds a response may be served from the cache (default: 30)
+
+GET /__cache/stats returns hit, miss and eviction counts as JSON.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from http_proxy import CREDENTIAL_HEADERS, Head, Request, ReverseProxy
+
+
+DEFAULT_MAX_MEMORY_MB = 256
+DEFAULT_MAX_ENTRY_KB = 1024
+DEFAULT_TTL = 30.0
+STATS_PATH = "/__cache/stats"
+
+# Qdrant applies writes sent without wait=true shortly after answering them
+ASYNC_WRITE_GRACE = 2.0
+ALIAS_REFRESH_INTERVAL = 60.0
+# Per-entry bookkeeping counted against --max-memory on top of the body
+ENTRY_OVERHEAD = 256
+
+COLLECTION_PATH = re.compile(r"^/collections/(?P<collection>[^/]+)(?P<rest>/.*)?$")
+READ_POST_ENDPOINTS = re.compile(
+    r"^/points(/((search|recommend|discover|query)(/batch|/groups)?|count|scroll))?$|^/facet$"
+)
+
+
+class ResponseCache:
+    """LRU cache of response bodies, bounded by memory and age, invalidated by generation"""
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.entries: "OrderedDict[str, Tuple[float, Tuple[int, int], str, str, bytes]]" = OrderedDict()
+        self.bytes = 0
+
+        # A scope is a collection name, or "" for requests outside a collection.
+        # Bumping a scope's generation invalidates its entries; bumping the
+        # global generation invalidates everything
+        self.global_generation = 0
+        self.generations: Dict[str, int] = {}
+        self.scope_keys: Dict[str, set] = {}
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    def generation(self, scope: str) -> Tuple[int, int]:
+        return self.global_generation, self.generations.get(scope, 0)
+
+    def get(self, key: str, scope: str) -> Optional[Tuple[str, bytes]]:
+        """Cached (content type, body) for key, if still valid"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires, generation, _, content_type, body = entry
+        if expires < time.monotonic() or generation != self.generation(scope):
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return content_type, body
+
+    def put(self, key: str, scope: str, generation: Tuple[int, int], content_type: str, body: bytes) -> None:
+        """Store a response fetched while the scope was at `generation` (dropped if it changed since)"""
+        if generation != self.generation(scope) or len(body) > self.max_entry_bytes:
+            return
+        self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, generation, scope, content_type, body)
+        self.scope_keys.setdefault(scope, set()).add(key)
+        self.bytes += len(body) + len(key) + ENTRY_OVERHEAD
+        self.stats["stores"] += 1
+        while self.bytes > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            scope = entry[2]
+            self.bytes -= len(entry[4]) + len(key) + ENTRY_OVERHEAD
+            self.scope_keys.get(scope, set()).discard(key)
+
+    def invalidate(self, scope: str) -> None:
+        """Drop the cached responses of one collection"""
+        self.generations[scope] = self.generations.get(scope, 0) + 1
+        for key in list(self.scope_keys.pop(scope, ())):
+            self._remove(key)
+        self.stats["invalidations"] += 1
+
+    def invalidate_all(self) -> None:
+        self.global_generation += 1
+        self.entries.clear()
+        self.scope_keys.clear()
+        self.bytes = 0
+        self.stats["invalidations"] += 1
+
+
+class QueryCacheProxy(ReverseProxy):
+    def __init__(self, upstream: str, cache: ResponseCache, api_key: Optional[str] = None, pool_size: int = 64):
+        super().__init__(upstream, pool_size)
+        self.cache = cache
+        self.api_key = api_key
+
+        # alias -> collection; None while the alias list is unknown, in which
+        # case every write has to invalidate the whole cache
+        self.aliases: Optional[Dict[str, str]] = None
+
+    async def refresh_aliases(self) -> None:
+        try:
+            status, _, body = await self.fetch("GET", "/aliases", headers=[("api-key", self.api_key)] if self.api_key else [])
+            if status != 200:
+                raise ValueError(f"HTTP {status}")
+            aliases = json.loads(body)["result"]["aliases"]
+            self.aliases = {alias["alias_name"]: alias["collection_name"] for alias in aliases}
+        except (OSError, ConnectionError, ValueError, KeyError, TypeError, asyncio.IncompleteReadError) as e:
+            if self.aliases is not None:
+                print(f"Could not read the alias list ({e}); writes will invalidate the whole cache", flush=True)
+            self.aliases = None
+
+    async def refresh_aliases_forever(self) -> None:
+        """Pick up alias changes made without going through the proxy"""
+        while True:
+            await asyncio.sleep(ALIAS_REFRESH_INTERVAL)
+            await self.refresh_aliases()
+
+    # Request classification
+
+    def scope(self, path: str) -> Optional[str]:
+        """Collection a path belongs to (aliases resolved), or None outside collections"""
+        match = COLLECTION_PATH.match(path)
+        if not match or match.group("collection") == "aliases":
+            return None
+        name = match.group("collection")
+        return (self.aliases or {}).get(name, name)
+
+    @staticmethod
+    def is_cacheable(method: str, path: str) -> bool:
+        if method == "GET":
+            return (path == "/aliases" or path.startswith("/collections")) and "/snapshots" not in path
+        if method == "POST":
+            match = COLLECTION_PATH.match(path)
+            return bool(match and match.group("rest") and READ_POST_ENDPOINTS.match(match.group("rest")))
+        return False
+
+    @staticmethod
+    def cache_key(method: str, path: str, query: str, head: Head, body: bytes) -> Optional[str]:
+        """Key for a read request, or None if its body is not JSON"""
+        try:
+            normalized = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")) if body else ""
+        except ValueError:
+            return None
+        parts = [method, path, urlencode(sorted(parse_qsl(query, keep_blank_values=True)))]
+        parts.extend(head.get(name) for name in CREDENTIAL_HEADERS)
+        parts.append(normalized)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def is_collection_level(path: str) -> bool:
+        """Writes that create, delete or re-alias collections"""
+        match = COLLECTION_PATH.match(path)
+        return path.endswith("/aliases") or bool(match and not match.group("rest"))
+
+    def invalidate_for_write(self, path: str) -> None:
+        scope = self.scope(path)
+        if scope is None or self.aliases is None:
+            # Alias changes, collection-independent calls, or unknown aliases
+            self.cache.invalidate_all()
+            return
+        self.cache.invalidate(scope)
+        if self.is_collection_level(path):
+            # The collection and alias listings change as well
+            self.cache.invalidate("")
+
+    # Client side
+
+    async def handle(self, request: Request) -> bool:
+        method, path = request.method, request.path
+        if path == STATS_PATH:
+            stats = dict(self.cache.stats, entries=len(self.cache.entries), bytes=self.cache.bytes,
+                         aliases_known=self.aliases is not None)
+            await self.respond_json(request.writer, "200 OK", stats, keep_alive=request.keep_alive)
+            return request.keep_alive
+
+        cacheable = request.body is not None and self.is_cacheable(method, path)
+        key = self.cache_key(method, path, request.query, request.head, request.body) if cacheable else None
+        scope = self.scope(path) or ""
+        if key:
+            cached = self.cache.get(key, scope)
+            if cached:
+                await self.respond(request.writer, "200 OK", cached[0], cached[1], "X-Cache: HIT\r\n", request.keep_alive)
+                return request.keep_alive
+            generation = self.cache.generation(scope)
+            # Hits are replayed without Content-Encoding, so ask for a plain body
+            request.head.headers = [(name, value) for name, value in request.head.headers
+                                    if name.lower() != "accept-encoding"]
+
+        write = method not in ("GET", "HEAD", "OPTIONS") and not cacheable
+        if write:
+            self.invalidate_for_write(path)
+
+        try:
+            status, content_type, response_body, keep_alive = await self.forward(
+                request,
+                extra_headers=["X-Cache: MISS"] if key else [],
+                tee_limit=self.cache.max_entry_bytes if key else 0
+            )
+        finally:
+            if write:
+                self.invalidate_for_write(path)
+                if "wait=true" not in request.query:
+                    asyncio.get_running_loop().call_later(ASYNC_WRITE_GRACE, self.invalidate_for_write, path)
+                if self.is_collection_level(path):
+                    await self.refresh_aliases()
+
+        if key and status == 200 and response_body is not None:
+            self.cache.put(key, scope, generation, content_type, bytes(response_body))
+        return keep_alive
+
+
+async def serve(args) -> None:
+    cache = ResponseCache(
+        max_bytes=args.max_memory * 1024 * 1024,
+        ttl=args.ttl,
+        max_entry_bytes=args.max_entry * 1024
+    )
+    proxy = QueryCacheProxy(args.upstream, cache, api_key=args.api_key)
+    await proxy.refresh_aliases()
+    if proxy.aliases is None:
+        print("Alias list not available (check --api-key); writes will invalidate the whole cache", flush=True)
+    refresher = asyncio.ensure_future(proxy.refresh_aliases_forever())
+
+    server = await asyncio.start_server(proxy.handle_client, args.listen, args.port)
+    print(f"Query cache listening on {args.listen}:{args.port}, upstream {args.upstream} "
+          f"({args.max_memory} MB, TTL {args.ttl:g}s)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-through response cache for the Qdrant REST API")
+    parser.add_argument("--listen", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=6333, help="Port to listen on")
+    parser.add_argument("--upstream", default="http://qdrant:6333", help="Qdrant URL")
+    parser.add_argument("--api-key", default=os.environ.get("QDRANT_API_KEY"), help="API key used to read the alias list")
+    parser.add_argument("--max-memory", type=int, default=DEFAULT_MAX_MEMORY_MB, help="Memory for cached responses in MB")
+    parser.add_argument("--max-entry", type=int, default=DEFAULT_MAX_ENTRY_KB, help="Largest response that is cached, in KB")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="Seconds a response may be served from the cache")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(0)
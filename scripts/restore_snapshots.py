@@ -8,115 +8,445 @@ It can restore a specific collection or create a new collection from a snapshot.
 Usage:
     python restore_snapshots.py --snapshot <snapshot_file> --collection <collection_name>
     python restore_snapshots.py --snapshot <snapshot_file> --new-collection <new_collection_name>
+    python restore_snapshots.py --location <url_or_server_path> --collection <collection_name>
     
 Options:
-    --snapshot       Path to the snapshot file to restore from
+    --snapshot       Path to the snapshot file to restore from (or an s3:// or sftp:// location)
+    --location       URL or server-side path Qdrant recovers from directly (no upload)
+    --repository     Deduplicated backup repository; --snapshot is then a backup name in it
+    --batch          Directory of snapshots or JSON manifest to restore many collections at once
+    --jobs           Number of collections restored in parallel in batch mode (default: 1)
+    --shard-manifest manifest.json of a backup_snapshots.py --shards backup
+    --shard          Only restore this shard from --shard-manifest (repeatable)
+    --no-wait        Start the recovery with wait=false and poll until the collection is green (new collections only)
+    --import         Import a point export made with backup_snapshots.py --export
+    --batch-size     Points per upsert request with --import (default: 1000)
+    --chunk-size     Upload chunk size in KiB (default: 1024)
+    --max-bandwidth  Cap the bandwidth of all snapshot uploads together (MB/s)
+    --latency-target Adapt upload bandwidth and concurrency to keep search latency under this (ms)
+    --warmup         Wait until a restored collection is indexed and replay queries until latency is stable
+    --s3-endpoint    Endpoint of an S3-compatible store for s3:// snapshots (e.g. MinIO)
+    --transfer-jobs  Ranged GETs of one s3:// snapshot in flight at once (default: 4)
     --collection     Name of the existing collection to restore (will be replaced)
     --new-collection Name of a new collection to create from the snapshot
     --host           Qdrant host URL (default: http://localhost:6333)
     --api-key        Qdrant API key (if required)
+    --timeout        Read timeout in seconds for API calls; uploads and recovery wait without one (default: 600)
+    --retries        Retries for failed idempotent API calls (default: 5)
+    --metrics-jsonl  Append per-phase timings and a run summary as JSON lines
+    --metrics-prom   Write metrics to a Prometheus textfile
+    --summary-json   Write a machine-readable summary of the run
+
+Compressed snapshots (.gz, .zst) created with backup_snapshots.py --compress
+are decompressed on the fly while they are uploaded. Snapshots in S3 or on
+an SFTP server are streamed to Qdrant without a local copy.
+
+The exit status is 0 only if every collection (or shard) was restored.
 """
 
 import argparse
+import io
+import json
 import os
+import re
 import sys
+import threading
 import time
+import uuid
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
+
+from qdrant_http import (
+    DEFAULT_POLL_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    QdrantHTTPClient,
+    QdrantRequestError,
+    add_client_arguments,
+    format_size,
+    parse_peer_urls,
+    shard_clients,
+    wait_for_collection,
+)
+from collection_warmup import CollectionWarmup, add_warmup_arguments
+from point_export import PointFileError, PointReader, collection_create_body
+from snapshot_compression import detect_compression, open_decompressed, strip_compression_extension
+from snapshot_metrics import MetricsRecorder, add_metrics_arguments, metrics_from_args
+from snapshot_repository import RepositoryError, SnapshotRepository
+from snapshot_storage import StorageResolver, add_storage_arguments, is_remote
+from transfer_throttle import TransferThrottle, add_throttle_arguments, throttle_from_options
+
+
+# Upper bound on how much of the snapshot file is held in memory at once
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Points per upsert request when importing a point export
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data request body that reads the file lazily.
+    
+    requests' files= argument builds the whole body in memory; this object is
+    passed as data= instead, so requests streams it with a known
+    Content-Length while never holding more than one chunk of the file.
+    Upload progress and throughput are printed while the body is read, and
+    a throttle, if given, paces the reads.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        field_name: str = "snapshot",
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        progress_interval: float = 5.0,
+        fileobj=None,
+        file_size: Optional[int] = None,
+        throttle: Optional[TransferThrottle] = None
+    ):
+        """
+        Upload the file at path, or, if fileobj is given, read the data from
+        that file-like object instead (path is then only used as the file name).
+        If file_size is unknown (None) the body has no length and is sent with
+        chunked transfer encoding.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.throttle = throttle
+        self.boundary = uuid.uuid4().hex
+        self.file_size = file_size if fileobj is not None else os.path.getsize(path)
+        
+        filename = os.path.basename(path)
+        head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        
+        self._file = fileobj if fileobj is not None else open(path, "rb")
+        self._parts = [io.BytesIO(head), self._file, io.BytesIO(tail)]
+        self.length = None if self.file_size is None else len(head) + self.file_size + len(tail)
+        self.bytes_sent = 0
+        self.start_time = None
+        self._last_report = 0.0
+        
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+        
+    def __len__(self) -> int:
+        if self.length is None:
+            raise TypeError("length of the upload body is unknown")
+        return self.length
+        
+    def read(self, size: int = -1) -> bytes:
+        """Read at most size bytes (never more than chunk_size) of the body"""
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+        if self.start_time is None:
+            self.start_time = time.time()
+            self._last_report = self.start_time
+            
+        while self._parts:
+            data = self._parts[0].read(size)
+            if data:
+                if self.throttle:
+                    self.throttle.consume(len(data))
+                self.bytes_sent += len(data)
+                self._report_progress()
+                return data
+            self._parts.pop(0)
+        return b""
+        
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            data = self.read(self.chunk_size)
+            if not data:
+                return
+            yield data
+            
+    def _report_progress(self) -> None:
+        now = time.time()
+        if now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        if self.length is None:
+            print(f"Uploaded {format_size(self.bytes_sent)} ({format_size(int(self.throughput))}/s)")
+            return
+        percent = 100.0 * self.bytes_sent / self.length
+        print(f"Uploaded {format_size(self.bytes_sent)} / {format_size(self.length)} "
+              f"({percent:.0f}%, {format_size(int(self.throughput))}/s)")
+              
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start_time if self.start_time else 0.0
+        
+    @property
+    def throughput(self) -> float:
+        """Average upload rate in bytes per second"""
+        elapsed = self.elapsed
+        return self.bytes_sent / elapsed if elapsed > 0 else 0.0
+        
+    def close(self) -> None:
+        self._file.close()
+        
+    def __enter__(self) -> "MultipartFileStream":
+        return self
+        
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Qdrant names snapshots '<collection>-<peer id>-<YYYY-MM-DD-HH-MM-SS>.snapshot'
+SNAPSHOT_NAME_PATTERN = re.compile(r"^(?P<collection>.+)-\d+-\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}\.snapshot")
+SNAPSHOT_EXTENSIONS = (".snapshot", ".snapshot.gz", ".snapshot.zst")
+
+
+def collection_from_snapshot_name(snapshot_name: str) -> str:
+    """Work out the collection a snapshot file belongs to from its name"""
+    match = SNAPSHOT_NAME_PATTERN.match(os.path.basename(snapshot_name))
+    if match:
+        return match.group("collection")
+    return os.path.basename(strip_compression_extension(snapshot_name)).rsplit(".snapshot", 1)[0]
+
+
+def load_batch(
+    path: str,
+    repository: Optional["SnapshotRepository"] = None,
+    storage: Optional[StorageResolver] = None
+) -> Dict[str, str]:
+    """
+    Build a {collection: snapshot} map for a batch restore.
+    
+    path can be a directory of snapshot files (the newest file per collection
+    is used), or a JSON manifest mapping collection names to snapshot files
+    (relative to the manifest) or, with a repository, to backup names. With
+    a repository, path 'latest' selects the newest backup of every collection.
+    An s3:// or sftp:// path is opened through storage.
+    """
+    if repository and path == "latest":
+        batch = {}
+        for backup in repository.list_backups():
+            batch[backup["collection"]] = f"{backup['collection']}/{backup['snapshot']}"
+        return batch
+        
+    if is_remote(path):
+        return _load_remote_batch(path, storage or StorageResolver())
+        
+    if os.path.isdir(path):
+        newest = {}
+        for filename in os.listdir(path):
+            if not filename.endswith(SNAPSHOT_EXTENSIONS):
+                continue
+            file_path = os.path.join(path, filename)
+            collection = collection_from_snapshot_name(filename)
+            if collection not in newest or os.path.getmtime(file_path) > os.path.getmtime(newest[collection]):
+                newest[collection] = file_path
+        return newest
+        
+    with open(path) as f:
+        manifest = json.load(f)
+    entries = manifest.get("collections", manifest)
+    
+    if repository:
+        return dict(entries)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return {collection: os.path.join(base_dir, snapshot) for collection, snapshot in entries.items()}
+
+
+def _load_remote_batch(path: str, resolver: StorageResolver) -> Dict[str, str]:
+    """load_batch for a prefix or JSON manifest in remote storage"""
+    storage, key = resolver.resolve(path)
+    if key.endswith(".json"):
+        manifest = json.loads(storage.read_bytes(key))
+        entries = manifest.get("collections", manifest)
+        base_url = path.rsplit("/", 1)[0]
+        return {collection: f"{base_url}/{snapshot}" for collection, snapshot in entries.items()}
+        
+    newest = {}
+    for entry in storage.list(key.rstrip("/")):
+        filename = entry["key"].rsplit("/", 1)[-1]
+        if not filename.endswith(SNAPSHOT_EXTENSIONS):
+            continue
+        collection = collection_from_snapshot_name(filename)
+        if collection not in newest or entry["modified"] > newest[collection]["modified"]:
+            newest[collection] = entry
+    return {collection: storage.location(entry["key"]) for collection, entry in newest.items()}
+
+
+class SnapshotUploadError(Exception):
+    """Raised when a snapshot cannot be read or uploaded"""
 
 
 class QdrantSnapshotRestore:
     def __init__(
         self,
         host: str = "http://localhost:6333",
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        client: Optional[QdrantHTTPClient] = None,
+        repository: Optional[SnapshotRepository] = None,
+        peer_urls: Optional[Dict[int, str]] = None,
+        no_wait: bool = False,
+        poll_timeout: float = DEFAULT_POLL_TIMEOUT,
+        upload_chunk_size: int = UPLOAD_CHUNK_SIZE,
+        metrics: Optional[MetricsRecorder] = None,
+        throttle: Optional[TransferThrottle] = None,
+        warmup: Optional[CollectionWarmup] = None,
+        storage_options: Optional[Dict[str, Any]] = None
     ):
         self.host = host.rstrip("/")
         self.api_key = api_key
-        self.headers = {}
+        self.upload_chunk_size = upload_chunk_size
+        
+        # Shared keep-alive session with retry/backoff
+        self.client = client or QdrantHTTPClient(host=self.host, api_key=api_key)
+        self.repository = repository
+        self.peer_urls = peer_urls or {}
+        self.no_wait = no_wait
+        self.poll_timeout = poll_timeout
+        # Bandwidth and concurrency limits for snapshot uploads (none by default)
+        self.throttle = throttle or TransferThrottle()
+        # Query replay after each restore, so the collection is hot before it gets traffic
+        self.warmup = warmup
+        # s3:// and sftp:// snapshots are read through these (options as in add_storage_arguments)
+        self.storage = StorageResolver(storage_options)
         
-        if api_key:
-            self.headers["api-key"] = api_key
+        # Per-collection timings for batch restores
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._stats_lock = threading.Lock()
+        
+        # Per-phase timings, bytes and retries (recorded even without outputs)
+        self.metrics = metrics or MetricsRecorder("restore")
+        # Bytes sent by the last upload of each thread, for the upload phase
+        self._uploads = threading.local()
             
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Make HTTP request to Qdrant API with error handling"""
-        url = f"{self.host}{endpoint}"
-        
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                **kwargs
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            print(f"Error: Could not connect to Qdrant at {self.host}")
-            sys.exit(1)
-        except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error: {e}")
-            print(f"Response: {response.text}")
-            sys.exit(1)
-        except requests.exceptions.RequestException as e:
-            print(f"Request Error: {e}")
-            sys.exit(1)
-        except ValueError:
-            print(f"Error: Invalid JSON response from Qdrant")
-            sys.exit(1)
+            return self.client.request_json(method, endpoint, **kwargs)
+        except QdrantRequestError as e:
+            print(f"Error: {e}")
+            if e.response_text:
+                print(f"Response: {e.response_text}")
+            raise
             
     def upload_snapshot(self, snapshot_path: str) -> str:
-        """Upload a snapshot file to Qdrant server"""
-        if not os.path.exists(snapshot_path):
-            print(f"Error: Snapshot file not found: {snapshot_path}")
-            sys.exit(1)
+        """Upload a snapshot file to Qdrant server (raises SnapshotUploadError on failure)"""
+        if self.repository:
+            return self.upload_snapshot_from_repository(snapshot_path)
+            
+        return self._upload_file(snapshot_path, "/snapshots")
+        
+    def _upload_file(
+        self,
+        snapshot_path: str,
+        endpoint: str,
+        client: Optional[QdrantHTTPClient] = None,
+        params: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Stream a (possibly compressed) snapshot file to an upload endpoint"""
+        if not is_remote(snapshot_path) and not os.path.exists(snapshot_path):
+            raise SnapshotUploadError(f"Error: Snapshot file not found: {snapshot_path}")
             
         snapshot_name = os.path.basename(snapshot_path)
         print(f"Uploading snapshot file: {snapshot_name}")
         
+        compression = detect_compression(snapshot_path)
         try:
-            with open(snapshot_path, 'rb') as f:
-                files = {'snapshot': (snapshot_name, f)}
-                url = f"{self.host}/snapshots"
-                
-                response = requests.post(
-                    url,
-                    headers=self.headers,
-                    files=files
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                if result.get("status") != "ok":
-                    print(f"Error uploading snapshot: {result}")
-                    sys.exit(1)
-                    
-                print(f"Snapshot uploaded successfully")
-                return snapshot_name
-                
+            f, file_size = self._open_snapshot(snapshot_path)
+            with f:
+                if compression:
+                    # Decompress while uploading; the uncompressed size is not known
+                    snapshot_name = strip_compression_extension(snapshot_name)
+                    f, file_size = open_decompressed(f, compression), None
+                with MultipartFileStream(
+                    snapshot_name, fileobj=f, file_size=file_size, chunk_size=self.upload_chunk_size,
+                    throttle=self.throttle
+                ) as body:
+                    return self._upload_body(body, snapshot_name, endpoint, client, params)
+        except ValueError as e:
+            raise SnapshotUploadError(f"Error: {e}")
         except IOError as e:
-            print(f"Error reading snapshot file: {e}")
-            sys.exit(1)
-        except requests.exceptions.RequestException as e:
-            print(f"Error uploading snapshot: {e}")
-            sys.exit(1)
+            raise SnapshotUploadError(f"Error reading snapshot file: {e}")
+            
+    def _open_snapshot(self, path: str):
+        """
+        Open a local file or s3:// / sftp:// location for reading.
+        
+        Returns the file object and its size. Remote files are streamed with
+        parallel ranged reads instead of being downloaded first.
+        """
+        if is_remote(path):
+            storage, key = self.storage.resolve(path)
+            reader = storage.open_reader(key)
+            return reader, reader.size
+        return open(path, "rb"), os.path.getsize(path)
+        
+    def upload_snapshot_from_repository(self, backup_name: str) -> str:
+        """Reassemble a backup from the chunk repository while uploading it"""
+        try:
+            index = self.repository.find_backup(backup_name)
+        except RepositoryError as e:
+            raise SnapshotUploadError(f"Error: {e}")
+            
+        snapshot_name = index["snapshot"]
+        print(f"Uploading snapshot '{snapshot_name}' from repository '{self.repository.path}' "
+              f"({len(index['chunks'])} chunks, {format_size(index['size'])})")
+        
+        try:
+            reader = self.repository.open_backup(index)
+            with MultipartFileStream(
+                snapshot_name, fileobj=reader, file_size=index["size"], chunk_size=self.upload_chunk_size,
+                throttle=self.throttle
+            ) as body:
+                return self._upload_body(body, snapshot_name)
+        except RepositoryError as e:
+            raise SnapshotUploadError(f"Error reading backup from repository: {e}")
+            
+    def _upload_body(
+        self,
+        body: MultipartFileStream,
+        snapshot_name: str,
+        endpoint: str = "/snapshots",
+        client: Optional[QdrantHTTPClient] = None,
+        params: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Send a multipart snapshot body to Qdrant"""
+        try:
+            # Not retried: the body stream has already been consumed
+            with self.throttle.transfer():
+                result = (client or self.client).request_json(
+                    "POST",
+                    endpoint,
+                    params=params,
+                    # A body of unknown length is sent with chunked transfer encoding
+                    data=body if body.length is not None else iter(body),
+                    headers={"Content-Type": body.content_type},
+                    # The response comes once Qdrant has processed the snapshot
+                    timeout=(client or self.client).blocking_timeout,
+                    retry=False
+                )
+        except (QdrantRequestError, requests.exceptions.RequestException) as e:
+            raise SnapshotUploadError(f"Error uploading snapshot: {e}")
+            
+        if result.get("status") != "ok":
+            raise SnapshotUploadError(f"Error uploading snapshot: {result}")
             
+        self._uploads.bytes_sent = body.bytes_sent
+        print(f"Snapshot uploaded successfully ({format_size(body.bytes_sent)} in "
+              f"{body.elapsed:.2f}s, {format_size(int(body.throughput))}/s)")
+        return snapshot_name
+        
     def restore_collection(self, snapshot_name: str, collection_name: str) -> bool:
         """Restore an existing collection from a snapshot"""
         print(f"Restoring collection '{collection_name}' from snapshot '{snapshot_name}'...")
         
         try:
-            endpoint = f"/collections/{collection_name}/snapshots/recover"
-            params = {"wait": "true"}
-            data = {"snapshot_name": snapshot_name}
-            
-            response = self._make_request(
-                "PUT",
-                endpoint,
-                params=params,
-                json=data
-            )
+            response = self._recover(collection_name, {"snapshot_name": snapshot_name})
             
             if response.get("status") == "ok":
                 print(f"Collection '{collection_name}' restored successfully")
@@ -134,16 +464,7 @@ class QdrantSnapshotRestore:
         print(f"Creating new collection '{new_collection_name}' from snapshot '{snapshot_name}'...")
         
         try:
-            endpoint = f"/collections/{new_collection_name}/snapshots/recover"
-            params = {"wait": "true"}
-            data = {"snapshot_name": snapshot_name}
-            
-            response = self._make_request(
-                "PUT",
-                endpoint,
-                params=params,
-                json=data
-            )
+            response = self._recover(new_collection_name, {"snapshot_name": snapshot_name})
             
             if response.get("status") == "ok":
                 print(f"Collection '{new_collection_name}' created successfully from snapshot")
@@ -157,6 +478,354 @@ class QdrantSnapshotRestore:
             return False
 
 
+    def recover_from_location(self, location: str, collection_name: str) -> bool:
+        """
+        Restore a collection from a snapshot Qdrant can read by itself.
+        
+        location is an http(s):// URL or a file:// path on the Qdrant server
+        (a plain absolute path is treated as file://). No upload is needed.
+        """
+        if location.startswith("/"):
+            location = f"file://{location}"
+            
+        print(f"Recovering collection '{collection_name}' from '{location}'...")
+        
+        try:
+            response = self._recover(collection_name, {"location": location})
+            
+            if response.get("status") == "ok":
+                print(f"Collection '{collection_name}' recovered successfully")
+                return self.warm_up(collection_name)
+            else:
+                print(f"Error recovering collection: {response}")
+                return False
+                
+        except Exception as e:
+            print(f"Error recovering collection: {e}")
+            return False
+
+
+    def _recover(self, collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a snapshot recover request for a collection.
+        
+        With no_wait the request returns as soon as Qdrant accepted it and the
+        collection is polled until it is green, so a slow recovery is not cut
+        off by a proxy timeout. That only works for a collection that does not
+        exist yet: an existing one is green before its recovery has even
+        started, so no_wait refuses to replace it.
+        """
+        with self.metrics.phase(collection_name, "recover") as phase:
+            if self._refuse_no_wait(collection_name):
+                phase.success = False
+                return {"status": "error", "collection": collection_name}
+                
+            # Not retried: a recovery that timed out or failed with 5xx may still
+            # be running, and a second one would run concurrently with it
+            response = self._make_request(
+                "PUT",
+                f"/collections/{collection_name}/snapshots/recover",
+                params={"wait": "false" if self.no_wait else "true"},
+                json=data,
+                timeout=self.client.timeout if self.no_wait else self.client.blocking_timeout,
+                retry=False
+            )
+            if self.no_wait and response.get("status") in ("ok", "accepted"):
+                print(f"Recovery of collection '{collection_name}' accepted, waiting for it to become ready...")
+                if wait_for_collection(self.client, collection_name, timeout=self.poll_timeout):
+                    response = {"status": "ok"}
+                else:
+                    response = {"status": "timeout", "collection": collection_name}
+            phase.success = response.get("status") == "ok"
+        return response
+        
+    def import_points(
+        self,
+        export_path: str,
+        collection_name: str,
+        batch_size: int = DEFAULT_IMPORT_BATCH_SIZE,
+        jobs: int = 1
+    ) -> bool:
+        """
+        Import a point export made with backup_snapshots.py --export.
+        
+        The collection is created with the exported configuration if it does
+        not exist; otherwise the points are upserted into it (points with the
+        same id are replaced). Up to `jobs` upsert requests of `batch_size`
+        points run at once, and at most twice that many batches are held in
+        memory.
+        """
+        with self.metrics.phase(collection_name, "import") as phase:
+            phase.success = self._import_points(export_path, collection_name, batch_size, jobs)
+            if phase.success:
+                phase.bytes = self.stats[collection_name]["bytes"]
+                phase.extra["points"] = self.stats[collection_name]["points"]
+        return phase.success and self.warm_up(collection_name)
+        
+    def _import_points(self, export_path: str, collection_name: str, batch_size: int, jobs: int) -> bool:
+        if not is_remote(export_path) and not os.path.exists(export_path):
+            print(f"Error: Export file not found: {export_path}")
+            return False
+            
+        start_time = time.time()
+        jobs = max(1, jobs)
+        compression = detect_compression(export_path)
+        print(f"Importing points from '{os.path.basename(export_path)}' into collection '{collection_name}'...")
+        
+        try:
+            f, file_size = self._open_snapshot(export_path)
+            with f:
+                reader = PointReader(open_decompressed(f, compression) if compression else f)
+                if not self._ensure_collection(collection_name, reader.header.get("config")):
+                    return False
+                    
+                with ThreadPoolExecutor(max_workers=jobs) as executor:
+                    pending = []
+                    batch = []
+                    for point in reader:
+                        batch.append(point)
+                        if len(batch) < batch_size:
+                            continue
+                        pending.append(executor.submit(self._upsert_points, collection_name, batch))
+                        batch = []
+                        while len(pending) > jobs * 2:
+                            pending.pop(0).result()
+                    if batch:
+                        pending.append(executor.submit(self._upsert_points, collection_name, batch))
+                    for future in pending:
+                        future.result()
+        except (PointFileError, ValueError) as e:
+            print(f"Error reading export file: {e}")
+            return False
+        except IOError as e:
+            print(f"Error reading export file: {e}")
+            return False
+        except QdrantRequestError as e:
+            print(f"Error importing points into collection '{collection_name}': {e}")
+            return False
+            
+        elapsed = time.time() - start_time
+        self._record_stats(collection_name, points=reader.count, bytes=file_size, elapsed=elapsed)
+        print(f"Imported {reader.count} points into collection '{collection_name}' in {elapsed:.2f}s "
+              f"({reader.count / max(elapsed, 0.001):.0f} points/s)")
+        return True
+        
+    def _refuse_no_wait(self, collection_name: str) -> bool:
+        """True (after printing why) if no_wait would have to replace an existing collection"""
+        if not self.no_wait or not self._collection_exists(collection_name):
+            return False
+        print(f"Error: collection '{collection_name}' exists; --no-wait cannot tell when its recovery "
+              f"has finished, so restore it without --no-wait or into a new collection")
+        return True
+        
+    def _collection_exists(self, collection_name: str) -> bool:
+        """True if the collection exists (raises QdrantRequestError if that cannot be checked)"""
+        try:
+            self.client.request_json("GET", f"/collections/{collection_name}")
+            return True
+        except QdrantRequestError as e:
+            if e.status_code == 404:
+                return False
+            raise
+            
+    def _ensure_collection(self, collection_name: str, config: Optional[Dict[str, Any]]) -> bool:
+        """Create the collection from an exported config unless it already exists"""
+        try:
+            self.client.request_json("GET", f"/collections/{collection_name}")
+            print(f"Collection '{collection_name}' exists, points will be upserted into it")
+            return True
+        except QdrantRequestError as e:
+            if e.status_code != 404:
+                print(f"Error checking collection '{collection_name}': {e}")
+                return False
+                
+        print(f"Creating collection '{collection_name}' from the exported configuration")
+        try:
+            self._make_request("PUT", f"/collections/{collection_name}", json=collection_create_body(config))
+            return True
+        except QdrantRequestError:
+            return False
+            
+    def _upsert_points(self, collection_name: str, points: List[Dict[str, Any]]) -> None:
+        # Upserts by id are idempotent, so the PUT is retried on transient errors
+        self.client.request_json(
+            "PUT",
+            f"/collections/{collection_name}/points",
+            params={"wait": "true"},
+            json={"points": points}
+        )
+        
+    def warm_up(self, collection_name: str) -> bool:
+        """
+        Warm up a restored collection (if enabled); False only if it never
+        became ready. The latency curve is recorded with the warmup phase.
+        """
+        if not self.warmup:
+            return True
+
+        start_time = time.time()
+        with self.metrics.phase(collection_name, "warmup") as phase:
+            result = self.warmup.warm_up(collection_name)
+            phase.success = result["ready"]
+            phase.extra.update(result)
+        self._record_stats(collection_name, warmup_time=time.time() - start_time, warmup=result)
+        return result["ready"]
+
+    def _record_stats(self, collection_name: str, **values) -> None:
+        """Store timing information for a collection"""
+        with self._stats_lock:
+            self.stats.setdefault(collection_name, {}).update(values)
+            
+    def restore_from_snapshot(self, snapshot_path: str, collection_name: str, new_collection: bool = False) -> bool:
+        """
+        Upload a snapshot and recover a collection from it, recording timings.
+        
+        With new_collection the collection is created from the snapshot
+        instead of replacing an existing one.
+        """
+        start_time = time.time()
+        
+        try:
+            # Checked before the upload as well, so a refused restore uploads nothing
+            try:
+                if self._refuse_no_wait(collection_name):
+                    return False
+            except QdrantRequestError as e:
+                print(f"[{collection_name}] Error checking collection: {e}")
+                return False
+                
+            with self.metrics.phase(collection_name, "upload") as phase:
+                try:
+                    snapshot_name = self.upload_snapshot(snapshot_path)
+                except SnapshotUploadError as e:
+                    print(f"[{collection_name}] {e}")
+                    phase.success = False
+                    return False
+                phase.bytes = self._uploads.bytes_sent
+            self._record_stats(collection_name, upload_time=time.time() - start_time)
+            
+            recover_start = time.time()
+            if new_collection:
+                success = self.create_collection_from_snapshot(snapshot_name, collection_name)
+            else:
+                success = self.restore_collection(snapshot_name, collection_name)
+            self._record_stats(collection_name, recover_time=time.time() - recover_start)
+            return success and self.warm_up(collection_name)
+        finally:
+            self._record_stats(collection_name, elapsed=time.time() - start_time)
+            
+    def restore_shards(
+        self,
+        manifest_path: str,
+        collection_name: str,
+        shard_ids: Optional[List[int]] = None,
+        jobs: int = 1
+    ) -> Dict[int, bool]:
+        """
+        Restore shards of a collection from a backup_snapshots.py --shards backup.
+        
+        Every shard snapshot is uploaded to the node holding an active replica
+        of that shard in the target collection, several shards at a time. Pass
+        shard_ids to re-seed only some shards and leave the others untouched.
+        The uploads always wait for the recovery: the collection exists, so
+        no_wait could not tell when it has finished.
+        """
+        if is_remote(manifest_path):
+            storage, key = self.storage.resolve(manifest_path)
+            manifest = json.loads(storage.read_bytes(key))
+            backup_dir = manifest_path.rsplit("/", 1)[0]
+        else:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            backup_dir = os.path.dirname(os.path.abspath(manifest_path))
+        
+        entries = [e for e in manifest["shards"] if shard_ids is None or e["shard_id"] in shard_ids]
+        targets = {shard_id: client for shard_id, _, client in shard_clients(self.client, collection_name, self.peer_urls)}
+        print(f"Restoring {len(entries)} of {manifest['shard_count']} shards into collection '{collection_name}'")
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            futures = {}
+            for entry in entries:
+                shard_id = entry["shard_id"]
+                if shard_id not in targets:
+                    print(f"Error: collection '{collection_name}' has no active replica of shard {shard_id}")
+                    results[shard_id] = False
+                    continue
+                futures[executor.submit(
+                    self._restore_shard,
+                    f"{backup_dir}/{entry['file']}" if is_remote(backup_dir) else os.path.join(backup_dir, entry["file"]),
+                    collection_name,
+                    shard_id,
+                    targets[shard_id]
+                )] = shard_id
+                
+            for future in as_completed(futures):
+                shard_id = futures[future]
+                results[shard_id] = future.result()
+                print(f"Shard {shard_id}: {'SUCCESS' if results[shard_id] else 'FAILED'}")
+                
+        return dict(sorted(results.items()))
+        
+    def _restore_shard(
+        self,
+        snapshot_path: str,
+        collection_name: str,
+        shard_id: int,
+        client: QdrantHTTPClient
+    ) -> bool:
+        """Upload one shard snapshot; Qdrant recovers the shard from it directly"""
+        start_time = time.time()
+        key = f"{collection_name}/shard-{shard_id}"
+        
+        try:
+            with self.metrics.phase(collection_name, "upload", shard=shard_id) as phase:
+                self._upload_file(
+                    snapshot_path,
+                    f"/collections/{collection_name}/shards/{shard_id}/snapshots/upload",
+                    client=client,
+                    params={"wait": "true", "priority": "snapshot"}
+                )
+                phase.bytes = self._uploads.bytes_sent
+            return True
+        except SnapshotUploadError as e:
+            print(f"[shard {shard_id}] {e}")
+            return False
+        except Exception as e:
+            print(f"Unexpected error restoring shard {shard_id}: {e}")
+            return False
+        finally:
+            self._record_stats(key, elapsed=time.time() - start_time)
+            
+    def restore_batch(self, batch: Dict[str, str], jobs: int = 1) -> Dict[str, bool]:
+        """Restore several collections, running up to `jobs` at the same time"""
+        print(f"Restoring {len(batch)} collections with {jobs} parallel workers")
+        
+        results = {}
+        total = len(batch)
+        
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            futures = {
+                executor.submit(self.restore_from_snapshot, snapshot, collection): collection
+                for collection, snapshot in batch.items()
+            }
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                collection = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"Unexpected error restoring collection '{collection}': {e}")
+                    success = False
+                    
+                results[collection] = success
+                status = "SUCCESS" if success else "FAILED"
+                print(f"[{done}/{total}] {collection}: {status} "
+                      f"({self.stats.get(collection, {}).get('elapsed', 0):.2f}s)")
+                      
+        return {collection: results[collection] for collection in batch}
+
+
 def print_usage():
     """Print detailed usage instructions"""
     print("""
@@ -169,14 +838,60 @@ Basic Usage:
 -----------
   ./restore_snapshots.py --snapshot <snapshot_file> --collection <collection_name>
   ./restore_snapshots.py --snapshot <snapshot_file> --new-collection <new_collection_name>
+  ./restore_snapshots.py --location <url_or_server_path> --collection <collection_name>
 
 Options:
 -------
-  --snapshot <file>       Path to the snapshot file to restore from
+  --snapshot <file>       Path to the snapshot file to restore from (or s3://bucket/key, sftp://host/path)
+  --location <url|path>   URL or path on the Qdrant server to recover from directly (skips upload)
+  --repository <path>     Deduplicated backup repository; --snapshot is then a backup name in it
+  --list-backups          List the backups in --repository and exit
+  --batch <dir|manifest>  Restore every collection in a snapshot directory or JSON manifest
+                          (with --repository: a manifest of backup names, or 'latest';
+                          s3:// and sftp:// prefixes work as directories)
+  --jobs <n>              Number of collections (or shards) restored in parallel (default: 1)
+  --shard-manifest <file> Restore shards from a backup_snapshots.py --shards backup
+  --shard <id>            Only restore this shard (repeatable, with --shard-manifest)
+  --import <file>         Import a point export made with backup_snapshots.py --export
+  --batch-size <n>        Points per upsert request with --import (default: 1000)
+  --chunk-size <KiB>      Upload chunk size in KiB (default: 1024)
+  --max-bandwidth <MB/s>  Hard cap on the bandwidth of all snapshot uploads together
+  --latency-target <ms>   Adapt upload bandwidth and parallel uploads to keep search latency under this
+  --min-bandwidth <MB/s>  Bandwidth never throttled below with --latency-target (default: 1)
+  --canary-collection <n> Collection searched to measure latency (not one being restored)
+  --canary-query <json|@file> Body of the canary search (default: a search with a stored vector)
+  --canary-host <url>     Send canary searches here, e.g. through Caddy (default: --host)
+  --latency-metric <sel>  Read latency from a Prometheus histogram or gauge instead of a canary search
+  --latency-metrics-url <url> Metrics endpoint for --latency-metric (default: <host>/metrics)
+  --latency-quantile <q>  Quantile of a --latency-metric histogram (default: 0.99)
+  --probe-interval <sec>  Seconds between latency probes (default: 2)
+  --warmup                After restoring, wait until the collection is indexed and replay queries
+                          until latency is stable (not for --shard-manifest)
+  --warmup-queries <file> JSON lines file of recorded search/query bodies (default: synthetic queries)
+  --warmup-sample <n>     Stored vectors used as synthetic queries (default: 200)
+  --warmup-concurrency <n> Warm-up queries in flight (default: 8)
+  --warmup-max-time <sec> Max seconds of query replay per collection (default: 600)
+  --warmup-tolerance <f>  Relative p95 spread of the last 3 rounds that counts as stable (default: 0.1)
+  --peer-url <id=url>     HTTP address of a cluster peer for shard restores (repeatable)
+  --metrics-jsonl <path>  Append per-phase timings, bytes and retries as JSON lines
+  --metrics-prom <path>   Write metrics to a Prometheus textfile (node_exporter textfile collector)
+  --pushgateway <url>     Push the metrics to a Prometheus Pushgateway
+  --summary-json <path>   Write a machine-readable summary of the run
   --collection <name>     Name of the existing collection to restore (will be replaced)
   --new-collection <name> Name of a new collection to create from the snapshot
   --host <url>            Qdrant host URL (default: http://localhost:6333)
   --api-key <key>         Qdrant API key (if required)
+  --timeout <sec>         Read timeout for API calls; uploads and recovery wait without one (default: 600)
+  --connect-timeout <s>   Connect timeout (default: 10)
+  --retries <n>           Retries for failed idempotent API calls (default: 5)
+  --no-wait               Start the recovery with wait=false and poll until the collection is green
+                          (only with --new-collection: an existing collection already looks recovered)
+  --poll-timeout <sec>    Max time to poll for a --no-wait recovery (default: 21600)
+  --s3-endpoint <url>     Endpoint of an S3-compatible store, e.g. http://minio:9000 (default: AWS)
+  --s3-region <region>    S3 region (default: $AWS_REGION or us-east-1)
+  --part-size <MiB>       Size of the ranged GETs of s3:// snapshots (default: 16)
+  --transfer-jobs <n>     Ranged GETs of one snapshot in flight at once (default: 4)
+  --sftp-key <file>       Private key for sftp:// snapshots (default: SSH agent and ~/.ssh keys)
   --help                  Show this help message and exit
 
 Examples:
@@ -187,11 +902,145 @@ Examples:
   # Create a new collection from a snapshot
   ./restore_snapshots.py --snapshot ./snapshots/my_collection.snapshot --new-collection my_new_collection
 
+  # Let Qdrant fetch the snapshot itself instead of uploading it
+  ./restore_snapshots.py --location https://backups.example.com/my_collection.snapshot --collection my_collection
+  ./restore_snapshots.py --location /qdrant/snapshots/my_collection.snapshot --collection my_collection
+
+  # Restore a backup from a deduplicated repository
+  ./restore_snapshots.py --repository /backups/qdrant-repo --list-backups
+  ./restore_snapshots.py --repository /backups/qdrant-repo --snapshot my_collection-123.snapshot --collection my_collection
+
+  # Restore every collection from a backup directory, 4 at a time
+  ./restore_snapshots.py --batch /backups/qdrant/2024-01-31 --jobs 4
+
+  # Stream a snapshot from MinIO into a new collection (credentials from AWS_* variables)
+  ./restore_snapshots.py --snapshot s3://qdrant-backups/nightly/my_collection-123-2024-01-31-02-00-00.snapshot --new-collection my_collection --s3-endpoint http://minio:9000
+
+  # Re-seed shard 3 of a distributed collection from a shard backup
+  ./restore_snapshots.py --shard-manifest ./snapshots/my_collection-shards-2024-01-31-02-00-00/manifest.json --collection my_collection --shard 3
+
+  # Recover a large collection behind a proxy with a short timeout
+  ./restore_snapshots.py --location /qdrant/snapshots/big.snapshot --new-collection big_restored --no-wait
+
+  # Import a point export (any Qdrant version), 8 upserts in parallel
+  ./restore_snapshots.py --import ./snapshots/my_collection-2024-01-31-02-00-00.points.zst --new-collection my_collection --jobs 8
+
+  # Restore during business hours without pushing search latency over 50 ms
+  ./restore_snapshots.py --batch /backups/qdrant/2024-01-31 --jobs 4 --latency-target 50 --canary-collection products
+
+  # Fail over to a restored collection only once it answers queries at full speed
+  ./restore_snapshots.py --snapshot ./snapshots/products.snapshot --new-collection products_restored --warmup --warmup-queries queries.jsonl
+
   # Specify custom host and API key
   ./restore_snapshots.py --snapshot ./snapshots/my_collection.snapshot --collection my_collection --host http://qdrant.example.com:6333 --api-key my_api_key
 """)
 
 
+def print_warmup_curve(result: Optional[Dict[str, Any]]) -> None:
+    """Print the latency of every warm-up round"""
+    if not result or not result["rounds"]:
+        return
+    print(f"Warm-up: {result['queries']} queries ({result['errors']} failed), "
+          f"ready after {result['ready_time']:.1f}s, {'stable' if result['stable'] else 'not stable'} "
+          f"after {result['elapsed']:.1f}s")
+    print(f"  {'round':>5} {'elapsed':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for point in result["rounds"]:
+        print(f"  {point['round']:>5} {point['elapsed']:>8.1f}s {point['p50_ms']:>7.1f}ms {point['p95_ms']:>7.1f}ms "
+              f"{point['p99_ms']:>7.1f}ms {point['max_ms']:>7.1f}ms")
+
+
+def finish_run(restore_tool: QdrantSnapshotRestore, results: Dict[str, bool], start_time: float) -> None:
+    """Print the elapsed time, write the metrics outputs and exit with the status of the run"""
+    restore_tool.throttle.close()
+    if restore_tool.throttle.limited:
+        restore_tool.throttle.print_summary()
+        
+    elapsed_time = time.time() - start_time
+    print(f"\nRestore completed in {elapsed_time:.2f} seconds")
+    
+    for collection, success in results.items():
+        restore_tool.metrics.collection_result(
+            collection, success, restore_tool.stats.get(collection, {}).get("elapsed", elapsed_time)
+        )
+    summary = restore_tool.metrics.finish(elapsed_time)
+    restore_tool.storage.close()
+    if restore_tool.metrics.summary_path:
+        print(f"Summary written to: {restore_tool.metrics.summary_path}")
+    sys.exit(0 if summary["success"] else 1)
+
+
+def run_batch_restore(restore_tool: QdrantSnapshotRestore, args, start_time: float) -> None:
+    """Restore all collections of a batch and print the per-collection summary"""
+    try:
+        batch = load_batch(args.batch, restore_tool.repository, restore_tool.storage)
+    except (IOError, ValueError, AttributeError) as e:
+        print(f"Error reading batch '{args.batch}': {e}")
+        sys.exit(1)
+        
+    if not batch:
+        print(f"No snapshots found in '{args.batch}'")
+        sys.exit(1)
+        
+    for collection, snapshot in sorted(batch.items()):
+        print(f"  {collection} <- {snapshot}")
+        
+    results = restore_tool.restore_batch(batch, jobs=args.jobs)
+    
+    print("\n" + "=" * 60)
+    print("Restore Summary:")
+    print("-" * 60)
+    
+    for collection, success in results.items():
+        status = "SUCCESS" if success else "FAILED"
+        stats = restore_tool.stats.get(collection, {})
+        warmup_info = f"warm-up {stats['warmup_time']:.2f}s, " if "warmup_time" in stats else ""
+        print(
+            f"{collection}: {status} "
+            f"(upload {stats.get('upload_time', 0):.2f}s, "
+            f"recover {stats.get('recover_time', 0):.2f}s, "
+            f"{warmup_info}"
+            f"total {stats.get('elapsed', 0):.2f}s)"
+        )
+        
+    success_count = sum(1 for success in results.values() if success)
+    print("-" * 60)
+    print(f"Total: {success_count}/{len(results)} collections restored successfully")
+    
+    finish_run(restore_tool, results, start_time)
+
+
+def run_shard_restore(restore_tool: QdrantSnapshotRestore, args, start_time: float) -> None:
+    """Restore shards from a shard backup manifest and print the summary"""
+    try:
+        results = restore_tool.restore_shards(
+            args.shard_manifest,
+            args.collection,
+            shard_ids=args.shard,
+            jobs=args.jobs
+        )
+    except (IOError, ValueError, KeyError) as e:
+        print(f"Error reading shard manifest '{args.shard_manifest}': {e}")
+        sys.exit(1)
+    except QdrantRequestError as e:
+        print(f"Error listing shards of collection '{args.collection}': {e}")
+        sys.exit(1)
+        
+    print("\n" + "=" * 60)
+    print("Restore Summary:")
+    print("-" * 60)
+    
+    for shard_id, success in results.items():
+        stats = restore_tool.stats.get(f"{args.collection}/shard-{shard_id}", {})
+        status = "SUCCESS" if success else "FAILED"
+        print(f"Shard {shard_id}: {status} ({stats.get('elapsed', 0):.2f}s)")
+        
+    success_count = sum(1 for success in results.values() if success)
+    print("-" * 60)
+    print(f"Total: {success_count}/{len(results)} shards of '{args.collection}' restored successfully")
+    
+    finish_run(restore_tool, {args.collection: success_count == len(results)}, start_time)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Qdrant Collection Snapshot Restore Tool",
@@ -204,6 +1053,33 @@ Examples:
   # Create a new collection from a snapshot
   %(prog)s --snapshot ./snapshots/my_collection.snapshot --new-collection my_new_collection
 
+  # Let Qdrant fetch the snapshot itself instead of uploading it
+  %(prog)s --location https://backups.example.com/my_collection.snapshot --collection my_collection
+
+  # Restore a backup from a deduplicated repository
+  %(prog)s --repository /backups/qdrant-repo --snapshot my_collection-123.snapshot --collection my_collection
+
+  # Restore every collection from a backup directory, 4 at a time
+  %(prog)s --batch /backups/qdrant/2024-01-31 --jobs 4
+
+  # Restore the newest snapshot of every collection under an S3 prefix
+  %(prog)s --batch s3://qdrant-backups/nightly --jobs 4 --s3-endpoint http://minio:9000
+
+  # Re-seed shard 3 of a distributed collection from a shard backup
+  %(prog)s --shard-manifest ./snapshots/my_collection-shards-2024-01-31-02-00-00/manifest.json --collection my_collection --shard 3
+
+  # Recover a large collection behind a proxy with a short timeout
+  %(prog)s --location /qdrant/snapshots/big.snapshot --new-collection big_restored --no-wait
+
+  # Import a point export (any Qdrant version), 8 upserts in parallel
+  %(prog)s --import ./snapshots/my_collection-2024-01-31-02-00-00.points.zst --new-collection my_collection --jobs 8
+
+  # Restore during business hours without pushing search latency over 50 ms
+  %(prog)s --batch /backups/qdrant/2024-01-31 --jobs 4 --latency-target 50 --canary-collection products
+
+  # Fail over to a restored collection only once it answers queries at full speed
+  %(prog)s --snapshot ./snapshots/products.snapshot --new-collection products_restored --warmup --warmup-queries queries.jsonl
+
   # Specify custom host and API key
   %(prog)s --snapshot ./snapshots/my_collection.snapshot --collection my_collection --host http://qdrant.example.com:6333 --api-key my_api_key
 """
@@ -214,21 +1090,98 @@ Examples:
         print_usage()
         sys.exit(0)
     
-    parser.add_argument("--snapshot", required=True, help="Path to the snapshot file to restore from")
+    # --list-backups needs neither a snapshot nor a target collection, and
+    # --batch takes its target collections from the snapshot names/manifest
+    listing = "--list-backups" in sys.argv
+    batch_mode = "--batch" in sys.argv
+    
+    source = parser.add_mutually_exclusive_group(required=not listing)
+    source.add_argument("--snapshot", help="Path to the snapshot file to restore from (or an s3:// or sftp:// location)")
+    source.add_argument("--location", help="URL or path on the Qdrant server to recover from directly (skips upload)")
+    source.add_argument("--batch", help="Directory of snapshots or JSON manifest to restore many collections at once")
+    source.add_argument("--shard-manifest", help="Restore shards from a backup_snapshots.py --shards backup")
+    source.add_argument("--import", dest="import_path", help="Import a point export made with backup_snapshots.py --export")
     
-    group = parser.add_mutually_exclusive_group(required=True)
+    group = parser.add_mutually_exclusive_group(required=not (listing or batch_mode))
     group.add_argument("--collection", help="Name of the existing collection to restore (will be replaced)")
     group.add_argument("--new-collection", help="Name of a new collection to create from the snapshot")
     
     parser.add_argument("--host", default="http://localhost:6333", help="Qdrant host URL")
     parser.add_argument("--api-key", help="Qdrant API key (if required)")
+    parser.add_argument("--repository", help="Deduplicated backup repository; --snapshot is then a backup name in it")
+    parser.add_argument("--list-backups", action="store_true", help="List the backups in --repository and exit")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of collections (or shards) restored in parallel")
+    parser.add_argument("--shard", type=int, action="append", help="Only restore this shard (repeatable, with --shard-manifest)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help="Points per upsert request with --import")
+    parser.add_argument("--chunk-size", type=int, default=UPLOAD_CHUNK_SIZE // 1024, help="Upload chunk size in KiB")
+    add_client_arguments(parser)
+    add_throttle_arguments(parser)
+    add_warmup_arguments(parser)
+    add_metrics_arguments(parser)
+    add_storage_arguments(parser)
     
     args = parser.parse_args()
     
+    repository = SnapshotRepository(args.repository) if args.repository else None
+    
+    if args.shard_manifest and not args.collection:
+        parser.error("--shard-manifest requires --collection (the collection must already exist)")
+    if args.no_wait and (args.collection or args.shard_manifest):
+        parser.error("--no-wait only works with --new-collection: an existing collection looks "
+                     "recovered before the recovery has finished")
+    try:
+        peer_urls = parse_peer_urls(args.peer_url)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.list_backups:
+        if not repository:
+            parser.error("--list-backups requires --repository")
+        for backup in repository.list_backups():
+            print(f"{backup['created']}  {backup['collection']}/{backup['snapshot']}  {format_size(backup['size'])}")
+        sys.exit(0)
+    
+    client = QdrantHTTPClient(
+        host=args.host,
+        api_key=args.api_key,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.timeout,
+        retries=args.retries,
+        pool_size=max(DEFAULT_POOL_SIZE, args.jobs)
+    )
+    try:
+        throttle = throttle_from_options(vars(args), client, slots=args.jobs)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    warmup = None
+    if args.warmup:
+        try:
+            warmup = CollectionWarmup(
+                client,
+                queries_path=args.warmup_queries,
+                sample=args.warmup_sample,
+                concurrency=args.warmup_concurrency,
+                max_time=args.warmup_max_time,
+                tolerance=args.warmup_tolerance,
+                ready_timeout=args.poll_timeout
+            )
+        except (IOError, ValueError) as e:
+            parser.error(f"Error reading --warmup-queries: {e}")
+    
     # Initialize restore tool
     restore_tool = QdrantSnapshotRestore(
         host=args.host,
-        api_key=args.api_key
+        api_key=args.api_key,
+        client=client,
+        repository=repository,
+        peer_urls=peer_urls,
+        no_wait=args.no_wait,
+        poll_timeout=args.poll_timeout,
+        upload_chunk_size=max(1, args.chunk_size) * 1024,
+        metrics=metrics_from_args("restore", args),
+        throttle=throttle,
+        warmup=warmup,
+        storage_options=vars(args)
     )
     
     start_time = time.time()
@@ -236,33 +1189,50 @@ Examples:
     
     print(f"\nQdrant Snapshot Restore - {timestamp}")
     print(f"Host: {args.host}")
-    print(f"Snapshot: {args.snapshot}")
+    print(f"Snapshot: {args.snapshot or args.location or args.batch or args.shard_manifest or args.import_path}")
+    if throttle.limited:
+        print(f"Throttle: {throttle.describe()}")
     print("-" * 60)
     
-    # Upload snapshot
-    snapshot_name = restore_tool.upload_snapshot(args.snapshot)
+    if args.batch:
+        run_batch_restore(restore_tool, args, start_time)
+        return
+        
+    if args.shard_manifest:
+        run_shard_restore(restore_tool, args, start_time)
+        return
+        
+    collection_name = args.collection or args.new_collection
     
     # Perform restore
     success = False
-    if args.collection:
+    if args.location:
+        success = restore_tool.recover_from_location(args.location, collection_name)
+    elif args.import_path:
+        success = restore_tool.import_points(
+            args.import_path,
+            collection_name,
+            batch_size=max(1, args.batch_size),
+            jobs=args.jobs
+        )
+    elif args.collection:
         print(f"Restoring to existing collection: {args.collection}")
-        success = restore_tool.restore_collection(snapshot_name, args.collection)
+        success = restore_tool.restore_from_snapshot(args.snapshot, args.collection)
     else:
         print(f"Creating new collection: {args.new_collection}")
-        success = restore_tool.create_collection_from_snapshot(snapshot_name, args.new_collection)
+        success = restore_tool.restore_from_snapshot(args.snapshot, args.new_collection, new_collection=True)
     
     # Print summary
     print("\n" + "=" * 60)
     print("Restore Summary:")
     print("-" * 60)
     
-    collection_name = args.collection or args.new_collection
     status = "SUCCESS" if success else "FAILED"
     print(f"Collection: {collection_name}")
     print(f"Status: {status}")
+    print_warmup_curve(restore_tool.stats.get(collection_name, {}).get("warmup"))
     
-    elapsed_time = time.time() - start_time
-    print(f"\nRestore completed in {elapsed_time:.2f} seconds")
+    finish_run(restore_tool, {collection_name: success}, start_time)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+In-process stand-in for an S3-compatible object store
+
+A small in-memory server with the S3 calls snapshot_storage.py makes, so
+backups to s3:// can be tried and tested without MinIO or AWS. Buckets are
+addressed in path style (http://127.0.0.1:9000/<bucket>/<key>), which is
+what snapshot_storage.py uses with --s3-endpoint:
+
+    objects    PUT, GET (with Range), HEAD, DELETE
+    multipart  create, upload part, complete, abort; like S3, every part but
+               the last must be at least 5 MiB and the parts of a completed
+               upload must match the ETags that were returned
+    listing    ListObjectsV2 with prefix, delimiter and continuation tokens
+
+With credentials, every request must carry a valid AWS Signature Version 4
+for them, computed from the request as it was received.
+
+Usage:
+    python s3_stub.py --port 9000 --bucket backups
+    python s3_stub.py --port 9000 --bucket backups --access-key test --secret-key testsecret
+
+Options:
+    --host        Address to listen on (default: 127.0.0.1)
+    --port        Port to listen on (default: 9000)
+    --bucket      Bucket to create at start (repeatable)
+    --access-key  Require requests signed with this access key ...
+    --secret-key  ... and this secret key
+"""
+
+import argparse
+import hashlib
+import itertools
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from snapshot_storage import MIN_PART_SIZE, sign_v4
+
+
+LIST_PAGE_SIZE = 1000
+
+
+class _S3Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_S3Server"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+              content_type: str = "application/xml") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str) -> None:
+        body = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>"
+        self._send(status, body.encode())
+
+    def _check_signature(self, path: str, query: str, body: bytes) -> Optional[str]:
+        """Error message if the request is not signed correctly with the stub's credentials"""
+        stub = self.server.stub
+        authorization = self.headers.get("Authorization", "")
+        if not authorization.startswith("AWS4-HMAC-SHA256 "):
+            return "Missing AWS Signature Version 4"
+        fields = dict(item.strip().split("=", 1) for item in authorization[len("AWS4-HMAC-SHA256 "):].split(","))
+        access_key, date, region = fields["Credential"].split("/")[:3]
+        if access_key != stub.access_key:
+            return "Unknown access key"
+        payload_hash = self.headers.get("x-amz-content-sha256", "")
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return "Payload hash does not match the body"
+        # Canonical query: every name and value encoded, sorted
+        canonical_query = "&".join(
+            f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}"
+            for name, value in sorted(parse_qsl(query, keep_blank_values=True))
+        )
+        signed = fields["SignedHeaders"].split(";")
+        extra = {name: self.headers.get(name, "") for name in signed
+                 if name not in ("host", "x-amz-content-sha256", "x-amz-date")}
+        expected = sign_v4(self.command, self.headers.get("Host", ""), path, canonical_query, payload_hash,
+                           access_key, stub.secret_key, region, self.headers.get("x-amz-date", ""), extra)
+        if expected["authorization"] != authorization:
+            return "The request signature we calculated does not match the signature you provided"
+        return None
+
+    def _dispatch(self) -> None:
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        body = self._body()
+        if stub.access_key:
+            error = self._check_signature(parts.path, parts.query, body)
+            if error:
+                return self._error(403, "SignatureDoesNotMatch", error)
+
+        path = unquote(parts.path).lstrip("/")
+        bucket, _, key = path.partition("/")
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        with stub.lock:
+            bucket_exists = bucket in stub.buckets
+        if self.command == "PUT" and not key:
+            with stub.lock:
+                stub.buckets.setdefault(bucket, {})
+            return self._send(200)
+        if not bucket_exists:
+            return self._error(404, "NoSuchBucket", f"The specified bucket does not exist: {bucket}")
+        if not key:
+            if self.command == "GET":
+                return self._list(bucket, query)
+            return self._error(405, "MethodNotAllowed", f"{self.command} on a bucket")
+
+        if "uploadId" in query:
+            return self._multipart(bucket, key, query, body)
+        if self.command == "POST" and "uploads" in query:
+            upload_id = stub.create_upload(bucket, key)
+            return self._send(200, (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket>"
+                                    f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                                    f"</InitiateMultipartUploadResult>").encode())
+        if self.command == "PUT":
+            etag = stub.put_object(bucket, key, body)
+            return self._send(200, headers={"ETag": etag})
+        if self.command == "DELETE":
+            with stub.lock:
+                stub.buckets[bucket].pop(key, None)
+            return self._send(204)
+        if self.command in ("GET", "HEAD"):
+            return self._get(bucket, key)
+        self._error(405, "MethodNotAllowed", self.command)
+
+    def _get(self, bucket: str, key: str) -> None:
+        with self.server.stub.lock:
+            obj = self.server.stub.buckets[bucket].get(key)
+        if obj is None:
+            return self._error(404, "NoSuchKey", f"The specified key does not exist: {key}")
+        data = obj["data"]
+        headers = {"ETag": obj["etag"], "Last-Modified": formatdate(obj["modified"], usegmt=True), "Accept-Ranges": "bytes"}
+        range_header = self.headers.get("Range")
+        if not range_header:
+            return self._send(200, data, headers, "application/octet-stream")
+        start, _, end = range_header[len("bytes="):].partition("-")
+        start = int(start)
+        end = min(int(end) if end else len(data) - 1, len(data) - 1)
+        if start >= len(data):
+            return self._error(416, "InvalidRange", "The requested range is not satisfiable")
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        self._send(206, data[start:end + 1], headers, "application/octet-stream")
+
+    def _list(self, bucket: str, query: Dict[str, str]) -> None:
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter")
+        start_after = query.get("continuation-token", "")
+        with self.server.stub.lock:
+            objects = sorted(self.server.stub.buckets[bucket].items())
+        contents = []
+        prefixes = set()
+        token = None
+        for key, obj in objects:
+            if not key.startswith(prefix) or key <= start_after:
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter)[0] + delimiter)
+                continue
+            if len(contents) == LIST_PAGE_SIZE:
+                token = contents[-1][0]
+                break
+            contents.append((key, obj))
+        xml = ["<ListBucketResult xmlns=\"http://s3.amazonaws.com/doc/2006-03-01/\">",
+               f"<Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(contents)}</KeyCount>",
+               f"<IsTruncated>{'true' if token else 'false'}</IsTruncated>"]
+        for key, obj in contents:
+            modified = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(obj["modified"]))
+            xml.append(f"<Contents><Key>{escape(key)}</Key><LastModified>{modified}</LastModified>"
+                       f"<ETag>{escape(obj['etag'])}</ETag><Size>{len(obj['data'])}</Size></Contents>")
+        xml.extend(f"<CommonPrefixes><Prefix>{escape(p)}</Prefix></CommonPrefixes>" for p in sorted(prefixes))
+        if token:
+            xml.append(f"<NextContinuationToken>{escape(token)}</NextContinuationToken>")
+        xml.append("</ListBucketResult>")
+        self._send(200, "".join(xml).encode())
+
+    def _multipart(self, bucket: str, key: str, query: Dict[str, str], body: bytes) -> None:
+        stub = self.server.stub
+        upload_id = query["uploadId"]
+        with stub.lock:
+            upload = stub.uploads.get(upload_id)
+        if upload is None or upload["bucket"] != bucket or upload["key"] != key:
+            return self._error(404, "NoSuchUpload", "The specified upload does not exist")
+
+        if self.command == "PUT":
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            with stub.lock:
+                upload["parts"][int(query["partNumber"])] = (etag, body)
+            return self._send(200, headers={"ETag": etag})
+        if self.command == "DELETE":
+            with stub.lock:
+                stub.uploads.pop(upload_id, None)
+            return self._send(204)
+        if self.command != "POST":
+            return self._error(405, "MethodNotAllowed", self.command)
+
+        requested = []
+        for part in ElementTree.fromstring(body):
+            number = part.findtext("PartNumber")
+            etag = part.findtext("ETag")
+            requested.append((int(number), etag))
+        with stub.lock:
+            parts = upload["parts"]
+            if not requested or [number for number, _ in requested] != sorted({number for number, _ in requested}):
+                return self._error(400, "InvalidPartOrder", "Parts must be listed in ascending order")
+            for index, (number, etag) in enumerate(requested):
+                if number not in parts or parts[number][0] != etag:
+                    return self._error(400, "InvalidPart", f"Part {number} was not uploaded with ETag {etag}")
+                if index < len(requested) - 1 and len(parts[number][1]) < stub.min_part_size:
+                    return self._error(400, "EntityTooSmall", f"Part {number} is smaller than the minimum")
+            data = b"".join(parts[number][1] for number, _ in requested)
+            digest = hashlib.md5(b"".join(bytes.fromhex(parts[n][0].strip('"')) for n, _ in requested)).hexdigest()
+            etag = f'"{digest}-{len(requested)}"'
+            stub.buckets[bucket][key] = {"data": data, "etag": etag, "modified": time.time()}
+            stub.uploads.pop(upload_id, None)
+            stub.completed_uploads.append({"key": key, "parts": len(requested), "size": len(data)})
+        self._send(200, (f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                         f"<ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>").encode())
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_HEAD(self) -> None:
+        self._dispatch()
+
+    def do_PUT(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def do_DELETE(self) -> None:
+        self._dispatch()
+
+
+class _S3Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "S3Stub"
+
+
+class S3Stub:
+    """In-memory S3 stand-in; use start()/stop() or as a context manager"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        buckets: Tuple[str, ...] = (),
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        min_part_size: int = MIN_PART_SIZE
+    ):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.min_part_size = min_part_size
+        self.buckets: Dict[str, Dict[str, Dict[str, Any]]] = {bucket: {} for bucket in buckets}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        # Completed multipart uploads, for tests
+        self.completed_uploads: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self._upload_ids = itertools.count(1)
+
+        self.server = _S3Server((host, port), _S3Handler)
+        self.server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "S3Stub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "S3Stub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def put_object(self, bucket: str, key: str, data: bytes) -> str:
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.lock:
+            self.buckets[bucket][key] = {"data": data, "etag": etag, "modified": time.time()}
+        return etag
+
+    def create_upload(self, bucket: str, key: str) -> str:
+        with self.lock:
+            upload_id = f"upload-{next(self._upload_ids)}"
+            self.uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {}}
+        return upload_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process stand-in for an S3-compatible object store")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=9000, help="Port to listen on")
+    parser.add_argument("--bucket", action="append", default=[], help="Bucket to create at start (repeatable)")
+    parser.add_argument("--access-key", help="Require requests signed with this access key")
+    parser.add_argument("--secret-key", help="Secret key of --access-key")
+    args = parser.parse_args()
+    if bool(args.access_key) != bool(args.secret_key):
+        parser.error("--access-key and --secret-key must be given together")
+
+    stub = S3Stub(
+        host=args.host,
+        port=args.port,
+        buckets=tuple(args.bucket),
+        access_key=args.access_key,
+        secret_key=args.secret_key
+    )
+    print(f"S3 stub listening on {stub.url} (buckets: {', '.join(args.bucket) or 'none'})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
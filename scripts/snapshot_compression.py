@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Streaming compression for snapshot files
+
+Snapshots are compressed while they are downloaded and decompressed while
+they are uploaded, so the full file is never held in memory.
+
+Two formats are supported:
+
+    gzip  Standard library only. The stream is cut into blocks that are
+          compressed as separate gzip members on a thread pool (zlib releases
+          the GIL), like pigz. Concatenated members are a valid gzip file.
+    zstd  Needs the optional `zstandard` package (pip install zstandard),
+          which does its own multithreaded compression.
+"""
+
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+GZIP_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def check_compression(method: str) -> None:
+    """Raise ValueError if the compression method cannot be used here"""
+    if method not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unknown compression method '{method}'")
+    if method == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """Return the compression method for a file name, or None if uncompressed"""
+    for method, extension in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(extension):
+            return method
+    return None
+
+
+def strip_compression_extension(path: str) -> str:
+    method = detect_compression(path)
+    return path[:-len(COMPRESSION_EXTENSIONS[method])] if method else path
+
+
+class CompressingWriter:
+    """
+    File-like sink that compresses everything written to it into fileobj.
+
+    tell() returns the number of uncompressed bytes written, so the object can
+    be used wherever the download code expects a file.
+    """
+
+    def __init__(self, fileobj, method: str = "gzip", level: Optional[int] = None, threads: int = 1):
+        check_compression(method)
+        self.fileobj = fileobj
+        self.method = method
+        self.level = DEFAULT_LEVELS[method] if level is None else level
+        self.threads = max(1, threads)
+        self._size = 0
+
+        if method == "zstd":
+            # zstandard treats threads=0 as single-threaded
+            compressor = zstandard.ZstdCompressor(
+                level=self.level,
+                threads=self.threads if self.threads > 1 else 0
+            )
+            self._zstd = compressor.stream_writer(fileobj)
+        else:
+            self._buffer = bytearray()
+            self._pending = []
+            self._executor = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+
+    def write(self, data: bytes) -> int:
+        self._size += len(data)
+        if self.method == "zstd":
+            self._zstd.write(data)
+            return len(data)
+
+        self._buffer += data
+        while len(self._buffer) >= GZIP_BLOCK_SIZE:
+            self._submit_block(bytes(self._buffer[:GZIP_BLOCK_SIZE]))
+            del self._buffer[:GZIP_BLOCK_SIZE]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._size
+
+    def _submit_block(self, block: bytes) -> None:
+        if not self._executor:
+            self.fileobj.write(gzip.compress(block, compresslevel=self.level))
+            return
+
+        self._pending.append(self._executor.submit(gzip.compress, block, self.level))
+        # Bound memory to a couple of blocks per thread; blocks are written in order
+        while len(self._pending) > self.threads * 2:
+            self.fileobj.write(self._pending.pop(0).result())
+
+    def close(self) -> None:
+        """Finish the compressed stream (fileobj itself is left open)"""
+        if self.method == "zstd":
+            self._zstd.flush(zstandard.FLUSH_FRAME)
+            return
+
+        if self._buffer or not self._size:
+            self._submit_block(bytes(self._buffer))
+            self._buffer = bytearray()
+        for future in self._pending:
+            self.fileobj.write(future.result())
+        self._pending = []
+        if self._executor:
+            self._executor.shutdown()
+
+
+def open_decompressed(fileobj, method: str):
+    """Wrap a compressed file object in a reader that returns uncompressed data"""
+    check_compression(method)
+    if method == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    return gzip.GzipFile(fileobj=fileobj, mode="rb")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Per-phase metrics for the Qdrant snapshot tools
+
+The backup and restore tools time each phase of their work (server-side
+snapshot creation, download, upload, recover, export, import) per collection
+and record the bytes moved and the requests retried in it. A collection that
+change detection found unchanged has an "unchanged" phase instead, with the
+bytes its backup would have moved as avoided_bytes. A MetricsRecorder
+collects these and can write them:
+
+    JSON lines    one event per phase and per collection as it happens, and a
+                  summary event at the end (appended, so runs accumulate)
+    Prometheus    a text exposition file, written atomically so that the
+                  node_exporter textfile collector never reads half a file,
+                  and optionally pushed to a Pushgateway
+    summary JSON  one document describing the whole run, for scripts that
+                  call the tools
+
+Phases are recorded in memory even when no output is configured, so the
+summary is always available to the caller.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+import requests
+
+from qdrant_http import thread_retry_count
+
+
+METRIC_PREFIX = "qdrant"
+
+
+class Phase:
+    """Measurements of one phase; the code being timed may set bytes, success and extra values"""
+
+    def __init__(self, collection: str, name: str, shard: Optional[int] = None):
+        self.collection = collection
+        self.name = name
+        self.shard = shard
+        self.bytes: Optional[int] = None
+        self.success = True
+        self.extra: Dict[str, Any] = {}
+        self.duration = 0.0
+        self.retries = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"collection": self.collection, "phase": self.name}
+        if self.shard is not None:
+            data["shard"] = self.shard
+        data.update({"duration": round(self.duration, 6), "success": self.success, "retries": self.retries})
+        if self.bytes is not None:
+            data["bytes"] = self.bytes
+            data["throughput"] = round(self.bytes / self.duration, 1) if self.duration > 0 else None
+        data.update(self.extra)
+        return data
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in labels.items() if value is not None]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRecorder:
+    def __init__(
+        self,
+        tool: str,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        pushgateway_url: Optional[str] = None,
+        summary_path: Optional[str] = None
+    ):
+        """tool is 'backup' or 'restore' and becomes part of every metric name"""
+        self.tool = tool
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.pushgateway_url = pushgateway_url.rstrip("/") if pushgateway_url else None
+        self.summary_path = summary_path
+        self.started = time.time()
+
+        # Latest phase per (collection, phase, shard) and latest result per collection
+        self.phases: Dict[Tuple[str, str, Optional[int]], Phase] = {}
+        self.collections: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Append one JSON line (caller holds _lock)"""
+        if not self.jsonl_path:
+            return
+        line = {"time": datetime.now().isoformat(timespec="milliseconds"), "tool": self.tool, "event": event}
+        line.update(data)
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(line) + "\n")
+
+    @contextmanager
+    def phase(self, collection: str, name: str, shard: Optional[int] = None) -> Iterator[Phase]:
+        """
+        Time a phase of a collection's backup or restore.
+
+        Retries are those of requests made by the current thread while the
+        phase runs. An exception marks the phase as failed and is re-raised.
+        """
+        phase = Phase(collection, name, shard)
+        retries = thread_retry_count()
+        start_time = time.perf_counter()
+        try:
+            yield phase
+        except BaseException:
+            phase.success = False
+            raise
+        finally:
+            phase.duration = time.perf_counter() - start_time
+            phase.retries = thread_retry_count() - retries
+            with self._lock:
+                self.phases[(collection, name, shard)] = phase
+                self._emit("phase", phase.to_dict())
+
+    def start_collection(self, collection: str) -> None:
+        """Forget the phases of a collection's earlier run, so its result only covers the new one"""
+        with self._lock:
+            for key in [key for key in self.phases if key[0] == collection]:
+                del self.phases[key]
+
+    def collection_result(self, collection: str, success: bool, elapsed: Optional[float] = None) -> None:
+        """Record the outcome of a collection (after all its phases)"""
+        with self._lock:
+            phases = [phase for key, phase in self.phases.items() if key[0] == collection]
+            unchanged = [phase for phase in phases if phase.name == "unchanged"]
+            result = {
+                "success": success,
+                "elapsed": round(elapsed, 6) if elapsed is not None else None,
+                "bytes": sum(phase.bytes or 0 for phase in phases if phase.name in ("download", "upload", "export", "import")),
+                "retries": sum(phase.retries for phase in phases),
+                "unchanged": bool(unchanged),
+                "avoided_bytes": sum(phase.extra.get("avoided_bytes", 0) for phase in unchanged),
+                "finished": round(time.time(), 3),
+            }
+            self.collections[collection] = result
+            self._emit("collection", dict(collection=collection, **result))
+
+    def summary(self, elapsed: Optional[float] = None) -> Dict[str, Any]:
+        """Machine-readable description of the run so far"""
+        with self._lock:
+            collections = {}
+            for name, result in self.collections.items():
+                collections[name] = dict(result, phases=[
+                    phase.to_dict() for key, phase in self.phases.items() if key[0] == name
+                ])
+            failed = sorted(name for name, result in self.collections.items() if not result["success"])
+        return {
+            "tool": self.tool,
+            "success": not failed,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "elapsed": round(elapsed if elapsed is not None else time.time() - self.started, 3),
+            "collections_total": len(collections),
+            "collections_failed": failed,
+            "bytes": sum(result["bytes"] for result in collections.values()),
+            "retries": sum(result["retries"] for result in collections.values()),
+            "collections_unchanged": sum(1 for result in collections.values() if result.get("unchanged")),
+            "bytes_avoided": sum(result.get("avoided_bytes", 0) for result in collections.values()),
+            "collections": collections,
+        }
+
+    def prometheus_text(self, elapsed: Optional[float] = None) -> str:
+        """Current metrics in the Prometheus text exposition format"""
+        prefix = f"{METRIC_PREFIX}_{self.tool}"
+        metrics: Dict[str, Tuple[str, List[str]]] = {}
+
+        def add(name: str, help_text: str, labels: str, value: Any) -> None:
+            metrics.setdefault(f"{prefix}_{name}", (help_text, []))[1].append(f"{prefix}_{name}{labels} {value}")
+
+        with self._lock:
+            for phase in self.phases.values():
+                labels = _labels(collection=phase.collection, phase=phase.name, shard=phase.shard)
+                add("phase_duration_seconds", "Duration of the last run of a phase", labels, f"{phase.duration:.6f}")
+                add("phase_success", "Whether the last run of a phase succeeded", labels, int(phase.success))
+                add("phase_retries", "Requests retried during the last run of a phase", labels, phase.retries)
+                if phase.bytes is not None:
+                    add("phase_bytes", "Bytes moved by the last run of a phase", labels, phase.bytes)
+                    if phase.duration > 0:
+                        add("phase_throughput_bytes_per_second", "Throughput of the last run of a phase",
+                            labels, f"{phase.bytes / phase.duration:.1f}")
+
+            for name, result in self.collections.items():
+                labels = _labels(collection=name)
+                add("collection_success", "Whether the last run for a collection succeeded", labels, int(result["success"]))
+                add("collection_bytes", "Bytes moved for a collection in its last run", labels, result["bytes"])
+                add("collection_retries", "Requests retried for a collection in its last run", labels, result["retries"])
+                add("collection_unchanged", "Whether the last run found a collection unchanged and reused its backup",
+                    labels, int(result["unchanged"]))
+                add("collection_last_run_timestamp_seconds", "When the last run for a collection finished",
+                    labels, f"{result['finished']:.0f}")
+                if result["elapsed"] is not None:
+                    add("collection_duration_seconds", "Duration of the last run for a collection",
+                        labels, f"{result['elapsed']:.6f}")
+
+            failed = sum(1 for result in self.collections.values() if not result["success"])
+            add("collections", "Collections processed", "", len(self.collections))
+            add("collections_failed", "Collections that failed", "", failed)
+            add("collections_unchanged", "Collections whose last backup was reused", "",
+                sum(1 for result in self.collections.values() if result["unchanged"]))
+            add("bytes_avoided", "Bytes not transferred because collections were unchanged", "",
+                sum(result["avoided_bytes"] for result in self.collections.values()))
+            add("run_success", "Whether every collection succeeded", "", int(not failed))
+            add("run_timestamp_seconds", "When the metrics were written", "", f"{time.time():.0f}")
+            if elapsed is not None:
+                add("run_duration_seconds", "Duration of the whole run", "", f"{elapsed:.3f}")
+
+        lines = []
+        for name, (help_text, samples) in metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, elapsed: Optional[float] = None) -> None:
+        """Write the Prometheus textfile and push to the Pushgateway (if configured)"""
+        if not (self.prometheus_path or self.pushgateway_url):
+            return
+        text = self.prometheus_text(elapsed)
+
+        if self.prometheus_path:
+            temp_path = self.prometheus_path + ".tmp"
+            with open(temp_path, "w") as f:
+                f.write(text)
+            os.replace(temp_path, self.prometheus_path)
+
+        if self.pushgateway_url:
+            url = f"{self.pushgateway_url}/metrics/job/{METRIC_PREFIX}_{self.tool}/instance/{socket.gethostname()}"
+            try:
+                response = requests.put(url, data=text.encode(), headers={"Content-Type": "text/plain"}, timeout=10)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"Warning: could not push metrics to {self.pushgateway_url}: {e}")
+
+    def finish(self, elapsed: Optional[float] = None) -> Dict[str, Any]:
+        """Write every configured output for a finished run and return the summary"""
+        summary = self.summary(elapsed)
+        with self._lock:
+            self._emit("summary", {key: value for key, value in summary.items() if key not in ("tool", "collections")})
+        self.write_prometheus(elapsed)
+
+        if self.summary_path:
+            temp_path = self.summary_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(summary, f, indent=2)
+            os.replace(temp_path, self.summary_path)
+        return summary
+
+
+def add_metrics_arguments(parser) -> None:
+    """Add the metrics output options shared by the snapshot tools"""
+    parser.add_argument("--metrics-jsonl", metavar="PATH",
+                        help="Append per-phase timings and a run summary to this file as JSON lines")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write metrics to this Prometheus textfile (node_exporter textfile collector)")
+    parser.add_argument("--pushgateway", metavar="URL", help="Push the metrics to this Prometheus Pushgateway")
+    parser.add_argument("--summary-json", metavar="PATH", help="Write a machine-readable summary of the run to this file")
+
+
+def metrics_from_args(tool: str, args) -> MetricsRecorder:
+    """MetricsRecorder configured from the add_metrics_arguments options"""
+    return MetricsRecorder(
+        tool,
+        jsonl_path=args.metrics_jsonl,
+        prometheus_path=args.metrics_prom,
+        pushgateway_url=args.pushgateway,
+        summary_path=args.summary_json
+    )
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Deduplicated snapshot repository for the Qdrant snapshot tools
+
+Instead of keeping a full .snapshot file per backup run, snapshots are split
+into variable-size chunks with content-defined chunking and every unique
+chunk is stored once, named by its SHA-256 hash. Each backup is an index
+file listing the chunks it is made of, so a nightly backup of a mostly
+unchanged collection only writes the chunks that changed.
+
+Repository layout:
+
+    <repository>/chunks/<aa>/<sha256>                    chunk data
+    <repository>/indexes/<collection>/<snapshot>.json   one index per backup
+    <repository>/lock                                    see below
+
+Chunk boundaries are placed where a short byte pattern occurs in the data,
+so an insertion or deletion only changes the chunks around it. The pattern
+is matched with a compiled regular expression, which keeps chunking at C
+speed without any extra dependencies.
+
+A backup's chunks are not referenced by any index until it is committed, so
+prune() must not run while backups are being written. Writers hold a shared
+flock on the lock file and prune() takes it exclusively; this also covers
+writers in other processes (e.g. a manual run next to the scheduler).
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import random
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+
+DEFAULT_MIN_CHUNK_SIZE = 256 * 1024
+DEFAULT_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Each position matches with probability (16/256) ** 5 = 2 ** -20, which
+# gives an average chunk size of about 1 MiB on top of the minimum size
+ANCHOR_CLASSES = 5
+ANCHOR_CLASS_SIZE = 16
+ANCHOR_SEED = 0x51D5
+LOCK_FILENAME = "lock"
+
+
+def _anchor_pattern() -> "re.Pattern":
+    """Build the boundary pattern; fixed seed so boundaries are stable across runs"""
+    rnd = random.Random(ANCHOR_SEED)
+    classes = []
+    for _ in range(ANCHOR_CLASSES):
+        values = sorted(rnd.sample(range(256), ANCHOR_CLASS_SIZE))
+        classes.append(b"[" + b"".join(re.escape(bytes([v])) for v in values) + b"]")
+    return re.compile(b"".join(classes))
+
+
+ANCHOR_PATTERN = _anchor_pattern()
+
+
+class RepositoryError(Exception):
+    """Raised when a backup in the repository is missing or corrupt"""
+
+
+class ChunkWriter:
+    """
+    File-like sink that splits written data into chunks and stores them.
+
+    Only the current unfinished chunk is kept in memory. commit() stores the
+    last chunk and writes the backup index; if it is never called no index is
+    written and the backup does not exist (stored chunks are left for prune()).
+    The repository is locked against prune() until commit() or close().
+    """
+
+    def __init__(self, repository: "SnapshotRepository", collection_name: str, snapshot_name: str):
+        self._lock = repository.lock(exclusive=False)
+        self.repository = repository
+        self.collection_name = collection_name
+        self.snapshot_name = snapshot_name
+        self.chunks: List[List[Any]] = []
+        self.new_chunks = 0
+        self.new_bytes = 0
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._size = 0
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self._size += len(data)
+        self._cut_chunks()
+        return len(data)
+
+    def tell(self) -> int:
+        return self._size
+
+    def _cut_chunks(self) -> None:
+        min_size = self.repository.min_chunk_size
+        max_size = self.repository.max_chunk_size
+
+        while len(self._buffer) >= min_size:
+            # Skip what was already searched, minus room for a pattern that
+            # straddles the previous end of the buffer
+            start = max(min_size, self._scanned - ANCHOR_CLASSES + 1)
+            match = ANCHOR_PATTERN.search(self._buffer, start, max_size)
+            if match:
+                end = match.end()
+            elif len(self._buffer) >= max_size:
+                end = max_size
+            else:
+                # Boundary may still appear once more data arrives
+                self._scanned = len(self._buffer)
+                return
+            self._store(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+            self._scanned = 0
+
+    def _store(self, chunk: bytes) -> None:
+        digest = hashlib.sha256(chunk).hexdigest()
+        if self.repository.put_chunk(digest, chunk):
+            self.new_chunks += 1
+            self.new_bytes += len(chunk)
+        self.chunks.append([digest, len(chunk)])
+
+    def commit(self, checksum: Optional[str] = None) -> Dict[str, Any]:
+        """Store the remaining data and write the backup index"""
+        if self._buffer:
+            self._store(bytes(self._buffer))
+            self._buffer = bytearray()
+
+        index = {
+            "collection": self.collection_name,
+            "snapshot": self.snapshot_name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "size": self._size,
+            "checksum": checksum,
+            "chunks": self.chunks,
+        }
+        self.repository.write_index(index)
+        self.close()
+        return index
+
+    def close(self) -> None:
+        """Release the repository lock; an uncommitted backup is abandoned"""
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class BackupReader:
+    """Read-only file-like view that reassembles a backup from its chunks"""
+
+    def __init__(self, repository: "SnapshotRepository", index: Dict[str, Any]):
+        self.repository = repository
+        self.index = index
+        self.size = index["size"]
+        self._chunks = iter(index["chunks"])
+        self._current = b""
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.repository.max_chunk_size
+
+        while self._pos >= len(self._current):
+            entry = next(self._chunks, None)
+            if entry is None:
+                return b""
+            self._current = self.repository.get_chunk(entry[0])
+            self._pos = 0
+
+        data = self._current[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def close(self) -> None:
+        self._current = b""
+
+    def __enter__(self) -> "BackupReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SnapshotRepository:
+    """Content-addressed store of deduplicated snapshot chunks"""
+
+    def __init__(
+        self,
+        path: str,
+        min_chunk_size: int = DEFAULT_MIN_CHUNK_SIZE,
+        max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE
+    ):
+        self.path = path
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.chunks_dir = os.path.join(path, "chunks")
+        self.indexes_dir = os.path.join(path, "indexes")
+
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.indexes_dir, exist_ok=True)
+
+    def lock(self, exclusive: bool, blocking: bool = True):
+        """
+        Take the repository lock; returns the open lock file (close it to
+        release) or None if blocking is False and the lock is held elsewhere.
+        """
+        f = open(os.path.join(self.path, LOCK_FILENAME), "a")
+        try:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _index_path(self, collection_name: str, snapshot_name: str) -> str:
+        return os.path.join(self.indexes_dir, collection_name, f"{snapshot_name}.json")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp.{os.getpid()}.{id(data)}"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def put_chunk(self, digest: str, data: bytes) -> bool:
+        """Store a chunk unless it already exists; returns True if it was new"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return False
+        self._write_atomic(path, data)
+        return True
+
+    def get_chunk(self, digest: str) -> bytes:
+        """Read a chunk and check it against its hash"""
+        try:
+            with open(self._chunk_path(digest), "rb") as f:
+                data = f.read()
+        except IOError as e:
+            raise RepositoryError(f"Missing chunk {digest}: {e}")
+
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise RepositoryError(f"Corrupt chunk {digest}")
+        return data
+
+    def writer(self, collection_name: str, snapshot_name: str) -> ChunkWriter:
+        """Start a new backup; write the snapshot to the returned object"""
+        return ChunkWriter(self, collection_name, snapshot_name)
+
+    def write_index(self, index: Dict[str, Any]) -> None:
+        path = self._index_path(index["collection"], index["snapshot"])
+        self._write_atomic(path, json.dumps(index).encode())
+
+    def list_backups(self, collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List backups (without chunk lists), oldest first"""
+        collections = [collection_name] if collection_name else sorted(os.listdir(self.indexes_dir))
+        backups = []
+
+        for collection in collections:
+            directory = os.path.join(self.indexes_dir, collection)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if not filename.endswith(".json"):
+                    continue
+                index = self.load_index(collection, filename[:-len(".json")])
+                index.pop("chunks", None)
+                backups.append(index)
+
+        return sorted(backups, key=lambda b: (b["created"], b["snapshot"]))
+
+    def load_index(self, collection_name: str, snapshot_name: str) -> Dict[str, Any]:
+        try:
+            with open(self._index_path(collection_name, snapshot_name)) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            raise RepositoryError(f"Cannot read backup '{collection_name}/{snapshot_name}': {e}")
+
+    def find_backup(self, name: str) -> Dict[str, Any]:
+        """Find a backup by '<collection>/<snapshot>' or by snapshot name alone"""
+        if "/" in name:
+            collection_name, snapshot_name = name.split("/", 1)
+            return self.load_index(collection_name, snapshot_name)
+
+        for backup in reversed(self.list_backups()):
+            if backup["snapshot"] == name:
+                return self.load_index(backup["collection"], name)
+        raise RepositoryError(f"Backup '{name}' not found in repository '{self.path}'")
+
+    def open_backup(self, index: Dict[str, Any]) -> BackupReader:
+        """Open a backup for reading as one continuous snapshot stream"""
+        return BackupReader(self, index)
+
+    def remove_backup(self, collection_name: str, snapshot_name: str) -> None:
+        """Delete a backup index; run prune() afterwards to free its chunks"""
+        os.remove(self._index_path(collection_name, snapshot_name))
+
+    def prune(self, blocking: bool = True) -> Optional[Dict[str, int]]:
+        """
+        Delete chunks that no backup refers to.
+
+        Waits until no backup is being written; with blocking=False returns
+        None instead if one is.
+        """
+        lock = self.lock(exclusive=True, blocking=blocking)
+        if lock is None:
+            return None
+        with lock:
+            referenced = set()
+            for backup in self.list_backups():
+                index = self.load_index(backup["collection"], backup["snapshot"])
+                referenced.update(digest for digest, _ in index["chunks"])
+
+            removed = 0
+            freed = 0
+            for root, _, files in os.walk(self.chunks_dir):
+                for filename in files:
+                    if filename in referenced:
+                        continue
+                    path = os.path.join(root, filename)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+
+        return {"removed_chunks": removed, "freed_bytes": freed}
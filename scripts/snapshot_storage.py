@@ -0,0 +1,958 @@
+#!/usr/bin/env python3
+"""
+Storage backends for snapshot backups
+
+The backup and restore tools read and write backup files through a
+SnapshotStorage. A backup therefore goes straight to where it is kept,
+with no second copy step. There are three backends:
+
+    local  a directory (a plain path or file://)
+    s3     an S3-compatible object store (s3://bucket/prefix): AWS S3,
+           MinIO, Ceph RGW, ... Files are written as multipart uploads
+           whose parts are sent in parallel while the data arrives, and
+           read with parallel ranged GETs. Requests are signed with AWS
+           Signature Version 4 here, so only `requests` is needed.
+    sftp   a directory on an SSH server (sftp://user@host[:port]/path).
+           Needs the optional `paramiko` package (pip install paramiko).
+           SFTP has no multipart upload; reads and writes are pipelined
+           instead, so many requests are in flight on one connection.
+
+Files are streamed and never staged on local disk. An S3 writer holds at
+most `jobs` parts in flight plus the one being filled; an S3 reader
+prefetches at most `jobs` ranges. An SFTP reader has at most as many
+32 KiB read requests in flight or answered but unread as fit into `jobs`
+parts.
+
+A file is addressed by its key, a '/'-separated path relative to the root
+of the storage. A writer only makes the file visible on commit(), so a
+failed transfer never looks like a finished backup.
+
+S3 credentials come from the standard environment variables
+AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY and AWS_SESSION_TOKEN. Without
+them, requests are sent unsigned. The region comes from --s3-region,
+AWS_REGION or AWS_DEFAULT_REGION, and the endpoint of a non-AWS store from
+--s3-endpoint or AWS_ENDPOINT_URL. Without an SFTP key, the password comes
+from SFTP_PASSWORD.
+"""
+
+import hashlib
+import hmac
+import io
+import os
+import posixpath
+import random
+import shutil
+import stat
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+from qdrant_http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES, DEFAULT_MAX_BACKOFF
+
+
+MB = 1024 * 1024
+DEFAULT_PART_SIZE = 16 * MB
+# S3 rejects smaller parts (except the last one) and more than 10000 parts
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+# The size of a file being written is not known in advance; parts double in
+# size every this many parts, so 10000 parts hold about 1 TB at 16 MiB
+PART_SIZE_DOUBLING = 2000
+DEFAULT_TRANSFER_JOBS = 4
+PART_SUFFIX = ".part"
+
+S3_XMLNS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+REMOTE_SCHEMES = ("s3", "sftp")
+
+
+class StorageError(IOError):
+    """Raised when a storage operation fails"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def is_remote(location: str) -> bool:
+    """Whether a location is an s3:// or sftp:// URL rather than a local path"""
+    return urlsplit(location).scheme in REMOTE_SCHEMES
+
+
+class SnapshotStorage:
+    """Interface of the storage backends"""
+
+    remote = True
+    # Location of the root, e.g. 's3://bucket/prefix'
+    url = ""
+
+    def location(self, key: str) -> str:
+        """Location (URL or path) of a key, as shown to users and kept in state files"""
+        return f"{self.url.rstrip('/')}/{key}" if key else self.url
+
+    def key(self, location: str) -> str:
+        """Key of a location below the root of this storage"""
+        root = self.url.rstrip("/")
+        if location.rstrip("/") == root:
+            return ""
+        if not location.startswith(root + "/"):
+            raise StorageError(f"'{location}' is not in '{self.url}'")
+        return location[len(root) + 1:]
+
+    def open_writer(self, key: str) -> "StorageWriter":
+        raise NotImplementedError
+
+    def open_reader(self, key: str) -> "StorageReader":
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Size of a file, or None if it does not exist"""
+        raise NotImplementedError
+
+    def list(self, directory: str = "", recursive: bool = False) -> List[Dict[str, Any]]:
+        """Files below a directory key as {"key", "size", "modified"}, without unfinished writes"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Delete a file, or a directory with everything in it; missing keys are ignored"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None or bool(self.list(key))
+
+    def read_bytes(self, key: str) -> bytes:
+        with self.open_reader(key) as reader:
+            return reader.read()
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        writer = self.open_writer(key)
+        try:
+            writer.write(data)
+            writer.commit()
+        finally:
+            writer.abort()
+
+    def close(self) -> None:
+        pass
+
+
+class StorageWriter:
+    """
+    Write-only file in a storage.
+
+    Data written is only visible under the key after commit(); abort()
+    discards it and does nothing after a commit, so it can always be called
+    in a finally block.
+    """
+
+    def __init__(self):
+        self._size = 0
+        self._done = False
+
+    def write(self, data: bytes) -> int:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def tell(self) -> int:
+        """Bytes written so far"""
+        return self._size
+
+    def commit(self) -> int:
+        """Finish the file; returns its size"""
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        raise NotImplementedError
+
+
+class StorageReader(io.RawIOBase):
+    """Read-only file in a storage; size is known when it is opened"""
+
+    size = 0
+
+    def readable(self) -> bool:
+        return True
+
+
+# Local directory
+
+
+class _LocalWriter(StorageWriter):
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path + PART_SUFFIX, "wb")
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self._size += len(data)
+        return len(data)
+
+    def commit(self) -> int:
+        self._file.close()
+        os.replace(self.path + PART_SUFFIX, self.path)
+        self._done = True
+        return self._size
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        if os.path.exists(self.path + PART_SUFFIX):
+            os.remove(self.path + PART_SUFFIX)
+
+
+class _LocalReader(StorageReader):
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class LocalStorage(SnapshotStorage):
+    """A directory on the local file system"""
+
+    remote = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self.url = path
+
+    def location(self, key: str) -> str:
+        return os.path.join(self.path, *key.split("/")) if key else self.path
+
+    def key(self, location: str) -> str:
+        relative = os.path.relpath(location, self.path)
+        if relative == os.curdir:
+            return ""
+        if relative.startswith(os.pardir):
+            raise StorageError(f"'{location}' is not in '{self.path}'")
+        return relative.replace(os.sep, "/")
+
+    def open_writer(self, key: str) -> StorageWriter:
+        return _LocalWriter(self.location(key))
+
+    def open_reader(self, key: str) -> StorageReader:
+        return _LocalReader(self.location(key))
+
+    def size(self, key: str) -> Optional[int]:
+        path = self.location(key)
+        return os.path.getsize(path) if os.path.isfile(path) else None
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.location(key))
+
+    def list(self, directory: str = "", recursive: bool = False) -> List[Dict[str, Any]]:
+        root = self.location(directory)
+        if not os.path.isdir(root):
+            return []
+        files = []
+        for current, dirs, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(PART_SUFFIX):
+                    continue
+                path = os.path.join(current, filename)
+                info = os.stat(path)
+                files.append({"key": self.key(path), "size": info.st_size, "modified": info.st_mtime})
+            if not recursive:
+                break
+        return files
+
+    def delete(self, key: str) -> None:
+        path = self.location(key)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+# S3-compatible object store
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _signing_key(secret_key: str, date: str, region: str, service: str = "s3") -> bytes:
+    key = f"AWS4{secret_key}".encode()
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return key
+
+
+def sign_v4(
+    method: str,
+    host: str,
+    path: str,
+    query: str,
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    amz_date: str,
+    extra_headers: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Headers of an AWS Signature Version 4 signed S3 request.
+
+    path must already be URI-encoded and query be the canonical query string
+    (sorted, encoded), exactly as they are sent.
+    """
+    headers = {"host": host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+    headers.update({name.lower(): value for name, value in (extra_headers or {}).items()})
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join([
+        method,
+        path,
+        query,
+        "".join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers)),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+    ])
+    signature = hmac.new(_signing_key(secret_key, amz_date[:8], region), string_to_sign.encode(), hashlib.sha256).hexdigest()
+    headers["authorization"] = (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+                                f"SignedHeaders={signed_headers}, Signature={signature}")
+    return headers
+
+
+def _s3_error(text: str) -> str:
+    """Code and message of an S3 XML error response"""
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError:
+        return text[:200]
+    code = root.findtext("Code") or root.findtext(f"{S3_XMLNS}Code") or ""
+    message = root.findtext("Message") or root.findtext(f"{S3_XMLNS}Message") or ""
+    return f"{code}: {message}" if code else text[:200]
+
+
+def _xml_find(element, name: str):
+    """Child element with or without the S3 namespace"""
+    found = element.find(f"{S3_XMLNS}{name}")
+    return found if found is not None else element.find(name)
+
+
+def _xml_findall(element, name: str) -> list:
+    return element.findall(f"{S3_XMLNS}{name}") or element.findall(name)
+
+
+class _S3Writer(StorageWriter):
+    """Multipart upload whose parts are sent on a thread pool while data is written"""
+
+    def __init__(self, storage: "S3Storage", key: str):
+        super().__init__()
+        self.storage = storage
+        self.key = key
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Any] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Parts handed to the pool but not sent yet; bounds the memory used
+        self._slots = threading.Semaphore(storage.jobs)
+
+    def _part_size(self) -> int:
+        return self.storage.part_size * 2 ** (len(self._parts) // PART_SIZE_DOUBLING)
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self._size += len(data)
+        while len(self._buffer) >= self._part_size():
+            part_size = self._part_size()
+            self._submit(bytes(self._buffer[:part_size]))
+            del self._buffer[:part_size]
+        return len(data)
+
+    def _submit(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.storage._create_multipart_upload(self.key)
+            self._executor = ThreadPoolExecutor(max_workers=self.storage.jobs)
+        if len(self._parts) >= MAX_PARTS:
+            raise StorageError(f"'{self.storage.location(self.key)}' needs more than {MAX_PARTS} parts, "
+                               f"increase the part size")
+        # Stop at the first failed part instead of sending the rest of the file
+        for future in self._parts:
+            if future.done() and future.exception():
+                raise future.exception()
+        self._slots.acquire()
+        self._parts.append(self._executor.submit(self._upload_part, len(self._parts) + 1, data))
+
+    def _upload_part(self, part_number: int, data: bytes) -> str:
+        try:
+            return self.storage._upload_part(self.key, self._upload_id, part_number, data)
+        finally:
+            self._slots.release()
+
+    def commit(self) -> int:
+        try:
+            if self._upload_id is None:
+                # Smaller than one part: a single PUT
+                self.storage._put_object(self.key, bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._submit(bytes(self._buffer))
+                etags = [future.result() for future in self._parts]
+                self.storage._complete_multipart_upload(self.key, self._upload_id, etags)
+        except BaseException:
+            self.abort()
+            raise
+        self._done = True
+        self._buffer = bytearray()
+        if self._executor:
+            self._executor.shutdown()
+        return self._size
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        self._buffer = bytearray()
+        if self._executor:
+            for future in self._parts:
+                future.cancel()
+            self._executor.shutdown()
+        if self._upload_id is not None:
+            try:
+                self.storage._abort_multipart_upload(self.key, self._upload_id)
+            except StorageError as e:
+                print(f"Warning: could not abort the upload of '{self.storage.location(self.key)}': {e}")
+
+
+class _S3Reader(StorageReader):
+    """Sequential reader that fetches the next ranges of an object in parallel"""
+
+    def __init__(self, storage: "S3Storage", key: str, size: int):
+        self.storage = storage
+        self.key = key
+        self.size = size
+        self._offset = 0
+        self._pending: deque = deque()
+        self._chunk = memoryview(b"")
+        self._executor = ThreadPoolExecutor(max_workers=storage.jobs)
+        self._prefetch()
+
+    def _prefetch(self) -> None:
+        while len(self._pending) < self.storage.jobs and self._offset < self.size:
+            end = min(self.size, self._offset + self.storage.part_size)
+            self._pending.append(self._executor.submit(self.storage._get_range, self.key, self._offset, end))
+            self._offset = end
+
+    def readinto(self, buffer) -> int:
+        while not len(self._chunk):
+            if not self._pending:
+                return 0
+            self._chunk = memoryview(self._pending.popleft().result())
+            self._prefetch()
+        count = min(len(buffer), len(self._chunk))
+        buffer[:count] = self._chunk[:count]
+        self._chunk = self._chunk[count:]
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown(wait=False)
+        super().close()
+
+
+class S3Storage(SnapshotStorage):
+    """A bucket (and key prefix) of an S3-compatible object store"""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        session_token: Optional[str] = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        jobs: int = DEFAULT_TRANSFER_JOBS,
+        retries: int = DEFAULT_RETRIES,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT
+    ):
+        """
+        Without an endpoint the bucket is addressed on AWS in virtual-hosted
+        style; with one (MinIO and most other stores) in path style.
+        Credentials default to the AWS_* environment variables.
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.url = f"s3://{bucket}/{self.prefix}".rstrip("/")
+        self.region = region or os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or "us-east-1"
+        self.access_key = access_key or os.environ.get("AWS_ACCESS_KEY_ID")
+        self.secret_key = secret_key or os.environ.get("AWS_SECRET_ACCESS_KEY")
+        self.session_token = session_token or os.environ.get("AWS_SESSION_TOKEN")
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.jobs = max(1, jobs)
+        self.retries = retries
+        self.timeout = (connect_timeout, read_timeout)
+
+        endpoint = endpoint or os.environ.get("AWS_ENDPOINT_URL")
+        if endpoint:
+            parts = urlsplit(endpoint.rstrip("/"))
+            self._base = f"{parts.scheme}://{parts.netloc}"
+            self._host = parts.netloc
+            self._bucket_path = f"{parts.path}/{_uri_encode(bucket)}"
+        else:
+            self._host = f"{bucket}.s3.{self.region}.amazonaws.com"
+            self._base = f"https://{self._host}"
+            self._bucket_path = ""
+
+        # Several files can be transferred at once, each with `jobs` connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(16, self.jobs * 4))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._object_key(key)}" if key or self.prefix else f"s3://{self.bucket}"
+
+    def _object_key(self, key: str) -> str:
+        return "/".join(part for part in (self.prefix, key.strip("/")) if part)
+
+    def _path(self, object_key: str) -> str:
+        if object_key:
+            return f"{self._bucket_path}/{_uri_encode(object_key, safe='-_.~/')}"
+        return self._bucket_path or "/"
+
+    def _request(
+        self,
+        method: str,
+        object_key: str = "",
+        query: Optional[Dict[str, Any]] = None,
+        data: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+        ok: Tuple[int, ...] = (200,)
+    ) -> requests.Response:
+        """
+        Send a signed request, retrying connection errors, throttling and
+        server errors with jittered exponential backoff (all S3 calls made
+        here can be repeated safely).
+        """
+        path = self._path(object_key)
+        query_string = "&".join(
+            f"{_uri_encode(name)}={_uri_encode(str(value))}" for name, value in sorted((query or {}).items())
+        )
+        url = f"{self._base}{path}" + (f"?{query_string}" if query_string else "")
+        failures = 0
+        while True:
+            amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            payload_hash = hashlib.sha256(data).hexdigest()
+            if self.access_key and self.secret_key:
+                extra = {"x-amz-security-token": self.session_token} if self.session_token else None
+                request_headers = sign_v4(method, self._host, path, query_string, payload_hash,
+                                          self.access_key, self.secret_key, self.region, amz_date, extra)
+            else:
+                request_headers = {"host": self._host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+            request_headers.update(headers or {})
+            try:
+                response = self.session.request(method, url, data=data, headers=request_headers, timeout=self.timeout)
+                if response.status_code in ok:
+                    return response
+                error = f"HTTP {response.status_code} {_s3_error(response.text)}"
+                if response.status_code < 500 and response.status_code not in (408, 429):
+                    raise StorageError(f"S3 {method} {self.location(object_key)} failed: {error}", response.status_code)
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            failures += 1
+            if failures > self.retries:
+                raise StorageError(f"S3 {method} {self.location(object_key)} failed: {error}")
+            time.sleep(random.uniform(0, min(DEFAULT_MAX_BACKOFF, 0.5 * 2 ** (failures - 1))))
+
+    def open_writer(self, key: str) -> StorageWriter:
+        return _S3Writer(self, self._object_key(key))
+
+    def open_reader(self, key: str) -> StorageReader:
+        size = self.size(key)
+        if size is None:
+            raise StorageError(f"'{self.location(key)}' does not exist", 404)
+        return _S3Reader(self, self._object_key(key), size)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            response = self._request("HEAD", self._object_key(key))
+        except StorageError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return int(response.headers["Content-Length"])
+
+    def list(self, directory: str = "", recursive: bool = False) -> List[Dict[str, Any]]:
+        prefix = self._object_key(directory)
+        prefix = f"{prefix}/" if prefix else ""
+        query = {"list-type": "2", "prefix": prefix}
+        if not recursive:
+            query["delimiter"] = "/"
+        files = []
+        while True:
+            root = ElementTree.fromstring(self._request("GET", "", query=query).content)
+            for entry in _xml_findall(root, "Contents"):
+                object_key = _xml_find(entry, "Key").text
+                modified = _xml_find(entry, "LastModified").text
+                files.append({
+                    "key": object_key[len(self.prefix) + 1:] if self.prefix else object_key,
+                    "size": int(_xml_find(entry, "Size").text),
+                    "modified": datetime.strptime(modified[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp(),
+                })
+            token = _xml_find(root, "NextContinuationToken")
+            if token is None or not token.text:
+                return files
+            query["continuation-token"] = token.text
+
+    def delete(self, key: str) -> None:
+        for entry in self.list(key, recursive=True):
+            self._request("DELETE", self._object_key(entry["key"]), ok=(200, 204))
+        self._request("DELETE", self._object_key(key), ok=(200, 204, 404))
+
+    def _put_object(self, object_key: str, data: bytes) -> None:
+        self._request("PUT", object_key, data=data)
+
+    def _create_multipart_upload(self, object_key: str) -> str:
+        response = self._request("POST", object_key, query={"uploads": ""})
+        return _xml_find(ElementTree.fromstring(response.content), "UploadId").text
+
+    def _upload_part(self, object_key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        response = self._request("PUT", object_key, query={"partNumber": part_number, "uploadId": upload_id}, data=data)
+        return response.headers["ETag"]
+
+    def _complete_multipart_upload(self, object_key: str, upload_id: str, etags: List[str]) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(etags, start=1)
+        ) + "</CompleteMultipartUpload>"
+        response = self._request("POST", object_key, query={"uploadId": upload_id}, data=body.encode(),
+                                 headers={"Content-Type": "application/xml"})
+        # S3 reports some failures of this call with status 200 and an error document
+        if ElementTree.fromstring(response.content).tag.endswith("Error"):
+            raise StorageError(f"S3 upload of {self.location(object_key)} failed: {_s3_error(response.text)}")
+
+    def _abort_multipart_upload(self, object_key: str, upload_id: str) -> None:
+        self._request("DELETE", object_key, query={"uploadId": upload_id}, ok=(200, 204, 404))
+
+    def _get_range(self, object_key: str, start: int, end: int) -> bytes:
+        """Bytes [start, end) of an object"""
+        response = self._request("GET", object_key, headers={"Range": f"bytes={start}-{end - 1}"}, ok=(200, 206))
+        data = response.content
+        if response.status_code == 200:
+            # The store ignored the Range header
+            data = data[start:end]
+        if len(data) != end - start:
+            raise StorageError(f"Short read of {self.location(object_key)} at {start}: "
+                               f"{len(data)} of {end - start} bytes")
+        return data
+
+
+# SFTP
+
+
+class _SFTPWriter(StorageWriter):
+    def __init__(self, sftp, path: str):
+        super().__init__()
+        self.sftp = sftp
+        self.path = path
+        # Pipelined writes do not wait for the server to acknowledge each request
+        self._file = sftp.open(path + PART_SUFFIX, "wb")
+        self._file.set_pipelined(True)
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self._size += len(data)
+        return len(data)
+
+    def commit(self) -> int:
+        try:
+            self._file.close()
+            self.sftp.posix_rename(self.path + PART_SUFFIX, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        self._done = True
+        self.sftp.close()
+        return self._size
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        try:
+            self._file.close()
+            self.sftp.remove(self.path + PART_SUFFIX)
+        except IOError:
+            pass
+        self.sftp.close()
+
+
+class _SFTPReader(StorageReader):
+    def __init__(self, sftp, path: str, buffer_size: int):
+        self.sftp = sftp
+        self._file = sftp.open(path, "rb")
+        self.size = self._file.stat().st_size
+        # Requests are sent ahead and answered in parallel; a new one is only
+        # sent once an answer was read, so at most buffer_size is held
+        self._file.prefetch(
+            self.size,
+            max_concurrent_requests=max(1, buffer_size // paramiko.SFTPFile.MAX_REQUEST_SIZE)
+        )
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+            self.sftp.close()
+        super().close()
+
+
+class SFTPStorage(SnapshotStorage):
+    """A directory on an SSH server"""
+
+    def __init__(
+        self,
+        host: str,
+        path: str = "/",
+        port: int = 22,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        key_filename: Optional[str] = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        jobs: int = DEFAULT_TRANSFER_JOBS,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    ):
+        """
+        The server's host key must be in ~/.ssh/known_hosts. A reader buffers
+        at most jobs x part_size, like an S3 reader.
+        """
+        check_storage("sftp")
+        # Far more requests than are answered while paramiko's prefetch thread
+        # waits for a free slot; if all were, it would stop prefetching
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.jobs = max(1, jobs)
+        self.root = posixpath.normpath(path or "/")
+        self.url = f"sftp://{username + '@' if username else ''}{host}{':' + str(port) if port != 22 else ''}{self.root}"
+        self._ssh = paramiko.SSHClient()
+        self._ssh.load_system_host_keys()
+        self._ssh.set_missing_host_key_policy(paramiko.RejectPolicy())
+        try:
+            self._ssh.connect(
+                host,
+                port=port,
+                username=username,
+                password=password or os.environ.get("SFTP_PASSWORD"),
+                key_filename=key_filename,
+                timeout=connect_timeout
+            )
+        except (paramiko.SSHException, OSError) as e:
+            raise StorageError(f"Could not connect to {self.url}: {e}")
+
+    def _sftp(self):
+        # One SFTP channel per file; channels share the SSH connection
+        return self._ssh.get_transport().open_sftp_client()
+
+    def _path(self, key: str) -> str:
+        return posixpath.join(self.root, key) if key else self.root
+
+    def _makedirs(self, sftp, directory: str) -> None:
+        current = "/" if directory.startswith("/") else ""
+        for part in directory.split("/"):
+            if not part:
+                continue
+            current = posixpath.join(current, part) if current else part
+            try:
+                sftp.stat(current)
+            except IOError:
+                sftp.mkdir(current)
+
+    def open_writer(self, key: str) -> StorageWriter:
+        sftp = self._sftp()
+        try:
+            self._makedirs(sftp, posixpath.dirname(self._path(key)))
+            return _SFTPWriter(sftp, self._path(key))
+        except IOError as e:
+            sftp.close()
+            raise StorageError(f"Could not write '{self.location(key)}': {e}")
+
+    def open_reader(self, key: str) -> StorageReader:
+        sftp = self._sftp()
+        try:
+            return _SFTPReader(sftp, self._path(key), self.jobs * self.part_size)
+        except IOError as e:
+            sftp.close()
+            raise StorageError(f"Could not read '{self.location(key)}': {e}")
+
+    def size(self, key: str) -> Optional[int]:
+        sftp = self._sftp()
+        try:
+            attributes = sftp.stat(self._path(key))
+            return None if stat.S_ISDIR(attributes.st_mode) else attributes.st_size
+        except IOError:
+            return None
+        finally:
+            sftp.close()
+
+    def list(self, directory: str = "", recursive: bool = False) -> List[Dict[str, Any]]:
+        sftp = self._sftp()
+        try:
+            files = []
+            pending = [directory]
+            while pending:
+                current = pending.pop()
+                try:
+                    entries = sftp.listdir_attr(self._path(current))
+                except IOError:
+                    continue
+                for entry in entries:
+                    key = f"{current}/{entry.filename}" if current else entry.filename
+                    if stat.S_ISDIR(entry.st_mode):
+                        if recursive:
+                            pending.append(key)
+                    elif not entry.filename.endswith(PART_SUFFIX):
+                        files.append({"key": key, "size": entry.st_size, "modified": entry.st_mtime})
+            return files
+        finally:
+            sftp.close()
+
+    def delete(self, key: str) -> None:
+        sftp = self._sftp()
+        try:
+            self._remove(sftp, self._path(key))
+        finally:
+            sftp.close()
+
+    def _remove(self, sftp, path: str) -> None:
+        try:
+            attributes = sftp.stat(path)
+        except IOError:
+            return
+        if stat.S_ISDIR(attributes.st_mode):
+            for entry in sftp.listdir(path):
+                self._remove(sftp, posixpath.join(path, entry))
+            sftp.rmdir(path)
+        else:
+            sftp.remove(path)
+
+    def close(self) -> None:
+        self._ssh.close()
+
+
+def check_storage(scheme: str) -> None:
+    """Raise ValueError if a storage type cannot be used here"""
+    if scheme == "sftp" and paramiko is None:
+        raise ValueError("sftp:// storage requires the 'paramiko' package (pip install paramiko)")
+
+
+def storage_from_options(location: str, options: Optional[Dict[str, Any]] = None) -> SnapshotStorage:
+    """
+    Storage rooted at a directory path or an s3:// or sftp:// URL.
+
+    options are the values of the add_storage_arguments (and connection)
+    options, by destination name; raises ValueError for invalid locations and
+    StorageError if an SFTP server cannot be reached.
+    """
+    options = options or {}
+    parts = urlsplit(location)
+    if parts.scheme == "s3":
+        if not parts.netloc:
+            raise ValueError(f"No bucket in '{location}' (use s3://bucket/prefix)")
+        return S3Storage(
+            parts.netloc,
+            unquote(parts.path),
+            endpoint=options.get("s3_endpoint"),
+            region=options.get("s3_region"),
+            part_size=int((options.get("part_size") or DEFAULT_PART_SIZE // MB) * MB),
+            jobs=options.get("transfer_jobs") or DEFAULT_TRANSFER_JOBS,
+            retries=options.get("retries", DEFAULT_RETRIES),
+            connect_timeout=options.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+            read_timeout=options.get("timeout", DEFAULT_READ_TIMEOUT)
+        )
+    if parts.scheme == "sftp":
+        check_storage("sftp")
+        if not parts.hostname:
+            raise ValueError(f"No host in '{location}' (use sftp://user@host/path)")
+        return SFTPStorage(
+            parts.hostname,
+            unquote(parts.path) or "/",
+            port=parts.port or 22,
+            username=unquote(parts.username) if parts.username else None,
+            password=unquote(parts.password) if parts.password else None,
+            key_filename=options.get("sftp_key"),
+            part_size=int((options.get("part_size") or DEFAULT_PART_SIZE // MB) * MB),
+            jobs=options.get("transfer_jobs") or DEFAULT_TRANSFER_JOBS,
+            connect_timeout=options.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)
+        )
+    if parts.scheme == "file":
+        return LocalStorage(unquote(parts.path))
+    # A single letter is a Windows drive, not a scheme
+    if parts.scheme and len(parts.scheme) > 1:
+        raise ValueError(f"Unsupported storage '{location}' (use a directory, s3:// or sftp://)")
+    return LocalStorage(location)
+
+
+class StorageResolver:
+    """Opens the storage of remote file locations, one per bucket or server"""
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = options or {}
+        self._storages: Dict[str, SnapshotStorage] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, location: str) -> Tuple[SnapshotStorage, str]:
+        """Storage and key of an s3:// or sftp:// location"""
+        parts = urlsplit(location)
+        root = f"{parts.scheme}://{parts.netloc}/"
+        with self._lock:
+            if root not in self._storages:
+                self._storages[root] = storage_from_options(root, self.options)
+            storage = self._storages[root]
+        return storage, unquote(parts.path).lstrip("/")
+
+    def close(self) -> None:
+        with self._lock:
+            for storage in self._storages.values():
+                storage.close()
+            self._storages.clear()
+
+
+def add_storage_arguments(parser) -> None:
+    """Add the remote storage options"""
+    parser.add_argument("--s3-endpoint", help="Endpoint of an S3-compatible store, e.g. http://minio:9000 (default: AWS, or $AWS_ENDPOINT_URL)")
+    parser.add_argument("--s3-region", help="S3 region (default: $AWS_REGION or us-east-1)")
+    parser.add_argument("--part-size", type=float, default=DEFAULT_PART_SIZE // MB,
+                        help=f"Part and range size in MiB for S3 transfers (default: {DEFAULT_PART_SIZE // MB}, min 5)")
+    parser.add_argument("--transfer-jobs", type=int, default=DEFAULT_TRANSFER_JOBS,
+                        help=f"Parts (or ranges) of one file transferred in parallel (default: {DEFAULT_TRANSFER_JOBS})")
+    parser.add_argument("--sftp-key", metavar="FILE", help="Private key for sftp:// storage (default: SSH agent and ~/.ssh keys)")
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Bandwidth and concurrency limits for snapshot transfers
+
+Snapshot downloads and uploads can saturate the disk and network of the
+Qdrant container, and searches served at the same time get slower. A
+TransferThrottle limits the snapshot tools in two ways:
+
+    bandwidth    a token bucket shared by all transfers of a run; every chunk
+                 that is read or sent waits for its share
+    concurrency  how many snapshot transfers may run at the same time (at
+                 most the number of workers)
+
+max_rate alone is a fixed cap. With a latency probe and a target, a
+background thread measures search latency every few seconds while transfers
+are running and adapts both limits to it (AIMD, like TCP congestion control):
+latency above the target halves the bandwidth and takes away one transfer
+slot, latency well below it adds a tenth to the bandwidth and gives slots
+back once bandwidth is no longer the limit. max_rate stays a hard cap
+throughout, and min_rate a floor so that the transfers still finish. A probe
+that fails counts as latency above the target.
+
+Latency is measured by one of:
+
+    CanaryProbe    a search request against a collection (the highest latency
+                   of a few requests per probe)
+    MetricsProbe   a Prometheus endpoint: a histogram, of which the quantile
+                   of the requests since the previous probe is used, or a
+                   gauge in seconds
+
+Only the Python standard library and requests are needed.
+"""
+
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from qdrant_http import QdrantHTTPClient, QdrantRequestError, format_size
+
+
+MB = 1024 * 1024
+DEFAULT_MIN_RATE = 1 * MB
+DEFAULT_PROBE_INTERVAL = 2.0
+DEFAULT_LATENCY_QUANTILE = 0.99
+CANARY_SAMPLES = 3
+
+# Latency below this fraction of the target leaves room to speed up
+HEADROOM = 0.8
+# Unused bandwidth that may be spent at once after a pause, in seconds
+BURST_SECONDS = 0.25
+
+_METRIC_NAME = r"[a-zA-Z_:][a-zA-Z0-9_:]*"
+_SAMPLE_LINE = re.compile(rf"^({_METRIC_NAME})(?:\{{(.*)\}})?\s+(\S+)")
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"')
+
+
+def parse_selector(selector: str) -> Tuple[str, Dict[str, str]]:
+    """Split 'name{label="value",...}' into the metric name and the labels to match"""
+    match = re.fullmatch(rf"\s*({_METRIC_NAME})\s*(?:\{{(.*)\}})?\s*", selector)
+    if not match:
+        raise ValueError(f"Invalid metric selector '{selector}'")
+    return match.group(1), dict(_LABEL.findall(match.group(2) or ""))
+
+
+def parse_prometheus_text(text: str) -> List[Tuple[str, Dict[str, str], float]]:
+    """(name, labels, value) of every sample in a text exposition"""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_LINE.match(line)
+        if not match:
+            continue
+        try:
+            value = float(match.group(3))
+        except ValueError:
+            continue
+        samples.append((match.group(1), dict(_LABEL.findall(match.group(2) or "")), value))
+    return samples
+
+
+def histogram_quantile(quantile: float, buckets: List[Tuple[float, float]]) -> Optional[float]:
+    """
+    Quantile of cumulative (upper bound, count) buckets, interpolated within
+    a bucket like Prometheus' histogram_quantile(); None without observations
+    """
+    buckets = sorted(buckets)
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = quantile * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for upper, count in buckets:
+        if count >= rank:
+            if upper == float("inf"):
+                return lower
+            if count == below:
+                return upper
+            return lower + (upper - lower) * (rank - below) / (count - below)
+        lower, below = upper, count
+    return lower
+
+
+class CanaryProbe:
+    """Latency of a search against a collection, as seen by a client"""
+
+    def __init__(self, client: QdrantHTTPClient, collection_name: str, query: Optional[Dict[str, Any]] = None,
+                 samples: int = CANARY_SAMPLES):
+        """
+        query is the body of a search (or of a universal query, if it has a
+        'query' key); by default a search with a vector stored in the collection
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.query = query
+        self.samples = max(1, samples)
+        self.endpoint = None
+        if query is not None:
+            self.endpoint = f"/collections/{collection_name}/points/{'query' if 'query' in query else 'search'}"
+
+    def describe(self) -> str:
+        return f"canary search on '{self.collection_name}'"
+
+    def _default_query(self) -> None:
+        """Search with the first vector of the collection (a scroll if it has no dense vector)"""
+        points = self.client.request_json(
+            "POST",
+            f"/collections/{self.collection_name}/points/scroll",
+            json={"limit": 1, "with_payload": False, "with_vector": True}
+        )["result"]["points"]
+        vector = points[0].get("vector") if points else None
+        if isinstance(vector, dict):
+            # Named vectors: the first dense one (sparse vectors are dicts)
+            vector = next(({"name": name, "vector": value} for name, value in vector.items()
+                           if isinstance(value, list) and value and not isinstance(value[0], list)), None)
+        elif isinstance(vector, list) and vector and isinstance(vector[0], list):
+            # Multivector
+            vector = None
+        if vector:
+            self.endpoint = f"/collections/{self.collection_name}/points/search"
+            self.query = {"vector": vector, "limit": 10, "with_payload": False}
+        else:
+            self.endpoint = f"/collections/{self.collection_name}/points/scroll"
+            self.query = {"limit": 10, "with_payload": False}
+
+    def measure(self) -> Optional[float]:
+        """Highest latency of a few requests, in seconds"""
+        if self.endpoint is None:
+            self._default_query()
+        worst = 0.0
+        for _ in range(self.samples):
+            start = time.perf_counter()
+            self.client.request("POST", self.endpoint, json=self.query, retry=False).close()
+            worst = max(worst, time.perf_counter() - start)
+        return worst
+
+
+class MetricsProbe:
+    """Latency read from a Prometheus metrics endpoint"""
+
+    def __init__(self, client: QdrantHTTPClient, selector: str, quantile: float = DEFAULT_LATENCY_QUANTILE):
+        """client talks to the metrics URL itself (its endpoint is empty)"""
+        self.client = client
+        self.selector = selector
+        self.name, self.labels = parse_selector(selector)
+        self.quantile = quantile
+        self._previous: Optional[Dict[float, float]] = None
+
+    def describe(self) -> str:
+        return f"'{self.selector}' from {self.client.host}"
+
+    def _matches(self, labels: Dict[str, str]) -> bool:
+        return all(labels.get(name) == value for name, value in self.labels.items())
+
+    def measure(self) -> Optional[float]:
+        """
+        Latency in seconds; None if a histogram saw no requests since the
+        last probe (or this is the first probe)
+        """
+        response = self.client.request("GET", "", retry=False)
+        samples = parse_prometheus_text(response.text)
+
+        # Histogram: sum the matching series per bucket
+        buckets: Dict[float, float] = {}
+        for name, labels, value in samples:
+            if name == f"{self.name}_bucket" and "le" in labels and self._matches(labels):
+                upper = float(labels["le"])
+                buckets[upper] = buckets.get(upper, 0.0) + value
+        if buckets:
+            previous, self._previous = self._previous, buckets
+            if previous is None:
+                return None
+            window = [(upper, count - previous.get(upper, 0.0)) for upper, count in buckets.items()]
+            return histogram_quantile(self.quantile, window)
+
+        values = [value for name, labels, value in samples if name == self.name and self._matches(labels)]
+        if not values:
+            raise ValueError(f"metric '{self.selector}' not found at {self.client.host}")
+        return max(values)
+
+
+class TransferThrottle:
+    def __init__(
+        self,
+        max_rate: Optional[float] = None,
+        slots: Optional[int] = None,
+        probe=None,
+        latency_target: Optional[float] = None,
+        min_rate: float = DEFAULT_MIN_RATE,
+        probe_interval: float = DEFAULT_PROBE_INTERVAL
+    ):
+        """
+        max_rate and min_rate in bytes per second (max_rate None: no cap),
+        slots is the most transfers at once (None: no limit), latency_target
+        in seconds. Without a probe the limits never change.
+        """
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate) if max_rate else min_rate
+        self.rate = max_rate
+        self.max_slots = max(1, slots) if slots else None
+        self.slots = self.max_slots
+        self.probe = probe
+        self.latency_target = latency_target
+        self.probe_interval = probe_interval
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._active = 0
+        self._next_send = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+        # Totals for the summary
+        self.bytes = 0
+        self.waited = 0.0
+        self.latencies: List[float] = []
+        self.probes = 0
+        self.over_target = 0
+        self.lowest_rate = max_rate
+        self.lowest_slots = self.slots
+
+    @property
+    def adaptive(self) -> bool:
+        return self.probe is not None and self.latency_target is not None
+
+    @property
+    def limited(self) -> bool:
+        return self.adaptive or self.max_rate is not None
+
+    def describe(self) -> str:
+        parts = [f"at most {format_size(int(self.max_rate))}/s" if self.max_rate else "no bandwidth cap"]
+        if self.adaptive:
+            parts.append(f"adapting to keep {self.probe.describe()} under {self.latency_target * 1000:.0f} ms "
+                         f"(probe every {self.probe_interval:g}s, at least {format_size(int(self.min_rate))}/s)")
+        return ", ".join(parts)
+
+    @contextmanager
+    def transfer(self) -> Iterator[None]:
+        """Hold a transfer slot while a snapshot is sent or received"""
+        with self._changed:
+            while self.slots is not None and self._active >= self.slots:
+                self._changed.wait()
+            self._active += 1
+            if self.adaptive and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transfer-throttle", daemon=True)
+                self._thread.start()
+            self._changed.notify_all()
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._active -= 1
+                self._changed.notify_all()
+
+    def consume(self, num_bytes: int) -> None:
+        """Account for num_bytes sent or received, waiting while over the current rate"""
+        with self._lock:
+            self.bytes += num_bytes
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._next_send = max(self._next_send, now - BURST_SECONDS) + num_bytes / self.rate
+            delay = self._next_send - now
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self.waited += delay
+
+    def close(self) -> None:
+        """Stop probing"""
+        self._closed.set()
+        with self._changed:
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Adaptation
+
+    def _run(self) -> None:
+        """Probe latency while transfers are running and adjust the limits"""
+        last_bytes, last_time = self.bytes, time.monotonic()
+        while True:
+            with self._changed:
+                while self._active == 0 and not self._closed.is_set():
+                    self._changed.wait()
+            if self._closed.wait(self.probe_interval):
+                return
+
+            try:
+                latency = self.probe.measure()
+            except (QdrantRequestError, ValueError, KeyError) as e:
+                print(f"Throttle: latency probe failed ({e}), slowing transfers down")
+                latency = float("inf")
+
+            now = time.monotonic()
+            with self._lock:
+                observed = (self.bytes - last_bytes) / max(now - last_time, 1e-6)
+                last_bytes, last_time = self.bytes, now
+            if latency is not None:
+                self._adjust(latency, observed)
+
+    def _adjust(self, latency: float, observed: float) -> None:
+        """Change bandwidth and slots for one latency measurement (seconds) and the observed rate"""
+        with self._changed:
+            self.probes += 1
+            if latency != float("inf"):
+                self.latencies.append(latency)
+            rate, slots = self.rate, self.slots
+
+            if latency > self.latency_target:
+                self.over_target += 1
+                # Halve what is actually being transferred; an unused limit
+                # would not slow anything down
+                current = min(rate, observed) if rate else observed
+                rate = max(self.min_rate, (current or self.min_rate) / 2)
+                slots = max(1, slots - 1) if slots else None
+            elif latency < self.latency_target * HEADROOM:
+                if rate:
+                    rate += max(self.min_rate, rate / 10)
+                    if self.max_rate:
+                        rate = min(rate, self.max_rate)
+                # More transfers only help once bandwidth no longer limits them
+                bandwidth_free = not rate or rate == self.max_rate or observed < rate / 2
+                if slots and bandwidth_free:
+                    slots = min(self.max_slots, slots + 1)
+
+            if (rate, slots) == (self.rate, self.slots):
+                return
+            slower = (rate or float("inf")) < (self.rate or float("inf")) or (slots or 0) < (self.slots or 0)
+            self.rate, self.slots = rate, slots
+            self.lowest_rate = min(self.lowest_rate or rate, rate) if rate else self.lowest_rate
+            self.lowest_slots = min(self.lowest_slots, slots) if slots else self.lowest_slots
+            self._changed.notify_all()
+
+        # Report every slowdown, and the return to full speed
+        if slower or (rate == self.max_rate and slots == self.max_slots):
+            latency_text = "probe failed" if latency == float("inf") else f"latency {latency * 1000:.0f} ms"
+            slots_text = f", {slots} transfer{'s' if slots > 1 else ''} at a time" if slots else ""
+            print(f"Throttle: {latency_text} (target {self.latency_target * 1000:.0f} ms), "
+                  f"bandwidth {format_size(int(rate)) + '/s' if rate else 'unlimited'}{slots_text}")
+
+    def print_summary(self) -> None:
+        """Print what the throttle did during the run"""
+        print(f"Throttle: {format_size(self.bytes)} transferred, {self.waited:.1f}s spent waiting for bandwidth")
+        if not self.adaptive or not self.probes:
+            return
+        latencies = sorted(self.latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            worst = latencies[-1]
+            print(f"Throttle: {self.probes} probes, {self.over_target} over the "
+                  f"{self.latency_target * 1000:.0f} ms target (median {p50 * 1000:.0f} ms, highest {worst * 1000:.0f} ms)")
+        if self.lowest_rate:
+            print(f"Throttle: bandwidth went down to {format_size(int(self.lowest_rate))}/s, "
+                  f"transfers at a time down to {self.lowest_slots}")
+
+
+def add_throttle_arguments(parser) -> None:
+    """Add the bandwidth and latency options shared by the snapshot tools"""
+    parser.add_argument("--max-bandwidth", type=float, metavar="MB/S",
+                        help="Hard cap on the bandwidth of all snapshot transfers together, in MB/s")
+    parser.add_argument("--latency-target", type=float, metavar="MS",
+                        help="Adapt bandwidth and parallel transfers to keep search latency under this many milliseconds")
+    parser.add_argument("--min-bandwidth", type=float, default=DEFAULT_MIN_RATE / MB, metavar="MB/S",
+                        help=f"Bandwidth never throttled below, in MB/s (default: {DEFAULT_MIN_RATE / MB:g})")
+    parser.add_argument("--canary-collection", help="Collection searched to measure latency (with --latency-target)")
+    parser.add_argument("--canary-query", metavar="JSON|@FILE",
+                        help="Body of the canary search (default: a search with a vector stored in the collection)")
+    parser.add_argument("--canary-host", help="Send canary searches here, e.g. through Caddy (default: --host)")
+    parser.add_argument("--latency-metric", metavar="SELECTOR",
+                        help="Read latency from this Prometheus histogram or gauge (seconds) instead of a canary search")
+    parser.add_argument("--latency-metrics-url", help="Metrics endpoint for --latency-metric (default: <host>/metrics)")
+    parser.add_argument("--latency-quantile", type=float, default=DEFAULT_LATENCY_QUANTILE,
+                        help=f"Quantile of a --latency-metric histogram (default: {DEFAULT_LATENCY_QUANTILE})")
+    parser.add_argument("--probe-interval", type=float, default=DEFAULT_PROBE_INTERVAL,
+                        help=f"Seconds between latency probes (default: {DEFAULT_PROBE_INTERVAL:g})")
+
+
+def throttle_from_options(options: Dict[str, Any], client: QdrantHTTPClient, slots: Optional[int] = None) -> TransferThrottle:
+    """
+    TransferThrottle configured from the add_throttle_arguments options, or
+    the same keys in a config file (without limits it never waits).
+    Raises ValueError for inconsistent options.
+    """
+    max_bandwidth = options.get("max_bandwidth")
+    latency_target = options.get("latency_target")
+    probe = None
+    if latency_target:
+        # Probes must fail fast rather than wait out the tool's long timeouts
+        timeout = max(1.0, latency_target / 1000 * 10)
+        if options.get("latency_metric"):
+            url = options.get("latency_metrics_url") or f"{client.host}/metrics"
+            if not urlsplit(url).scheme:
+                raise ValueError(f"Invalid metrics URL '{url}'")
+            probe_client = QdrantHTTPClient(host=url, api_key=client.api_key, read_timeout=timeout, retries=0)
+            probe = MetricsProbe(probe_client, options["latency_metric"],
+                                 options.get("latency_quantile") or DEFAULT_LATENCY_QUANTILE)
+        elif options.get("canary_collection"):
+            query = options.get("canary_query")
+            if isinstance(query, str):
+                if query.startswith("@"):
+                    with open(query[1:]) as f:
+                        query = f.read()
+                query = json.loads(query)
+            probe_client = QdrantHTTPClient(host=options.get("canary_host") or client.host, api_key=client.api_key,
+                                            read_timeout=timeout, retries=0)
+            probe = CanaryProbe(probe_client, options["canary_collection"], query)
+        else:
+            raise ValueError("--latency-target needs --canary-collection or --latency-metric")
+
+    return TransferThrottle(
+        max_rate=max_bandwidth * MB if max_bandwidth else None,
+        slots=slots,
+        probe=probe,
+        latency_target=latency_target / 1000 if latency_target else None,
+        min_rate=(options.get("min_bandwidth") or DEFAULT_MIN_RATE / MB) * MB,
+        probe_interval=max(0.1, options.get("probe_interval") or DEFAULT_PROBE_INTERVAL)
+    )
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Qdrant Index and Quantization Tuning Advisor
+
+This script restores a production snapshot into scratch collections with
+different index settings and measures every one of them with the same
+queries, so that HNSW, quantization and on-disk parameters are chosen from
+measurements. For every variant of the grid it:
+
+    1. creates a scratch collection from the snapshot (uploaded only once)
+       and changes its HNSW m/ef_construct, quantization and on-disk settings
+    2. waits until Qdrant has rebuilt the indexes, and warms the collection up
+    3. runs the query set, at every --hnsw-ef value, and compares the results
+       with exact search (without HNSW and quantization) to get recall@k
+    4. deletes the scratch collection again (unless --keep)
+
+The report lists recall, p50/p99 latency and estimated RAM of every variant,
+marks the ones no other variant beats in all three, and recommends the one
+with the least RAM that reaches --min-recall. Recall is computed with NumPy
+if it is installed (pip install numpy), in pure Python otherwise.
+
+Qdrant does not report memory per collection, so RAM is estimated from the
+collection info: original vectors unless on disk, quantized vectors, and the
+links of the HNSW graph. Payloads, payload indexes and the page cache used
+by on-disk data are not included.
+
+Run it against a staging instance with room for one more copy of the
+collection: the variants are built one at a time, each rebuilds the whole
+index.
+
+Usage:
+    python tune_collection.py --snapshot <snapshot_file>
+    python tune_collection.py --snapshot <snapshot_file> --m 16,32 --quantization none,scalar,binary --hnsw-ef 64,128
+    python tune_collection.py --location <url_or_server_path> --queries queries.jsonl
+
+Options:
+    --snapshot       Snapshot file to tune (or a backup name with --repository)
+    --location       URL or server-side path Qdrant recovers from directly (no upload)
+    --repository     Deduplicated backup repository; --snapshot is then a backup name in it
+    --m              Comma-separated HNSW m values (default: 16)
+    --ef-construct   Comma-separated HNSW ef_construct values (default: 100)
+    --quantization   Comma-separated list of none, scalar, product, binary (default: all)
+    --on-disk        Comma-separated original vector storage: false (RAM), true (mmap) (default: false)
+    --hnsw-ef        Comma-separated search-time ef values (default: Qdrant's default)
+    --queries        JSON lines file of recorded search/query bodies (default: stored vectors)
+    --sample         Stored vectors used as queries without --queries (default: 200)
+    --limit          k of recall@k for queries without a limit (default: 10)
+    --concurrency    Queries in flight while measuring (default: 4)
+    --repeat         Passes over the query set per measurement (default: 3)
+    --min-recall     Recall the recommendation must reach (default: 0.95)
+    --prefix         Prefix of the scratch collections (default: tune_)
+    --keep           Keep the scratch collections
+    --json           Write the results to this JSON file
+
+A recorded query is one JSON object per line: the body of a search request,
+or of a universal query if it has a 'query' key (see collection_warmup.py).
+Stored vectors as queries find themselves, so recorded production queries
+give a more realistic recall.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from collection_warmup import CollectionWarmup, DEFAULT_SAMPLE, load_queries, percentile, query_endpoint
+from qdrant_http import (
+    DEFAULT_POOL_SIZE,
+    QdrantHTTPClient,
+    QdrantRequestError,
+    add_client_arguments,
+    format_size,
+)
+from restore_snapshots import QdrantSnapshotRestore, SnapshotUploadError
+from snapshot_repository import SnapshotRepository
+
+
+QUANTIZATION_CONFIGS = {
+    "none": "Disabled",
+    "scalar": {"scalar": {"type": "int8", "quantile": 0.99, "always_ram": True}},
+    "product": {"product": {"compression": "x16", "always_ram": True}},
+    "binary": {"binary": {"always_ram": True}},
+}
+DATATYPE_BYTES = {"float32": 4, "float16": 2, "uint8": 1}
+# Every HNSW link is a 4 byte point offset; level 0 has up to 2 * m of them
+HNSW_LINK_BYTES = 4
+
+DEFAULT_PREFIX = "tune_"
+DEFAULT_LIMIT = 10
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REPEAT = 3
+DEFAULT_MIN_RECALL = 0.95
+# Time limit of the warm-up before each measurement
+WARMUP_MAX_TIME = 120.0
+
+
+def parse_list(value: str, convert, name: str) -> List[Any]:
+    """Comma-separated option values (raises ValueError)"""
+    try:
+        values = [convert(item.strip()) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise ValueError(f"invalid {name} list: {value}")
+    if not values:
+        raise ValueError(f"empty {name} list")
+    return values
+
+
+def parse_bool(value: str) -> bool:
+    if value.lower() in ("true", "yes", "1", "disk", "mmap"):
+        return True
+    if value.lower() in ("false", "no", "0", "ram", "memory"):
+        return False
+    raise ValueError(value)
+
+
+def parse_quantization(value: str) -> str:
+    if value.lower() not in QUANTIZATION_CONFIGS:
+        raise ValueError(value)
+    return value.lower()
+
+
+class Variant:
+    """One combination of index settings"""
+
+    def __init__(self, m: int, ef_construct: int, quantization: str, on_disk: bool):
+        self.m = m
+        self.ef_construct = ef_construct
+        self.quantization = quantization
+        self.on_disk = on_disk
+
+    @property
+    def name(self) -> str:
+        return f"m{self.m}-ef{self.ef_construct}-{self.quantization}-{'disk' if self.on_disk else 'ram'}"
+
+    def update_body(self, vector_names: List[str]) -> Dict[str, Any]:
+        """Body of the collection update that applies the variant"""
+        return {
+            "hnsw_config": {"m": self.m, "ef_construct": self.ef_construct},
+            "quantization_config": QUANTIZATION_CONFIGS[self.quantization],
+            "vectors": {name: {"on_disk": self.on_disk} for name in vector_names},
+        }
+
+
+def variant_grid(m_values: List[int], ef_construct_values: List[int], quantizations: List[str],
+                 on_disk_values: List[bool]) -> List[Variant]:
+    return [Variant(*values) for values in itertools.product(m_values, ef_construct_values, quantizations, on_disk_values)]
+
+
+def dense_vectors(info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Parameters of the dense vectors of a collection by name ('' for the unnamed vector)"""
+    vectors = info.get("config", {}).get("params", {}).get("vectors", {})
+    if "size" in vectors:
+        return {"": vectors}
+    return {name: params for name, params in vectors.items() if isinstance(params, dict) and "size" in params}
+
+
+def quantized_vector_bytes(quantization: Dict[str, Any], dim: int) -> float:
+    """Bytes of one quantized vector"""
+    if "scalar" in quantization:
+        return dim
+    if "binary" in quantization:
+        return math.ceil(dim / 8)
+    if "product" in quantization:
+        ratio = int(str(quantization["product"].get("compression", "x16")).lstrip("x") or 16)
+        # Product quantization encodes float32 vectors, compression is relative to them
+        return dim * 4 / ratio
+    return 0
+
+
+def estimate_ram(info: Dict[str, Any]) -> int:
+    """Estimated RAM of the vectors and HNSW graphs of a collection, in bytes"""
+    config = info.get("config", {})
+    points = info.get("points_count") or 0
+    hnsw = config.get("hnsw_config") or {}
+    collection_quantization = config.get("quantization_config")
+    total = 0.0
+    for params in dense_vectors(info).values():
+        dim = params["size"]
+        on_disk = bool(params.get("on_disk"))
+        if not on_disk:
+            total += points * dim * DATATYPE_BYTES.get(str(params.get("datatype", "float32")).lower(), 4)
+
+        quantization = params.get("quantization_config", collection_quantization)
+        if isinstance(quantization, dict) and quantization:
+            settings = next(iter(quantization.values())) or {}
+            if settings.get("always_ram") or not on_disk:
+                total += points * quantized_vector_bytes(quantization, dim)
+
+        vector_hnsw = dict(hnsw, **(params.get("hnsw_config") or {}))
+        m = vector_hnsw.get("m", 16)
+        if m and not vector_hnsw.get("on_disk"):
+            total += points * m * 2 * HNSW_LINK_BYTES
+    return int(total)
+
+
+def result_ids(result: Any) -> List[Any]:
+    """Point ids of a search (list) or query ({"points": [...]}) result"""
+    points = result.get("points", []) if isinstance(result, dict) else result
+    return [point["id"] for point in points]
+
+
+def recall_at_k(approximate: List[List[Any]], exact: List[List[Any]]) -> Optional[float]:
+    """
+    Mean share of the exact results that the approximate search also found.
+
+    Queries without exact results are skipped; None if there are none left.
+    """
+    pairs = [(found, expected) for found, expected in zip(approximate, exact) if expected]
+    if not pairs:
+        return None
+    if numpy is None:
+        return sum(len(set(found) & set(expected)) / len(expected) for found, expected in pairs) / len(pairs)
+
+    # Ids are ints or UUID strings; number them so the comparison is on int arrays
+    numbering: Dict[Any, int] = {}
+    width = max(max(len(found), len(expected)) for found, expected in pairs)
+    found_ids = numpy.full((len(pairs), width), -1, dtype=numpy.int64)
+    expected_ids = numpy.full((len(pairs), width), -2, dtype=numpy.int64)
+    for row, (found, expected) in enumerate(pairs):
+        found_ids[row, :len(found)] = [numbering.setdefault(point_id, len(numbering)) for point_id in found]
+        expected_ids[row, :len(expected)] = [numbering.setdefault(point_id, len(numbering)) for point_id in expected]
+    hits = (found_ids[:, :, None] == expected_ids[:, None, :]).any(axis=2).sum(axis=1)
+    sizes = numpy.array([len(expected) for _, expected in pairs])
+    return float((hits / sizes).mean())
+
+
+def search_params(body: Dict[str, Any], **params) -> Dict[str, Any]:
+    """Copy of a query body with additional search params"""
+    body = dict(body)
+    body["params"] = dict(body.get("params") or {}, **params)
+    return body
+
+
+def pareto_optimal(rows: List[Dict[str, Any]]) -> List[bool]:
+    """Whether each row is not beaten by another one in recall, p99 and RAM at once"""
+    def beats(a, b):
+        better_or_equal = a["recall"] >= b["recall"] and a["p99_ms"] <= b["p99_ms"] and a["ram"] <= b["ram"]
+        return better_or_equal and (a["recall"] > b["recall"] or a["p99_ms"] < b["p99_ms"] or a["ram"] < b["ram"])
+
+    measured = [row for row in rows if row.get("recall") is not None]
+    return [row.get("recall") is not None and not any(beats(other, row) for other in measured) for row in rows]
+
+
+def recommend(rows: List[Dict[str, Any]], min_recall: float) -> Optional[Dict[str, Any]]:
+    """The row with the least RAM (then lowest p99) that reaches min_recall"""
+    candidates = [row for row in rows if row.get("recall") is not None and row["recall"] >= min_recall]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda row: (row["ram"], row["p99_ms"]))
+
+
+class CollectionTuner:
+    def __init__(
+        self,
+        restore_tool: QdrantSnapshotRestore,
+        queries: Optional[List[Dict[str, Any]]] = None,
+        sample: int = DEFAULT_SAMPLE,
+        limit: int = DEFAULT_LIMIT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        repeat: int = DEFAULT_REPEAT,
+        prefix: str = DEFAULT_PREFIX,
+        keep: bool = False
+    ):
+        """queries are recorded search/query bodies; without them `sample` stored vectors are used"""
+        self.restore_tool = restore_tool
+        self.client = restore_tool.client
+        self.sample = sample
+        self.limit = limit
+        self.concurrency = max(1, concurrency)
+        self.repeat = max(1, repeat)
+        self.prefix = prefix
+        self.keep = keep
+        self.queries = [self._with_limit(query) for query in queries] if queries is not None else None
+        # Exact results of every query, computed on the first scratch collection
+        self.exact: Optional[List[List[Any]]] = None
+
+    def _with_limit(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return body if "limit" in body else dict(body, limit=self.limit)
+
+    def _warmup(self, queries: Optional[List[Dict[str, Any]]] = None) -> CollectionWarmup:
+        return CollectionWarmup(
+            self.client,
+            sample=self.sample,
+            concurrency=self.concurrency,
+            max_time=WARMUP_MAX_TIME,
+            ready_timeout=self.restore_tool.poll_timeout,
+            queries=queries
+        )
+
+    def _collection_exists(self, collection_name: str) -> bool:
+        try:
+            self.client.request_json("GET", f"/collections/{collection_name}", retry=True)
+            return True
+        except QdrantRequestError as e:
+            if e.status_code == 404:
+                return False
+            raise
+
+    def _collection_info(self, collection_name: str) -> Dict[str, Any]:
+        return self.client.request_json("GET", f"/collections/{collection_name}", retry=True)["result"]
+
+    def _sampled_queries(self, collection_name: str) -> List[Dict[str, Any]]:
+        """Searches with stored vectors, without payloads (they would only add transfer time)"""
+        queries = []
+        for _, body in self._warmup().build_queries(collection_name):
+            body = dict(body, limit=self.limit)
+            body.pop("with_payload", None)
+            queries.append(body)
+        return queries
+
+    def _run_queries(self, collection_name: str, queries: List[Dict[str, Any]],
+                     executor: ThreadPoolExecutor) -> List[Tuple[Optional[float], Optional[List[Any]]]]:
+        """(latency, result ids) of every query; (None, None) for a failed one"""
+        def run(body):
+            start = time.perf_counter()
+            try:
+                result = self.client.request_json("POST", query_endpoint(collection_name, body), json=body, retry=False)
+            except QdrantRequestError:
+                return None, None
+            return time.perf_counter() - start, result_ids(result["result"])
+
+        return list(executor.map(run, queries))
+
+    def _exact_results(self, collection_name: str, queries: List[Dict[str, Any]],
+                       executor: ThreadPoolExecutor) -> List[List[Any]]:
+        print(f"[{collection_name}] Computing exact results of {len(queries)} queries...")
+        exact_queries = [search_params(body, exact=True, quantization={"ignore": True}) for body in queries]
+        return [ids or [] for _, ids in self._run_queries(collection_name, exact_queries, executor)]
+
+    def measure(self, collection_name: str, hnsw_ef: Optional[int], executor: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Recall and latency of the query set at one search-time ef"""
+        queries = self.queries if hnsw_ef is None else [search_params(body, hnsw_ef=hnsw_ef) for body in self.queries]
+        latencies = []
+        errors = 0
+        found = None
+        for _ in range(self.repeat):
+            results = self._run_queries(collection_name, queries, executor)
+            latencies.extend(latency for latency, _ in results if latency is not None)
+            errors += sum(1 for latency, _ in results if latency is None)
+            if found is None:
+                found = [ids or [] for _, ids in results]
+        latencies.sort()
+        return {
+            "hnsw_ef": hnsw_ef,
+            "recall": recall_at_k(found, self.exact),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "queries": len(latencies) + errors,
+            "errors": errors,
+        }
+
+    def _create_scratch(self, source: Dict[str, str], scratch_name: str) -> bool:
+        if "location" in source:
+            return self.restore_tool.recover_from_location(source["location"], scratch_name)
+        return self.restore_tool.create_collection_from_snapshot(source["snapshot_name"], scratch_name)
+
+    def tune_variant(self, source: Dict[str, str], variant: Variant, hnsw_efs: List[Optional[int]]) -> List[Dict[str, Any]]:
+        """Build one variant in a scratch collection and measure it; one row per hnsw_ef"""
+        scratch_name = f"{self.prefix}{variant.name}"
+        base = {"variant": variant.name, "collection": scratch_name, "m": variant.m,
+                "ef_construct": variant.ef_construct, "quantization": variant.quantization, "on_disk": variant.on_disk}
+        print(f"\n=== {variant.name} ===")
+        if self._collection_exists(scratch_name):
+            print(f"Error: collection '{scratch_name}' already exists, not touching it (choose another --prefix)")
+            return [dict(base, error="scratch collection exists")]
+
+        start = time.time()
+        if not self._create_scratch(source, scratch_name):
+            self._delete_scratch(scratch_name)
+            return [dict(base, error="restore failed")]
+        try:
+            vector_names = list(dense_vectors(self._collection_info(scratch_name)))
+            self.client.request_json("PATCH", f"/collections/{scratch_name}", json=variant.update_body(vector_names))
+            print(f"[{scratch_name}] Rebuilding with {json.dumps(variant.update_body(vector_names))}")
+
+            if self.queries is None:
+                if self._warmup().wait_until_ready(scratch_name) is None:
+                    return [dict(base, error="collection did not become ready")]
+                self.queries = self._sampled_queries(scratch_name)
+                print(f"[{scratch_name}] Using {len(self.queries)} stored vectors as queries")
+            if not self.queries:
+                return [dict(base, error="no queries")]
+
+            warmup = self._warmup(self.queries).warm_up(scratch_name)
+            if not warmup["ready"]:
+                return [dict(base, error="collection did not become ready")]
+            base["build_s"] = round(time.time() - start - warmup.get("elapsed", 0.0), 3)
+            info = self._collection_info(scratch_name)
+            base["points"] = info.get("points_count")
+            base["ram"] = estimate_ram(info)
+
+            rows = []
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                if self.exact is None:
+                    self.exact = self._exact_results(scratch_name, self.queries, executor)
+                for hnsw_ef in hnsw_efs:
+                    row = dict(base, **self.measure(scratch_name, hnsw_ef, executor))
+                    recall = "n/a" if row["recall"] is None else f"{row['recall']:.4f}"
+                    print(f"[{scratch_name}] hnsw_ef {hnsw_ef or 'default'}: recall {recall}, "
+                          f"p50 {row['p50_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms"
+                          + (f", {row['errors']} errors" if row["errors"] else ""))
+                    rows.append(row)
+            return rows
+        except (QdrantRequestError, KeyError) as e:
+            print(f"[{scratch_name}] Error: {e}")
+            return [dict(base, error=str(e))]
+        finally:
+            if not self.keep:
+                self._delete_scratch(scratch_name)
+
+    def _delete_scratch(self, scratch_name: str) -> None:
+        try:
+            self.client.request_json("DELETE", f"/collections/{scratch_name}", retry=True)
+        except QdrantRequestError as e:
+            if e.status_code != 404:
+                print(f"Warning: could not delete scratch collection '{scratch_name}': {e}")
+
+    def run(self, source: Dict[str, str], variants: List[Variant], hnsw_efs: List[Optional[int]]) -> List[Dict[str, Any]]:
+        rows = []
+        for variant in variants:
+            rows.extend(self.tune_variant(source, variant, hnsw_efs))
+        return rows
+
+
+def print_report(rows: List[Dict[str, Any]], min_recall: float) -> Optional[Dict[str, Any]]:
+    """Table of all variants; returns the recommended row"""
+    optimal = pareto_optimal(rows)
+    print("\n" + "=" * 86)
+    print(f"{'':2}{'variant':<28} {'hnsw_ef':>8} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'est. RAM':>10} {'build s':>8}")
+    print("-" * 86)
+    for row, best in zip(rows, optimal):
+        if "error" in row:
+            print(f"{'':2}{row['variant']:<28} error: {row['error']}")
+            continue
+        recall = "n/a" if row["recall"] is None else f"{row['recall']:.4f}"
+        print(f"{'*' if best else '':2}{row['variant']:<28} {row['hnsw_ef'] or 'default':>8} {recall:>8} "
+              f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {format_size(row['ram']):>10} {row['build_s']:>8.1f}")
+    print("-" * 86)
+    print("* not beaten by any other variant in recall, p99 and RAM at once")
+
+    best = recommend(rows, min_recall)
+    if best:
+        print(f"Recommended for recall >= {min_recall}: {best['variant']}"
+              + (f" with hnsw_ef {best['hnsw_ef']}" if best["hnsw_ef"] else "")
+              + f" (recall {best['recall']:.4f}, p99 {best['p99_ms']:.1f} ms, ~{format_size(best['ram'])})")
+    else:
+        measured = [row for row in rows if row.get("recall") is not None]
+        if measured:
+            top = max(measured, key=lambda row: row["recall"])
+            print(f"No variant reaches recall {min_recall}; the highest is {top['recall']:.4f} ({top['variant']})")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Qdrant Index and Quantization Tuning Advisor",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compare no, scalar, product and binary quantization at the default HNSW settings
+  %(prog)s --snapshot ./snapshots/products.snapshot
+
+  # Larger grid with search-time ef and recorded production queries
+  %(prog)s --snapshot ./snapshots/products.snapshot --m 8,16,32 --ef-construct 100,256 \\
+      --quantization none,scalar --on-disk false,true --hnsw-ef 64,128,256 --queries queries.jsonl
+
+  # Tune a backup from a deduplicated repository, write the results to JSON
+  %(prog)s --repository /backups/qdrant-repo --snapshot products-123.snapshot --json tuning.json
+
+  # Let a staging Qdrant fetch the snapshot itself
+  %(prog)s --location https://backups.example.com/products.snapshot --host http://staging:6333
+"""
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", help="Snapshot file to tune (or a backup name with --repository)")
+    source.add_argument("--location", help="URL or path on the Qdrant server to recover from directly (skips upload)")
+    parser.add_argument("--repository", help="Deduplicated backup repository; --snapshot is then a backup name in it")
+    parser.add_argument("--host", default="http://localhost:6333", help="Qdrant host URL")
+    parser.add_argument("--api-key", help="Qdrant API key (if required)")
+    parser.add_argument("--m", default="16", help="Comma-separated HNSW m values (default: 16)")
+    parser.add_argument("--ef-construct", default="100", help="Comma-separated HNSW ef_construct values (default: 100)")
+    parser.add_argument("--quantization", default="none,scalar,product,binary",
+                        help="Comma-separated quantization methods: none, scalar, product, binary (default: all)")
+    parser.add_argument("--on-disk", default="false",
+                        help="Comma-separated original vector storage: false (RAM), true (mmap) (default: false)")
+    parser.add_argument("--hnsw-ef", help="Comma-separated search-time ef values (default: Qdrant's default)")
+    parser.add_argument("--queries", metavar="FILE", help="JSON lines file of recorded search/query bodies")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE,
+                        help=f"Stored vectors used as queries without --queries (default: {DEFAULT_SAMPLE})")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help=f"k of recall@k for queries without a limit (default: {DEFAULT_LIMIT})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Queries in flight while measuring (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Passes over the query set per measurement (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--min-recall", type=float, default=DEFAULT_MIN_RECALL,
+                        help=f"Recall the recommendation must reach (default: {DEFAULT_MIN_RECALL})")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help=f"Prefix of the scratch collections (default: {DEFAULT_PREFIX})")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections for inspection")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        variants = variant_grid(
+            parse_list(args.m, int, "--m"),
+            parse_list(args.ef_construct, int, "--ef-construct"),
+            parse_list(args.quantization, parse_quantization, "--quantization"),
+            parse_list(args.on_disk, parse_bool, "--on-disk")
+        )
+        hnsw_efs = parse_list(args.hnsw_ef, int, "--hnsw-ef") if args.hnsw_ef else [None]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.repository and not args.snapshot:
+        parser.error("--repository requires --snapshot")
+    queries = None
+    if args.queries:
+        try:
+            queries = [query.get("body", query) for query in load_queries(args.queries)]
+        except (IOError, ValueError) as e:
+            parser.error(f"Error reading --queries: {e}")
+
+    client = QdrantHTTPClient(
+        host=args.host,
+        api_key=args.api_key,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.timeout,
+        retries=args.retries,
+        pool_size=max(DEFAULT_POOL_SIZE, args.concurrency)
+    )
+    restore_tool = QdrantSnapshotRestore(
+        host=args.host,
+        api_key=args.api_key,
+        client=client,
+        repository=SnapshotRepository(args.repository) if args.repository else None,
+        no_wait=args.no_wait,
+        poll_timeout=args.poll_timeout
+    )
+
+    print(f"Tuning {len(variants)} variants x {len(hnsw_efs)} hnsw_ef values "
+          f"({'NumPy' if numpy is not None else 'pure Python'} recall)")
+    if args.location:
+        source = {"location": args.location}
+    else:
+        # Uploaded once, every scratch collection is recovered from the same upload
+        try:
+            source = {"snapshot_name": restore_tool.upload_snapshot(args.snapshot)}
+        except SnapshotUploadError as e:
+            print(e)
+            sys.exit(1)
+
+    tuner = CollectionTuner(
+        restore_tool,
+        queries=queries,
+        sample=args.sample,
+        limit=args.limit,
+        concurrency=args.concurrency,
+        repeat=args.repeat,
+        prefix=args.prefix,
+        keep=args.keep
+    )
+    start_time = time.time()
+    rows = tuner.run(source, variants, hnsw_efs)
+    best = print_report(rows, args.min_recall)
+    print(f"Total time: {time.time() - start_time:.2f}s")
+
+    if args.json_path:
+        optimal = pareto_optimal(rows)
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "min_recall": args.min_recall,
+                "queries": len(tuner.queries or []),
+                "results": [dict(row, pareto=best_row) for row, best_row in zip(rows, optimal)],
+                "recommended": best,
+            }, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+    if not any("error" not in row for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nTuning interrupted by user")
+        sys.exit(1)
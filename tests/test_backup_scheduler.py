@@ -0,0 +1,83 @@
+"""Tests for backup_scheduler.py against the in-memory Qdrant stub"""
+
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from backup_scheduler import BackupScheduler
+from qdrant_stub import QdrantStub
+from snapshot_repository import SnapshotRepository
+
+
+class RepositoryRetentionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # 4 MB/s per connection: 'small' takes a moment, 'large' a few seconds
+        self.stub = QdrantStub(bandwidth=4 * 1024 * 1024)
+        self.stub.add_collection("small", snapshot_size=512 * 1024)
+        self.stub.add_collection("large", snapshot_size=16 * 1024 * 1024)
+        self.stub.start()
+        self.repository_path = os.path.join(self.tmp.name, "repo")
+        self.scheduler = BackupScheduler({
+            "host": self.stub.url,
+            "repository": self.repository_path,
+            "state_file": os.path.join(self.tmp.name, "state.json"),
+            "max_concurrent": 2,
+            "jitter": 0,
+            "defaults": {"retention": {"last": 1}},
+            "collections": {"small": {}, "large": {}},
+        })
+
+    def tearDown(self):
+        self.stub.stop()
+        self.tmp.cleanup()
+
+    def test_prune_waits_for_running_backup(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.scheduler.run_backup("small")
+
+            # 'small' is backed up again while 'large' is still being written;
+            # retention drops the first 'small' backup and wants to prune
+            large = threading.Thread(target=self.scheduler.run_backup, args=("large",))
+            large.start()
+            # Snapshot names only have second resolution
+            time.sleep(1.1)
+            self.scheduler.run_backup("small")
+            self.assertTrue(large.is_alive(), "the large backup should still be running")
+            large.join()
+
+        repository = SnapshotRepository(self.repository_path)
+        backups = {b["collection"]: b for b in repository.list_backups()}
+        self.assertEqual(sorted(backups), ["large", "small"])
+        self.assertEqual(len(repository.list_backups("small")), 1)
+
+        # The deferred prune ran once 'large' had finished, without touching its chunks
+        self.assertFalse(self.scheduler._prune_pending)
+        index = repository.find_backup(f"large/{backups['large']['snapshot']}")
+        hasher = hashlib.sha256()
+        with repository.open_backup(index) as reader:
+            for chunk in iter(lambda: reader.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        self.assertEqual(hasher.hexdigest(), index["checksum"])
+        self.assertEqual(repository.prune(), {"removed_chunks": 0, "freed_bytes": 0})
+
+    def test_delete_remote_per_collection(self):
+        self.scheduler.schedules["small"] = {"delete_remote": False}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.scheduler.run_backup("small")
+            self.scheduler.run_backup("large")
+
+        self.assertEqual(len(self.stub.collections["small"]["snapshots"]), 1)
+        self.assertEqual(self.stub.collections["large"]["snapshots"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
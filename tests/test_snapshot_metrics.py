@@ -0,0 +1,38 @@
+"""Tests for snapshot_metrics.py"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from snapshot_metrics import MetricsRecorder
+
+
+class CollectionResultTest(unittest.TestCase):
+    def test_result_only_covers_latest_run(self):
+        metrics = MetricsRecorder("backup")
+
+        metrics.start_collection("docs")
+        with metrics.phase("docs", "download") as phase:
+            phase.bytes = 100
+        metrics.collection_result("docs", True)
+
+        metrics.start_collection("docs")
+        with metrics.phase("docs", "unchanged") as phase:
+            phase.extra["avoided_bytes"] = 100
+        metrics.collection_result("docs", True)
+        result = metrics.collections["docs"]
+        self.assertEqual((result["bytes"], result["unchanged"], result["avoided_bytes"]), (0, True, 100))
+
+        metrics.start_collection("docs")
+        with metrics.phase("docs", "snapshot") as phase:
+            phase.success = False
+        metrics.collection_result("docs", False)
+        self.assertEqual([phase.name for phase in metrics.phases.values()], ["snapshot"])
+        self.assertEqual(metrics.collections["docs"]["bytes"], 0)
+        self.assertNotIn("phase_bytes", metrics.prometheus_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""Tests for snapshot_storage.py; SFTP runs against an in-process paramiko server"""
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from snapshot_storage import PART_SUFFIX, SFTPStorage
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+
+if paramiko:
+    class _Server(paramiko.ServerInterface):
+        def check_auth_password(self, username, password):
+            if (username, password) == ("backup", "secret"):
+                return paramiko.AUTH_SUCCESSFUL
+            return paramiko.AUTH_FAILED
+
+        def get_allowed_auths(self, username):
+            return "password"
+
+        def check_channel_request(self, kind, chanid):
+            if kind == "session":
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    class _Handle(paramiko.SFTPHandle):
+        def stat(self):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+
+    class _LocalSFTP(paramiko.SFTPServerInterface):
+        """Serves the server's root directory; SFTP paths are used as local paths"""
+
+        def _call(self, function, *args):
+            try:
+                function(*args)
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+            return paramiko.SFTP_OK
+
+        def list_folder(self, path):
+            try:
+                return [
+                    paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)), name)
+                    for name in os.listdir(path)
+                ]
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+
+        def stat(self, path):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.stat(path))
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+
+        lstat = stat
+
+        def open(self, path, flags, attr):
+            try:
+                fd = os.open(path, flags, 0o644)
+            except OSError as e:
+                return paramiko.SFTPServer.convert_errno(e.errno)
+            mode = "rb" if flags & (os.O_WRONLY | os.O_RDWR) == 0 else "r+b"
+            handle = _Handle(flags)
+            handle.readfile = handle.writefile = os.fdopen(fd, mode)
+            return handle
+
+        def remove(self, path):
+            return self._call(os.remove, path)
+
+        def rename(self, oldpath, newpath):
+            if os.path.exists(newpath):
+                return paramiko.SFTP_FAILURE
+            return self._call(os.rename, oldpath, newpath)
+
+        def posix_rename(self, oldpath, newpath):
+            return self._call(os.replace, oldpath, newpath)
+
+        def mkdir(self, path, attr):
+            return self._call(os.mkdir, path)
+
+        def rmdir(self, path):
+            return self._call(os.rmdir, path)
+
+
+@unittest.skipIf(paramiko is None, "needs paramiko")
+class SFTPStorageTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(2048)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "backups")
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.transports = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+        # The client only accepts host keys from ~/.ssh/known_hosts
+        home = os.path.join(self.tmp.name, "home")
+        os.makedirs(os.path.join(home, ".ssh"))
+        known_hosts = paramiko.HostKeys()
+        known_hosts.add(f"[127.0.0.1]:{self.port}", self.host_key.get_name(), self.host_key)
+        known_hosts.save(os.path.join(home, ".ssh", "known_hosts"))
+        with mock.patch.dict(os.environ, {"HOME": home}):
+            self.storage = SFTPStorage(
+                "127.0.0.1", self.root, port=self.port, username="backup", password="secret", jobs=1
+            )
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _LocalSFTP)
+            transport.start_server(server=_Server())
+            self.transports.append(transport)
+
+    def tearDown(self):
+        self.storage.close()
+        self.listener.close()
+        for transport in self.transports:
+            transport.close()
+        self.tmp.cleanup()
+
+    def local_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.root)
+            for directory, _, names in os.walk(self.root)
+            for name in names
+        )
+
+    def test_write_commit_and_read(self):
+        data = os.urandom(1024 * 1024 + 123)
+        writer = self.storage.open_writer("nightly/docs.snapshot")
+        writer.write(data[:300000])
+        writer.write(data[300000:])
+        self.assertEqual(self.local_files(), ["nightly/docs.snapshot" + PART_SUFFIX])
+        self.assertEqual(self.storage.list("", recursive=True), [])
+
+        self.assertEqual(writer.commit(), len(data))
+        self.assertEqual(self.local_files(), ["nightly/docs.snapshot"])
+        self.assertEqual(
+            [(entry["key"], entry["size"]) for entry in self.storage.list("nightly")],
+            [("nightly/docs.snapshot", len(data))]
+        )
+        self.assertEqual(self.storage.size("nightly/docs.snapshot"), len(data))
+        self.assertEqual(self.storage.read_bytes("nightly/docs.snapshot"), data)
+
+    def test_commit_replaces_existing_file(self):
+        self.storage.write_bytes("docs.snapshot", b"old")
+        self.storage.write_bytes("docs.snapshot", b"new")
+        self.assertEqual(self.storage.read_bytes("docs.snapshot"), b"new")
+
+    def test_abort_removes_part_file(self):
+        self.storage.write_bytes("nightly/old.snapshot", b"kept")
+        writer = self.storage.open_writer("nightly/docs.snapshot")
+        writer.write(b"unfinished")
+        writer.abort()
+        self.assertEqual(self.local_files(), ["nightly/old.snapshot"])
+
+    def test_delete_directory(self):
+        self.storage.write_bytes("shards/docs/0.snapshot", b"0")
+        self.storage.write_bytes("shards/docs/1.snapshot", b"1")
+        self.storage.delete("shards")
+        self.assertFalse(os.path.exists(os.path.join(self.root, "shards")))
+        self.assertIsNone(self.storage.size("shards/docs/0.snapshot"))
+
+
+if __name__ == "__main__":
+    unittest.main()